@@ -0,0 +1,168 @@
+from helpers.executable_api import ExecutableApi, Unbuffered
+from database.output import series
+from .read_output import ReadOutput, read_file_rows, output_table_name
+
+import argparse
+import sys
+import os, os.path
+import sqlite3
+import traceback
+
+EXPORT_FORMATS = {
+	'parquet': '.parquet',
+	'feather': '.feather'
+}
+
+
+class ExportOutput(ExecutableApi):
+	"""
+	Write imported output tables to columnar files (Parquet or Arrow IPC/Feather) for analysis outside the editor.
+	Tables are streamed in record batches so memory stays bounded by batch_size rows.
+	With from_csv, the output CSV files listed in files_out.out are converted directly without going through SQLite.
+	"""
+	def __init__(self, output_db_file, export_dir=None, export_format='parquet', tables=None, from_csv=False, output_files_dir=None, batch_size=100000):
+		if export_format not in EXPORT_FORMATS:
+			sys.exit('Unknown export format {}. Use one of: {}'.format(export_format, ', '.join(EXPORT_FORMATS.keys())))
+		if from_csv and output_files_dir is None:
+			sys.exit('Provide the output files directory to export from the output CSV files.')
+		if not from_csv and output_db_file is None:
+			sys.exit('Provide the output database file to export, or the output files directory to export from the CSV files.')
+
+		self.output_db_file = output_db_file.replace("\\","/") if output_db_file is not None else None
+		self.output_files_dir = output_files_dir.replace("\\","/") if output_files_dir is not None else None
+		self.export_format = export_format
+		self.tables = tables
+		self.from_csv = from_csv
+		self.batch_size = batch_size
+
+		if export_dir is None:
+			base_dir = os.path.dirname(self.output_db_file) if self.output_db_file is not None else self.output_files_dir
+			export_dir = os.path.join(base_dir, export_format)
+		self.export_dir = export_dir
+
+	def export(self):
+		try:
+			import pyarrow
+		except ImportError:
+			sys.exit('Exporting output to {} requires the pyarrow package.'.format(self.export_format))
+
+		if not os.path.exists(self.export_dir):
+			os.makedirs(self.export_dir)
+
+		if self.from_csv:
+			self.export_csv_files()
+		else:
+			self.export_tables()
+
+	def export_tables(self):
+		if self.output_db_file is None or not os.path.exists(self.output_db_file):
+			sys.exit('Output database {} does not exist.'.format(self.output_db_file))
+
+		conn = sqlite3.connect(self.output_db_file)
+		try:
+			cursor = conn.cursor()
+			cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name IN (SELECT table_name FROM table_description UNION SELECT 'mgt_out')")
+			tables = [row[0] for row in cursor.fetchall()]
+			if self.tables is not None:
+				tables = [t for t in tables if t in self.tables or series_table_name(t) in self.tables]
+
+			total = len(tables)
+			for i, table_name in enumerate(tables):
+				self.emit_progress(round(i * 100 / total), 'Exporting {}...'.format(table_name))
+				if series_table_name(table_name) is not None:
+					# Compact storage: written as the rows of the original table rather than packed value blobs
+					columns, batches = series.read_rows(conn, series_table_name(table_name), self.batch_size)
+					self.write_table(series_table_name(table_name), columns, batches)
+					continue
+
+				cursor.execute('PRAGMA table_info({})'.format(table_name))
+				columns = [(row[1], row[2]) for row in cursor.fetchall() if row[1] != 'id']
+
+				cursor.execute('SELECT {} FROM {}'.format(', '.join(col for col, col_type in columns), table_name))
+				batches = iter(lambda: cursor.fetchmany(self.batch_size), [])
+				self.write_table(table_name, columns, batches)
+		finally:
+			conn.close()
+
+	def export_csv_files(self):
+		# Headings are read with the import's own layout detection; its tables go to a throwaway in-memory database
+		reader = ReadOutput(self.output_files_dir, ':memory:', None, None, None)
+		reader.setup_meta_tables()
+		files = reader.get_output_files()
+		if self.tables is not None:
+			files = [f for f in files if output_table_name(f) in self.tables]
+
+		log_file = os.path.join(self.export_dir, 'export_log.txt')
+		with open(log_file, 'w') as log:
+			total = len(files)
+			for i, file in enumerate(files):
+				self.emit_progress(round(i * 100 / total), 'Exporting {}...'.format(file))
+				try:
+					layout, warnings = reader.prepare_file(file)
+					if layout is None:
+						log.write(warnings + '\n')
+						continue
+
+					columns = list(zip(layout['columns'], layout['column_types']))
+					batches = (batch for batch_sql, batch in read_file_rows(layout, self.batch_size) if batch_sql == layout['insert_sql'])
+					self.write_table(layout['table_name'], columns, batches)
+				except Exception as e:
+					log.write('Error exporting {}:\n {}\n{}\n\n'.format(file, e, traceback.format_exc()))
+
+	def write_table(self, table_name, columns, batches):
+		import pyarrow as pa
+
+		schema = pa.schema([(col, arrow_type(col_type)) for col, col_type in columns])
+		file_path = os.path.join(self.export_dir, table_name + EXPORT_FORMATS[self.export_format])
+		writer = self.open_writer(file_path, schema)
+		try:
+			for rows in batches:
+				values = list(zip(*rows)) if rows else [[] for _ in columns]
+				arrays = [pa.array(col_values, type=field.type) for col_values, field in zip(values, schema)]
+				writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+		finally:
+			writer.close()
+
+	def open_writer(self, file_path, schema):
+		if self.export_format == 'parquet':
+			import pyarrow.parquet as pq
+			return pq.ParquetWriter(file_path, schema, compression='zstd')
+		else:
+			import pyarrow as pa
+			return pa.ipc.new_file(file_path, schema, options=pa.ipc.IpcWriteOptions(compression='zstd'))
+
+
+def series_table_name(table_name):
+	"""Return the output table a compact <table>_series table stores, or None for other tables."""
+	return table_name[:-len('_series')] if table_name.endswith('_series') else None
+
+
+def arrow_type(sql_type):
+	import pyarrow as pa
+
+	sql_type = (sql_type or '').upper()
+	if 'INT' in sql_type:
+		return pa.int64()
+	if 'REAL' in sql_type or 'DOUBLE' in sql_type or 'FLOAT' in sql_type or 'NUMERIC' in sql_type:
+		return pa.float64()
+	if 'BLOB' in sql_type:
+		return pa.binary()
+	return pa.string()
+
+
+if __name__ == '__main__':
+	sys.stdout = Unbuffered(sys.stdout)
+	parser = argparse.ArgumentParser(description="Export SWAT+ output tables to Parquet or Feather files.")
+	parser.add_argument("--output_db_file", type=str, help="full path of output SQLite database file", nargs="?")
+	parser.add_argument("--output_files_dir", type=str, help="full path of output files directory, with --from_csv y", nargs="?")
+	parser.add_argument("--export_dir", type=str, help="full path of directory to write columnar files, defaults to a folder next to the output database", nargs="?")
+	parser.add_argument("--export_format", type=str, help="columnar export format: parquet (default) or feather", nargs="?", default="parquet")
+	parser.add_argument("--export_tables", type=str, help="comma-separated list of output tables to export (default all)", nargs="?")
+	parser.add_argument("--from_csv", type=str, help="y/n export straight from the output CSV files instead of the output database (default n)", nargs="?")
+	parser.add_argument("--batch_size", type=int, help="number of rows written per record batch (default 100000)", nargs="?", default=100000)
+	args = parser.parse_args()
+
+	export_tables = [item.strip() for item in args.export_tables.split(',')] if args.export_tables else None
+	from_csv = True if args.from_csv == "y" else False
+	api = ExportOutput(args.output_db_file, args.export_dir, args.export_format, export_tables, from_csv, args.output_files_dir, args.batch_size)
+	api.export()
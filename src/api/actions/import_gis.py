@@ -11,6 +11,7 @@ from database.datasets.setup import SetupDatasetsDatabase
 from database.datasets import init as ds_init, lum as ds_lum, base as ds_base, hru_parm_db as ds_hru_parm_db
 from database.datasets import definitions
 from helpers import utils
+from helpers.routing_graph import RouteCat, RoutingGraph, SOURCE_ID, SOURCE_CAT, HYD_TYP, SINK_ID, SINK_CAT, PERCENT
 from .import_weather import WeatherImport
 from .import_gis_legacy import GisImport as GisImportLegacy
 
@@ -20,6 +21,7 @@ from playhouse.migrate import *
 
 import sys, traceback
 import argparse
+import hashlib
 import math
 
 DO_DEBUG = False
@@ -27,6 +29,9 @@ DO_DEBUG = False
 min_qgis_version = 13
 min_arcgis_version = 10
 
+WETLAND_LANDUSES = ['wehb', 'wetf', 'wetl', 'wetn', 'wewo', 'watr', 'playa', 'wetw', 'wetm']
+FINGERPRINT_TABLES = ['gis_subbasins', 'gis_channels', 'gis_lsus', 'gis_hrus', 'gis_aquifers', 'gis_deep_aquifers', 'gis_water', 'gis_points']
+
 
 def is_supported_version(version, type):
 	ver = version
@@ -46,20 +51,122 @@ def get_name(name, id, digits):
 def get_max_id(table):
 	return table.select(fn.Max(table.id)).scalar()
 
+def text_digest(text):
+	"""64 bit digest of text, signed to fit an SQLite integer."""
+	return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), 'little', signed=True)
+
+def row_text_sql(cols):
+	"""SQL expression of the exact text of a row's values: quoted, with REALs given enough digits to round trip."""
+	return " || ',' || ".join("CASE typeof(\"{c}\") WHEN 'real' THEN printf('%!.17g', \"{c}\") ELSE quote(\"{c}\") END".format(c=col) for col in cols)
+
+def gis_digests(db, table):
+	"""Return {gis id: digest of the other columns} for the rows of a gis table, or an empty dictionary if it does not exist."""
+	if not db.table_exists(table):
+		return {}
+	conn = db.connection()
+	conn.create_function('text_digest', 1, text_digest, deterministic=True)
+	cols = [col.name for col in db.get_columns(table) if col.name != 'id']
+	return dict(conn.execute('SELECT id, text_digest({row}) FROM {table}'.format(row=row_text_sql(cols), table=table)).fetchall())
+
+def routing_digest(db):
+	"""Digest of the whole gis_routing table, independent of row order."""
+	cursor = db.execute_sql('SELECT {row} FROM gis_routing'.format(row=row_text_sql(['sourceid', 'sourcecat', 'hyd_typ', 'sinkid', 'sinkcat', 'percent'])))
+	return text_digest('\n'.join(sorted(row for row, in cursor.fetchall())))
+
+def save_gis_fingerprint(db, obj_ids, digests=None, routing=None):
+	"""
+	Replace the fingerprint of the last GIS import: the digest of each row of FINGERPRINT_TABLES with the id of the
+	SWAT+ object created from it (obj_ids is {table: {gis id: object id}}), and the digest of gis_routing (gis_id NULL).
+	Pass digests ({table: gis_digests}) and routing when they are already computed.
+	"""
+	if digests is None:
+		digests = {table: gis_digests(db, table) for table in FINGERPRINT_TABLES}
+	if routing is None:
+		routing = routing_digest(db)
+
+	conn = db.connection()
+	with db.atomic():
+		conn.execute("CREATE TABLE IF NOT EXISTS import_gis_fingerprint (table_name TEXT NOT NULL, gis_id INTEGER, digest INTEGER NOT NULL, obj_id INTEGER)")
+		conn.execute("DELETE FROM import_gis_fingerprint")
+		for table in FINGERPRINT_TABLES:
+			ids = obj_ids.get(table, {})
+			conn.executemany("INSERT INTO import_gis_fingerprint (table_name, gis_id, digest, obj_id) VALUES (?, ?, ?, ?)",
+				((table, gis_id, digest, ids.get(gis_id, None)) for gis_id, digest in digests[table].items()))
+		conn.execute("INSERT INTO import_gis_fingerprint (table_name, gis_id, digest, obj_id) VALUES ('gis_routing', NULL, ?, NULL)", (routing,))
+
+def load_gis_fingerprint(db):
+	"""Return ({table: {gis id: (digest, object id)}}, gis_routing digest) saved by save_gis_fingerprint, or (None, None) if there is none."""
+	if not db.table_exists('import_gis_fingerprint'):
+		return None, None
+
+	tables = {table: {} for table in FINGERPRINT_TABLES}
+	routing = None
+	for table, gis_id, digest, obj_id in db.execute_sql("SELECT table_name, gis_id, digest, obj_id FROM import_gis_fingerprint").fetchall():
+		if table == 'gis_routing':
+			routing = digest
+		elif table in tables:
+			tables[table][gis_id] = (digest, obj_id)
+
+	if routing is None:
+		return None, None
+	return tables, routing
+
+
+class BatchRows:
+	"""Rows for several tables, with ids assigned as they are added (continuing from each table's max id) and inserted together."""
+	def __init__(self, tables):
+		self.tables = tables
+		self.rows = {table: [] for table in tables}
+		self.next_ids = {table: (get_max_id(table) or 0) + 1 for table in tables}
+
+	def add(self, table, row):
+		row['id'] = self.next_ids[table]
+		self.next_ids[table] += 1
+		self.rows[table].append(row)
+		return row['id']
+
+	def insert(self, db):
+		for table in self.tables:
+			db_lib.bulk_insert(db, table, self.rows[table])
+
+
+def plant_ini_item_row(plant_ini, plnt_name, lc_status, lai_init, bm_init, phu_init, plnt_pop, yrs_init, rsd_init):
+	return {
+		'plant_ini': plant_ini,
+		'plnt_name': plnt_name,
+		'lc_status': lc_status,
+		'lai_init': lai_init,
+		'bm_init': bm_init,
+		'phu_init': phu_init,
+		'plnt_pop': plnt_pop,
+		'yrs_init': yrs_init,
+		'rsd_init': rsd_init
+	}
+
+
+def landuse_lum_row(name, plnt_com=None, mgt=None, cn2=None, cons_prac=None, ov_mann=None, cal_group=None, urban=None, urb_ro=None):
+	return {
+		'name': name,
+		'plnt_com': plnt_com,
+		'mgt': mgt,
+		'cn2': cn2,
+		'cons_prac': cons_prac,
+		'ov_mann': ov_mann,
+		'cal_group': cal_group,
+		'urban': urban,
+		'urb_ro': urb_ro
+	}
+
+
+def load_d_table_template(name):
+	"""Return the conditions (with their alternatives) and actions (with their outcomes) of decision table name, or None."""
+	table = decision_table.D_table_dtl.get_or_none(decision_table.D_table_dtl.name == name)
+	if table is None:
+		return None
 
-class RouteCat:
-	LSU = "LSU"
-	PT = "PT"
-	CH = "CH"
-	WTR = "WTR"
-	SUB = "SUB"
-	HRU = "HRU"
-	OUTLET = "X"
-	RES = "RES"
-	PND = "PND"
-	AQU = "AQU"
-	DAQ = "DAQ"
-	WaterTypes = [WTR, RES, PND]
+	conditions = [(cond, [alt.alt for alt in cond.alts]) for cond in table.conditions]
+	actions = [(act, [oc.outcome for oc in act.outcomes]) for act in table.actions]
+	return conditions, actions
 
 
 class GisImport(ExecutableApi):
@@ -89,6 +196,7 @@ class GisImport(ExecutableApi):
 		self.gis_to_hru_ids = {}
 		self.gis_to_aqu_ids = {}
 		self.gis_to_deep_aqu_ids = {}
+		self.gis_to_rec_ids = {}
 
 		if delete_existing and not self.config.imported_gis:
 			self.delete_existing()
@@ -97,6 +205,7 @@ class GisImport(ExecutableApi):
 		if not is_supported_version(self.config.gis_version, self.config.gis_type):
 			legacy_api = GisImportLegacy(self.project_db_file, False, self.constant_ps, self.rollback_db)
 			legacy_api.insert_default()
+			self.project_db.execute_sql("DROP TABLE IF EXISTS import_gis_fingerprint")
 		elif not self.config.imported_gis:
 			#try to fix wnd_live to aeration column
 			try:
@@ -152,6 +261,8 @@ class GisImport(ExecutableApi):
 							w_api = WeatherImport(self.project_db_file, False, False)
 							w_api.match_stations(70)
 
+					save_gis_fingerprint(self.project_db, self.fingerprint_obj_ids())
+
 					config = Project_config.get()
 					config.imported_gis = True
 					config.save()
@@ -165,6 +276,22 @@ class GisImport(ExecutableApi):
 					self.emit_progress(100, "Error occurred.")
 				sys.exit(traceback.format_exc())
 
+	def fingerprint_obj_ids(self):
+		"""Ids of the SWAT+ objects created from each gis table, saved with its fingerprint."""
+		hru_ids = self.gis_to_hru_ids
+		if len(hru_ids) == 0:
+			hru_ids = dict(self.project_db.execute_sql("SELECT gis_id, id FROM hru_con").fetchall())
+
+		return {
+			'gis_channels': self.gis_to_cha_ids,
+			'gis_lsus': self.gis_to_rtu_ids,
+			'gis_hrus': hru_ids,
+			'gis_aquifers': self.gis_to_aqu_ids,
+			'gis_deep_aquifers': self.gis_to_deep_aqu_ids,
+			'gis_water': self.gis_to_res_ids,
+			'gis_points': self.gis_to_rec_ids
+		}
+
 	def delete_existing(self):
 		self.emit_progress(5, "Deleting existing connections before importing from GIS...")
 		hydrology.Topography_hyd.delete().execute()
@@ -694,17 +821,12 @@ class GisImport(ExecutableApi):
 			cnt = get_max_id(gis.Gis_points)
 			if rec_query.count() > 0:
 				rec_cons = []
-				rec_con_outs = []
 				recs = []
 				rec_data = []
 
-				con_dict = dict()
-				con_rows = gis.Gis_routing.select().where((gis.Gis_routing.sourcecat == RouteCat.PT) & (gis.Gis_routing.sinkcat == RouteCat.CH))
-				for row in con_rows:
-					con_dict[row.sourceid] = row
-
 				i = 1
 				for row in rec_query:
+					self.gis_to_rec_ids[row.id] = i
 					rec_name = get_name('pt', row.id, cnt)
 
 					rec_con = {
@@ -757,31 +879,40 @@ class GisImport(ExecutableApi):
 					}
 					rec_data.append(data)
 
-					"""con = gis.Gis_routing.get_or_none((gis.Gis_routing.sourcecat == RouteCat.PT) 
-						& (gis.Gis_routing.sourceid == row.id)
-						& (gis.Gis_routing.sinkcat == RouteCat.CH))"""
-					con = con_dict.get(row.id, None)
-
-					if con is not None:
-						rec_con_outs.append({
-							'recall_con': i,
-							'order': 1,
-							'obj_typ': 'sdc',
-							'obj_id': self.gis_to_cha_ids[con.sinkid],
-							'hyd_typ': con.hyd_typ,
-							'frac': con.percent / 100
-						})
-
 					i += 1
 
 				db_lib.bulk_insert(self.project_db, connect.Recall_con, rec_cons)
-				db_lib.bulk_insert(self.project_db, connect.Recall_con_out, rec_con_outs)
+				db_lib.bulk_insert(self.project_db, connect.Recall_con_out, self.get_recall_con_outs())
 				db_lib.bulk_insert(self.project_db, recall.Recall_rec, recs)
 				db_lib.bulk_insert(self.project_db, recall.Recall_dat, rec_data)
 
-	def insert_landuse(self):
+	def get_recall_con_outs(self):
+		"""Return the recall_con_out rows sending each point source in gis_to_rec_ids to the channel it discharges into."""
+		con_dict = dict()
+		con_rows = gis.Gis_routing.select().where((gis.Gis_routing.sourcecat == RouteCat.PT) & (gis.Gis_routing.sinkcat == RouteCat.CH))
+		for row in con_rows:
+			con_dict[row.sourceid] = row
+
+		rec_con_outs = []
+		for gis_id, rec_id in self.gis_to_rec_ids.items():
+			con = con_dict.get(gis_id, None)
+			if con is not None:
+				rec_con_outs.append({
+					'recall_con': rec_id,
+					'order': 1,
+					'obj_typ': 'sdc',
+					'obj_id': self.gis_to_cha_ids[con.sinkid],
+					'hyd_typ': con.hyd_typ,
+					'frac': con.percent / 100
+				})
+		return rec_con_outs
+
+	def insert_landuse(self, only_missing=False):
 		"""
 		Insert default plant.ini and landuse.lum for any plants and urbans that don't already have one.
+		Plants, urbans, dataset plant communities and landuse.lum templates are resolved from dictionaries loaded up front,
+		then each table is inserted in one batch with its ids assigned here.
+		With only_missing, land uses already matching a landuse.lum row are left alone (adding HRUs to an imported project).
 		"""
 		lum_default_cal_group = None
 		lum_default_mgt = None
@@ -793,192 +924,184 @@ class GisImport(ExecutableApi):
 		for row in ds_init.Plant_ini.select():
 			ds_plant_comms[row.name.lower()] = row
 
+		ds_plant_comm_items = dict()
+		for row in ds_init.Plant_ini_item.select().order_by(ds_init.Plant_ini_item.id):
+			ds_plant_comm_items.setdefault(row.plant_ini_id, []).append(row)
+
 		ds_lums = dict()
 		for row in ds_lum.Landuse_lum.select():
 			ds_lums[row.name.lower()] = row
 
-		summer_table = decision_table.D_table_dtl.get_or_none(decision_table.D_table_dtl.name == 'pl_hv_summer1')
-		winter_table = decision_table.D_table_dtl.get_or_none(decision_table.D_table_dtl.name == 'pl_hv_winter1')
+		plants = dict()
+		for row in hru_parm_db.Plants_plt.select(hru_parm_db.Plants_plt.id, hru_parm_db.Plants_plt.name, hru_parm_db.Plants_plt.plnt_typ).order_by(hru_parm_db.Plants_plt.id):
+			plants.setdefault(row.name.lower(), row)
 
-		distinct_lu = gis.Gis_hrus.select(gis.Gis_hrus.landuse).where((gis.Gis_hrus.landuse.is_null(False)) & (gis.Gis_hrus.landuse != 'NULL')).distinct()
-		lus = [item.landuse.lower() for item in distinct_lu]
-		for lu in lus:
-			try:
-				plant = hru_parm_db.Plants_plt.get(hru_parm_db.Plants_plt.name ** lu)
-				p_id = plant.id
+		urbans = dict()
+		for row in hru_parm_db.Urban_urb.select(hru_parm_db.Urban_urb.id, hru_parm_db.Urban_urb.name).order_by(hru_parm_db.Urban_urb.id):
+			urbans.setdefault(row.name.lower(), row.id)
 
-				lum_name = '{name}_lum'.format(name=lu)
-				comm_name = '{name}_comm'.format(name=lu)
-				try:
-					pcom = None
-					#ds_pi = ds_init.Plant_ini.get(ds_init.Plant_ini.name == comm_name)
-					ds_pi = ds_plant_comms.get(comm_name, None)
-					if ds_pi is not None:
-						pi = init.Plant_ini.create(
-							name=ds_pi.name,
-							rot_yr_ini=ds_pi.rot_yr_ini
-						)
-						pcom = pi.id
-
-						for p in ds_pi.plants:
-							init.Plant_ini_item.create(
-								plant_ini=pi.id,
-								plnt_name=p_id,
-								lc_status=p.lc_status,
-								lai_init=p.lai_init,
-								bm_init=p.bm_init,
-								phu_init=p.phu_init,
-								plnt_pop=p.plnt_pop,
-								yrs_init=p.yrs_init,
-								rsd_init=p.rsd_init
-							)
-
-						#ds_m = ds_lum.Landuse_lum.get(ds_lum.Landuse_lum.name == lum_name)
-						ds_m = ds_lums.get(lum_name, None)
-
-						mgt_id = None
-						new_d_table_id = None
-						plant1 = None
-						if plant.plnt_typ.startswith('warm_annual'):
-							#summer_table = decision_table.D_table_dtl.get_or_none(decision_table.D_table_dtl.name == 'pl_hv_summer1')
-							if summer_table is None:
-								new_d_table_id = self.insert_d_table(plant.name, 'pl_hv_corn')
-							else:
-								new_d_table_id = summer_table.id
-								plant1 = plant.name
-						elif plant.plnt_typ.startswith('cold_annual'):
-							#winter_table = decision_table.D_table_dtl.get_or_none(decision_table.D_table_dtl.name == 'pl_hv_winter1')
-							if winter_table is None:
-								new_d_table_id = self.insert_d_table(plant.name, 'pl_hv_wwht')
-							else:
-								new_d_table_id = winter_table.id
-								plant1 = plant.name
-
-						if new_d_table_id is not None:
-							mgt_name = '{plant}_rot'.format(plant=plant.name)
-							curr_mgt = lum.Management_sch.get_or_none(lum.Management_sch.name == mgt_name)
-							if curr_mgt is not None:
-								mgt_id = curr_mgt.id
-							else:
-								mgt_id = lum.Management_sch.insert(
-									name = mgt_name
-								).execute()
-								lum.Management_sch_auto.insert(
-									management_sch=mgt_id,
-									d_table=new_d_table_id,
-									plant1=plant1
-								).execute() 
-
-						if ds_m is not None:
-							lum.Landuse_lum.create(
-								name=ds_m.name,
-								plnt_com=pcom,
-								mgt=mgt_id,
-								cn2=ds_m.cn2.id,
-								cons_prac=ds_m.cons_prac.id,
-								ov_mann=ds_m.ov_mann.id,
-								cal_group=ds_m.cal_group
-							)
-						else:
-							lum.Landuse_lum.create(
-								name=lum_name,
-								plnt_com=pcom,
-								mgt=mgt_id,
-								cn2=lum_default_cn2,
-								cons_prac=lum_default_cons_prac,
-								ov_mann=lum_default_ov_mann,
-								cal_group=lum_default_cal_group
-							)
-					else:
-						pcom = None
-						pi = init.Plant_ini.create(
-							name='{name}_comm'.format(name=lu),
-							rot_yr_ini=1
-						)
-						pcom = pi.id
-
-						init.Plant_ini_item.create(
-							plant_ini=pi.id,
-							plnt_name=p_id,
-							lc_status=0,
-							lai_init=0,
-							bm_init=0,
-							phu_init=0,
-							plnt_pop=0,
-							yrs_init=0,
-							rsd_init=10000
-						)
-
-						lum.Landuse_lum.create(
-							name='{name}_lum'.format(name=lu),
-							plnt_com=pcom,
-							mgt=lum_default_mgt,
-							cn2=lum_default_cn2,
-							cons_prac=lum_default_cons_prac,
-							ov_mann=lum_default_ov_mann,
-							cal_group=lum_default_cal_group
-						)
-
-				except ds_init.Plant_ini.DoesNotExist:
-					pcom = None
-					pi = init.Plant_ini.create(
-						name='{name}_comm'.format(name=lu),
-						rot_yr_ini=1
-					)
-					pcom = pi.id
-
-					init.Plant_ini_item.create(
-						plant_ini=pi.id,
-						plnt_name=p_id,
-						lc_status=0,
-						lai_init=0,
-						bm_init=0,
-						phu_init=0,
-						plnt_pop=0,
-						yrs_init=0,
-						rsd_init=10000
-					)
-
-					lum.Landuse_lum.create(
-						name='{name}_lum'.format(name=lu),
-						plnt_com=pcom,
-						mgt=lum_default_mgt,
-						cn2=lum_default_cn2,
-						cons_prac=lum_default_cons_prac,
-						ov_mann=lum_default_ov_mann,
-						cal_group=lum_default_cal_group
-					)
+		mgt_ids = {row.name: row.id for row in lum.Management_sch.select(lum.Management_sch.id, lum.Management_sch.name)}
+		d_table_ids = {row.name: row.id for row in decision_table.D_table_dtl.select(decision_table.D_table_dtl.id, decision_table.D_table_dtl.name)}
+		d_table_templates = dict()
 
-			except hru_parm_db.Plants_plt.DoesNotExist:
-				try:
-					u = hru_parm_db.Urban_urb.get(hru_parm_db.Urban_urb.name ** lu)
+		summer_table_id = d_table_ids.get('pl_hv_summer1', None)
+		winter_table_id = d_table_ids.get('pl_hv_winter1', None)
 
-					lum.Landuse_lum.create(
-						name='{name}_lum'.format(name=lu),
-						urban=u.id,
-						urb_ro='buildup_washoff',
-						mgt=lum_default_mgt,
-						cn2=49,
-						cons_prac=lum_default_cons_prac,
-						ov_mann=18,
-						cal_group=lum_default_cal_group
-					)
-				except hru_parm_db.Urban_urb.DoesNotExist:
+		batch = BatchRows([init.Plant_ini, init.Plant_ini_item,
+			decision_table.D_table_dtl, decision_table.D_table_dtl_cond, decision_table.D_table_dtl_cond_alt, decision_table.D_table_dtl_act, decision_table.D_table_dtl_act_out,
+			lum.Management_sch, lum.Management_sch_auto, lum.Landuse_lum])
+
+		distinct_lu = gis.Gis_hrus.select(gis.Gis_hrus.landuse).where((gis.Gis_hrus.landuse.is_null(False)) & (gis.Gis_hrus.landuse != 'NULL')).distinct()
+		lus = list(dict.fromkeys(item.landuse.lower() for item in distinct_lu))
+		new_lus = lus
+		if only_missing:
+			existing_lums = [row.name.lower() for row in lum.Landuse_lum.select(lum.Landuse_lum.name)]
+			new_lus = [lu for lu in lus if not any('{name}_lum'.format(name=lu) in name for name in existing_lums)]
+
+		for lu in new_lus:
+			lum_name = '{name}_lum'.format(name=lu)
+			comm_name = '{name}_comm'.format(name=lu)
+
+			plant = plants.get(lu, None)
+			if plant is None:
+				urban_id = urbans.get(lu, None)
+				if urban_id is None:
 					raise ValueError('{name} does not exist in plants_plt or urban_urb, but is used as land use in your GIS HRUs.'.format(name=lu))
 
+				batch.add(lum.Landuse_lum, landuse_lum_row(lum_name, urban=urban_id, urb_ro='buildup_washoff', mgt=lum_default_mgt, cn2=49,
+					cons_prac=lum_default_cons_prac, ov_mann=18, cal_group=lum_default_cal_group))
+				continue
+
+			ds_pi = ds_plant_comms.get(comm_name, None)
+			if ds_pi is None:
+				pcom = batch.add(init.Plant_ini, {'name': comm_name, 'rot_yr_ini': 1})
+				batch.add(init.Plant_ini_item, plant_ini_item_row(pcom, plant.id, 0, 0, 0, 0, 0, 0, 10000))
+				batch.add(lum.Landuse_lum, landuse_lum_row(lum_name, plnt_com=pcom, mgt=lum_default_mgt, cn2=lum_default_cn2,
+					cons_prac=lum_default_cons_prac, ov_mann=lum_default_ov_mann, cal_group=lum_default_cal_group))
+				continue
+
+			pcom = batch.add(init.Plant_ini, {'name': ds_pi.name, 'rot_yr_ini': ds_pi.rot_yr_ini})
+			for p in ds_plant_comm_items.get(ds_pi.id, []):
+				batch.add(init.Plant_ini_item, plant_ini_item_row(pcom, plant.id, p.lc_status, p.lai_init, p.bm_init, p.phu_init, p.plnt_pop, p.yrs_init, p.rsd_init))
+
+			mgt_id = None
+			new_d_table_id = None
+			plant1 = None
+			if plant.plnt_typ.startswith('warm_annual'):
+				if summer_table_id is None:
+					new_d_table_id = self.add_plant_d_table(batch, plant.name, 'pl_hv_corn', d_table_ids, d_table_templates)
+				else:
+					new_d_table_id = summer_table_id
+					plant1 = plant.name
+			elif plant.plnt_typ.startswith('cold_annual'):
+				if winter_table_id is None:
+					new_d_table_id = self.add_plant_d_table(batch, plant.name, 'pl_hv_wwht', d_table_ids, d_table_templates)
+				else:
+					new_d_table_id = winter_table_id
+					plant1 = plant.name
+
+			if new_d_table_id is not None:
+				mgt_name = '{plant}_rot'.format(plant=plant.name)
+				mgt_id = mgt_ids.get(mgt_name, None)
+				if mgt_id is None:
+					mgt_id = batch.add(lum.Management_sch, {'name': mgt_name})
+					mgt_ids[mgt_name] = mgt_id
+					batch.add(lum.Management_sch_auto, {'management_sch': mgt_id, 'd_table': new_d_table_id, 'plant1': plant1})
+
+			ds_m = ds_lums.get(lum_name, None)
+			if ds_m is not None:
+				batch.add(lum.Landuse_lum, landuse_lum_row(ds_m.name, plnt_com=pcom, mgt=mgt_id, cn2=ds_m.cn2_id,
+					cons_prac=ds_m.cons_prac_id, ov_mann=ds_m.ov_mann_id, cal_group=ds_m.cal_group))
+			else:
+				batch.add(lum.Landuse_lum, landuse_lum_row(lum_name, plnt_com=pcom, mgt=mgt_id, cn2=lum_default_cn2,
+					cons_prac=lum_default_cons_prac, ov_mann=lum_default_ov_mann, cal_group=lum_default_cal_group))
+
+		batch.insert(self.project_db)
+
+		lum_rows = [(row.name.lower(), row.id) for row in lum.Landuse_lum.select(lum.Landuse_lum.id, lum.Landuse_lum.name).order_by(lum.Landuse_lum.id)]
 		lum_dict = {}
 		for lu in lus:
 			lu_name = '{name}_lum'.format(name=lu)
-			l = lum.Landuse_lum.get(lum.Landuse_lum.name.contains(lu_name))
-			lum_dict[lu] = l.id
+			lum_dict[lu] = next(id for name, id in lum_rows if lu_name in name)
 
 		return lum_dict
 
+	def add_plant_d_table(self, batch, plant_name, compare_table_name, d_table_ids, d_table_templates):
+		"""
+		Batched counterpart of insert_decision_table: add the rows of a pl_hv_<plant> copy of compare_table_name to batch.
+		Returns the id of the new or existing table, or None if compare_table_name does not exist.
+		"""
+		if compare_table_name not in d_table_templates:
+			d_table_templates[compare_table_name] = load_d_table_template(compare_table_name)
+		template = d_table_templates[compare_table_name]
+		if template is None:
+			return None
+
+		new_d_tbl_name = 'pl_hv_{plant}'.format(plant=plant_name)
+		if new_d_tbl_name in d_table_ids:
+			return d_table_ids[new_d_tbl_name]
+
+		new_id = batch.add(decision_table.D_table_dtl, {'name': new_d_tbl_name, 'file_name': 'lum.dtl'})
+		d_table_ids[new_d_tbl_name] = new_id
+
+		conditions, actions = template
+		for cond, alts in conditions:
+			cond_id = batch.add(decision_table.D_table_dtl_cond, {
+				'd_table': new_id,
+				'var': cond.var,
+				'obj': cond.obj,
+				'obj_num': cond.obj_num,
+				'lim_var': cond.lim_var,
+				'lim_op': cond.lim_op,
+				'lim_const': cond.lim_const
+			})
+			for alt in alts:
+				batch.add(decision_table.D_table_dtl_cond_alt, {'cond': cond_id, 'alt': alt})
+
+		for act, outcomes in actions:
+			name = act.name
+			if act.act_typ == 'plant':
+				name = 'plant_{name}'.format(name=plant_name)
+
+			option = act.option
+			if act.option == 'corn' or act.option == 'wwht':
+				option = plant_name
+
+			const2 = act.const2
+			fp = act.fp
+			if (act.act_typ == 'plant' or act.act_typ == 'harvest_kill') and const2 == 0:
+				const2 = 1
+			elif act.act_typ == 'harvest_kill' and (fp == 'null' or fp == '' or fp is None):
+				fp = 'grain'
+
+			act_id = batch.add(decision_table.D_table_dtl_act, {
+				'd_table': new_id,
+				'act_typ': act.act_typ,
+				'obj': act.obj,
+				'obj_num': act.obj_num,
+				'name': name,
+				'option': option,
+				'const': act.const,
+				'const2': const2,
+				'fp': fp
+			})
+			for outcome in outcomes:
+				batch.add(decision_table.D_table_dtl_act_out, {'act': act_id, 'outcome': outcome})
+
+		return new_id
+
 	def insert_hrus(self):
 		"""
 		Insert hru_data.hru SWAT+ data from GIS database.
 		"""
 		lum_dict = self.insert_landuse()
+		self.insert_hru_rows(lum_dict, self.get_soil_plant_ini())
+
+	def get_soil_plant_ini(self):
+		"""Return the id of the default soil_plant.ini, creating it and its nutrients.sol if missing."""
+		sp = init.Soil_plant_ini.get_or_none(init.Soil_plant_ini.name == 'soilplant1')
+		if sp is not None:
+			return sp.id
 
 		# Create default nutrients.sol
 		nut = soils.Nutrients_sol.create(
@@ -1001,204 +1124,156 @@ class GisImport(ExecutableApi):
 			sw_frac=0,
 			nutrients=nut.id
 		)
+		return sp.id
 
-		hyds = []
-		hrus = []
-		topos = []
-		hru_cons = []
-		elem_subs = []
-		lsu_eles = []
-
-		wetlands = []
-		hyd_wets = []
+	def insert_hru_rows(self, lum_dict, soil_plant_ini_id, gis_ids=None):
+		"""
+		Insert the SWAT+ rows of the gis_hrus in gis_ids (default all of them).
+		Each table is filled by one INSERT ... SELECT from gis_hrus joined to soils_sol, so memory stays flat for any number of HRUs.
+		New rows are numbered after the existing rows of each table, which on a first import is 1..n in gis_hrus order.
+		"""
+		missing_soil = self.project_db.execute_sql("SELECT h.soil FROM gis_hrus h LEFT JOIN soils_sol s ON s.name = h.soil WHERE s.id IS NULL LIMIT 1").fetchone()
+		if missing_soil is not None:
+			raise ValueError('Soil "{s}" does not exist in your soils_sol table. Check your project in GIS and make '
+							 'sure all soils from the gis_hrus table exist in soils_sol.'.format(s=missing_soil[0]))
 
 		bsn_area = gis.Gis_subbasins.select(fn.Sum(gis.Gis_subbasins.area)).scalar()
-
-		soil_rows = soils.Soils_sol.select()
-		soils_dict = dict()
-		for soil in soil_rows:
-			soils_dict[soil.name] = soil
-
 		cnt = get_max_id(gis.Gis_hrus)
-		topo_id = hydrology.Topography_hyd.select().count() + 1
-		i = 1
-		wi = 1
-		for row in gis.Gis_hrus.select():
-			hru_name = get_name('hru', row.id, cnt)
-
-			#soil = soils.Soils_sol.get_or_none(soils.Soils_sol.name == row.soil)
-			soil = soils_dict.get(row.soil, None)
-			if soil is None:
-				raise ValueError('Soil "{s}" does not exist in your soils_sol table. Check your project in GIS and make '
-								 'sure all soils from the gis_hrus table exist in soils_sol.'.format(s=row.soil))
-
-			hyd_calc = hydrology.Hydrology_hyd.get_perco_cn3_swf_latq_co(soil.hyd_grp, row.slope / 100)
-
-			hyd = {
-				'id': i,
-				'name': get_name('hyd', row.id, cnt),
-				'lat_ttime': 0.00,
-				'lat_sed': 0.00,
-				'can_max': 1.00,
-				'esco': 0.95,
-				'epco': 0.50,
-				'orgn_enrich': 0.00,
-				'orgp_enrich': 0.00,
-				'cn3_swf': hyd_calc['cn3_swf'],
-				'bio_mix': 0.20,
-				'perco': hyd_calc['perco'],
-				'lat_orgn': 0.00,
-				'lat_orgp': 0.00,
-				'pet_co': 1.00,
-				'latq_co': hyd_calc['latq_co']
-			}
-			hyds.append(hyd)
-
-			slp_len = self.get_slope_len(row.slope)
-
-			topo = {
-				'id': topo_id,
-				'name': get_name('topohru', row.id, cnt),
-				'slp': row.slope / 100,
-				'slp_len': slp_len,
-				'lat_len': slp_len,
-				'dist_cha': 121.0,
-				'depos': 0,
-				'type': 'hru'
-			}
-			topos.append(topo)
-
-			wetland_lu = ['wehb', 'wetf', 'wetl', 'wetn', 'wewo', 'watr', 'playa', 'wetw', 'wetm']
-
-			lowercase_landuse = None if row.landuse is None else row.landuse.lower()
-
-			if lowercase_landuse in wetland_lu:
-				if wi == 1:
-					res_rel = decision_table.D_table_dtl.get_or_none(decision_table.D_table_dtl.name == 'wetland')
-					res_rel_id = None
-					if res_rel is not None:
-						res_rel_id = res_rel.id
-
-					winit = reservoir.Initial_res.create(
-						name='initwet1',
-						org_min=1
-					)
-
-					wnut = reservoir.Nutrients_res.create(
-						name='nutwet1',
-						mid_start=5,
-						mid_end=10,
-						mid_n_stl=5.5,
-						n_stl=5.5,
-						mid_p_stl=10,
-						p_stl=10,
-						chla_co=1,
-						secchi_co=1,
-						theta_n=1,
-						theta_p=1,
-						n_min_stl=0.1,
-						p_min_stl=0.01
-					)
-
-					wsed = reservoir.Sediment_res.create(
-						name='sedwet1',
-						sed_amt=1,
-						d50=10,
-						carbon=0,
-						bd=0,
-						sed_stl=1,
-						stl_vel=1
-					)
-				
-				hyd_wet = {
-					'id': wi,
-					'name': get_name('hydwet', row.id, cnt),
-					'hru_ps': 0.1,
-					'dp_ps': 20,
-					'hru_es': 0.25,
-					'dp_es': 100,
-					'k': 0.01,
-					'evap': 0.7,
-					'vol_area_co': 1,
-					'vol_dp_a': 1,
-					'vol_dp_b': 1,
-					'hru_frac': 0.5
-				}
-				hyd_wets.append(hyd_wet)
-
-				wet = {
-					'id': wi,
-					'name': get_name('wet', row.id, cnt),
-					'init': winit.id,
-					'hyd': wi,
-					'rel': res_rel_id,
-					'sed': wsed.id,
-					'nut': wnut.id
-				}
-				wetlands.append(wet)
-				wi += 1
-
-			hru_data = {
-				'id': i,
-				'name': hru_name,
-				'topo': topo_id,
-				'hydro': i,
-				'lu_mgt': lum_dict.get(lowercase_landuse, None),
-				'soil_plant_init': sp.id,
-				'snow': 1,
-				'surf_stor': wi-1 if lowercase_landuse in wetland_lu else None,
-				'soil': soil.id
-			}
-
-			hrus.append(hru_data)
-			topo_id += 1
-
-			con = {
-				'id': i,
-				'hru': i,
-				'name': hru_name,
-				'gis_id': row.id,
-				'elev': row.elev,
-				'lat': row.lat,
-				'lon': row.lon,
-				'area': row.arslp,
-				'ovfl': 0,
-				'rule': 0
-			}
-			hru_cons.append(con)
-
-			elem_sub = {
-				'id': i,
-				'name': hru_name,
-				'rtu': self.gis_to_rtu_ids[row.lsu],
-				'obj_typ': 'hru',
-				'obj_id': i,
-				'frac': row.arslp / row.arlsu
-			}
-			elem_subs.append(elem_sub)
+		digits = len(str(cnt))
+
+		conn = self.project_db.connection()
+		self.register_hru_functions(conn)
+		wetland_list = ", ".join("'{}'".format(lu) for lu in WETLAND_LANDUSES)
+		start = {table: conn.execute("SELECT IFNULL(MAX(id), 0) FROM {t}".format(t=table)).fetchone()[0]
+			for table in ['hydrology_hyd', 'topography_hyd', 'hru_data_hru', 'hru_con', 'rout_unit_ele', 'ls_unit_ele']}
+
+		with self.project_db.atomic():
+			# Number the HRUs 1..n in gis_hrus order, and the wetland HRUs 1..n among themselves
+			conn.execute("DROP TABLE IF EXISTS temp.hru_import")
+			conn.execute("DROP TABLE IF EXISTS temp.hru_wet")
+			conn.execute("DROP TABLE IF EXISTS temp.hru_lum")
+			conn.execute("DROP TABLE IF EXISTS temp.hru_rtu")
+			conn.execute("DROP TABLE IF EXISTS temp.hru_filter")
+			conn.execute("CREATE TEMP TABLE hru_lum (landuse TEXT PRIMARY KEY, lum_id INTEGER)")
+			conn.executemany("INSERT INTO temp.hru_lum (landuse, lum_id) VALUES (?, ?)", lum_dict.items())
+			conn.execute("CREATE TEMP TABLE hru_rtu (lsu INTEGER PRIMARY KEY, rtu_id INTEGER)")
+			conn.executemany("INSERT INTO temp.hru_rtu (lsu, rtu_id) VALUES (?, ?)", self.gis_to_rtu_ids.items())
+			conn.execute("""CREATE TEMP TABLE hru_import (i INTEGER PRIMARY KEY, gis_id INTEGER, lsu INTEGER, landuse TEXT, soil_id INTEGER, hyd_grp TEXT,
+				slope, arslp, arlsu, lat, lon, elev)""")
+
+			where = ""
+			if gis_ids is not None:
+				conn.execute("CREATE TEMP TABLE hru_filter (gis_id INTEGER PRIMARY KEY)")
+				conn.executemany("INSERT INTO temp.hru_filter (gis_id) VALUES (?)", ((id,) for id in gis_ids))
+				where = "WHERE h.id IN (SELECT gis_id FROM temp.hru_filter)"
+
+			conn.execute("""INSERT INTO temp.hru_import (gis_id, lsu, landuse, soil_id, hyd_grp, slope, arslp, arlsu, lat, lon, elev)
+				SELECT h.id, h.lsu, lower(h.landuse), s.id, s.hyd_grp, h.slope, h.arslp, h.arlsu, h.lat, h.lon, h.elev
+				FROM gis_hrus h JOIN soils_sol s ON s.name = h.soil {where} ORDER BY h.id""".format(where=where))
+			conn.execute("CREATE TEMP TABLE hru_wet (wi INTEGER PRIMARY KEY, i INTEGER UNIQUE)")
+			conn.execute("INSERT INTO temp.hru_wet (i) SELECT i FROM temp.hru_import WHERE landuse IN ({w}) ORDER BY i".format(w=wetland_list))
+
+			missing_lsu = conn.execute("SELECT h.lsu FROM temp.hru_import h LEFT JOIN temp.hru_rtu r ON r.lsu = h.lsu WHERE r.rtu_id IS NULL LIMIT 1").fetchone()
+			if missing_lsu is not None:
+				raise ValueError('LSU {lsu} used in your gis_hrus table does not exist in gis_lsus. Check your project in GIS.'.format(lsu=missing_lsu[0]))
+
+			conn.execute("""INSERT INTO hydrology_hyd (id, name, lat_ttime, lat_sed, can_max, esco, epco, orgn_enrich, orgp_enrich, cn3_swf, bio_mix, perco, lat_orgn, lat_orgp, pet_co, latq_co)
+				SELECT ? + i, printf('hyd%0{d}d', gis_id), 0, 0, 1, 0.95, 0.5, 0, 0, hyd_cn3_swf(hyd_grp, slope / 100.0), 0.2, hyd_perco(hyd_grp, slope / 100.0), 0, 0, 1, hyd_latq_co(hyd_grp, slope / 100.0)
+				FROM temp.hru_import""".format(d=digits), (start['hydrology_hyd'],))
+			conn.execute("""INSERT INTO topography_hyd (id, name, slp, slp_len, lat_len, dist_cha, depos, type)
+				SELECT ? + i, printf('topohru%0{d}d', gis_id), slope / 100.0, slope_len(slope), slope_len(slope), 121.0, 0, 'hru'
+				FROM temp.hru_import""".format(d=digits), (start['topography_hyd'],))
+
+			wet_start = 0
+			if conn.execute("SELECT 1 FROM temp.hru_wet LIMIT 1").fetchone() is not None:
+				wet_start = self.insert_wetlands(conn, digits)
+
+			conn.execute("""INSERT INTO hru_data_hru (id, name, topo_id, hydro_id, lu_mgt_id, soil_plant_init_id, snow_id, surf_stor_id, soil_id)
+				SELECT ? + h.i, printf('hru%0{d}d', h.gis_id), ? + h.i, ? + h.i, l.lum_id, ?, 1, ? + w.wi, h.soil_id
+				FROM temp.hru_import h LEFT JOIN temp.hru_lum l ON l.landuse = h.landuse LEFT JOIN temp.hru_wet w ON w.i = h.i""".format(d=digits),
+				(start['hru_data_hru'], start['topography_hyd'], start['hydrology_hyd'], soil_plant_ini_id, wet_start))
+			conn.execute("""INSERT INTO hru_con (id, hru_id, name, gis_id, elev, lat, lon, area, ovfl, rule)
+				SELECT ? + i, ? + i, printf('hru%0{d}d', gis_id), gis_id, elev, lat, lon, arslp, 0, 0
+				FROM temp.hru_import""".format(d=digits), (start['hru_con'], start['hru_data_hru']))
+			conn.execute("""INSERT INTO rout_unit_ele (id, name, rtu_id, obj_typ, obj_id, frac)
+				SELECT ? + h.i, printf('hru%0{d}d', h.gis_id), r.rtu_id, 'hru', ? + h.i, h.arslp / h.arlsu
+				FROM temp.hru_import h JOIN temp.hru_rtu r ON r.lsu = h.lsu""".format(d=digits), (start['rout_unit_ele'], start['hru_con']))
+			conn.execute("""INSERT INTO ls_unit_ele (id, name, obj_typ, obj_typ_no, bsn_frac, sub_frac, reg_frac, ls_unit_def_id)
+				SELECT ? + h.i, printf('hru%0{d}d', h.gis_id), 'hru', ? + h.i, h.arslp / ?, h.arslp / h.arlsu, 0, r.rtu_id
+				FROM temp.hru_import h JOIN temp.hru_rtu r ON r.lsu = h.lsu""".format(d=digits), (start['ls_unit_ele'], start['hru_con'], bsn_area))
+
+			conn.execute("DROP TABLE temp.hru_import")
+			conn.execute("DROP TABLE temp.hru_wet")
+			conn.execute("DROP TABLE temp.hru_lum")
+			conn.execute("DROP TABLE temp.hru_rtu")
+			conn.execute("DROP TABLE IF EXISTS temp.hru_filter")
+
+	def register_hru_functions(self, conn):
+		"""Register the hydrology and slope length rules of insert_hru_rows as SQLite functions."""
+		def hyd_value(key):
+			return lambda hyd_grp, slope: hydrology.Hydrology_hyd.get_perco_cn3_swf_latq_co(hyd_grp, slope)[key]
+
+		conn.create_function('hyd_perco', 2, hyd_value('perco'), deterministic=True)
+		conn.create_function('hyd_cn3_swf', 2, hyd_value('cn3_swf'), deterministic=True)
+		conn.create_function('hyd_latq_co', 2, hyd_value('latq_co'), deterministic=True)
+		conn.create_function('slope_len', 1, self.get_slope_len, deterministic=True)
+
+	def insert_wetlands(self, conn, digits):
+		"""
+		Insert one hydrology_wet and wetland_wet row per wetland HRU in temp.hru_wet, after the existing rows,
+		creating the default wetland tables if missing. Returns the offset of the new wetland_wet ids.
+		"""
+		res_rel = decision_table.D_table_dtl.get_or_none(decision_table.D_table_dtl.name == 'wetland')
+		res_rel_id = None
+		if res_rel is not None:
+			res_rel_id = res_rel.id
+
+		winit = reservoir.Initial_res.get_or_none(reservoir.Initial_res.name == 'initwet1')
+		if winit is None:
+			winit = reservoir.Initial_res.create(
+				name='initwet1',
+				org_min=1
+			)
 
-			lsu_ele = {
-				'id': i,
-				'name': hru_name,
-				'obj_typ': 'hru',
-				'obj_typ_no': i,
-				'bsn_frac': row.arslp / bsn_area,
-				'sub_frac': row.arslp / row.arlsu,
-				'reg_frac': 0,
-				'ls_unit_def': self.gis_to_rtu_ids[row.lsu]
-			}
-			lsu_eles.append(lsu_ele)
+		wnut = reservoir.Nutrients_res.get_or_none(reservoir.Nutrients_res.name == 'nutwet1')
+		if wnut is None:
+			wnut = reservoir.Nutrients_res.create(
+				name='nutwet1',
+				mid_start=5,
+				mid_end=10,
+				mid_n_stl=5.5,
+				n_stl=5.5,
+				mid_p_stl=10,
+				p_stl=10,
+				chla_co=1,
+				secchi_co=1,
+				theta_n=1,
+				theta_p=1,
+				n_min_stl=0.1,
+				p_min_stl=0.01
+			)
 
-			i += 1
+		wsed = reservoir.Sediment_res.get_or_none(reservoir.Sediment_res.name == 'sedwet1')
+		if wsed is None:
+			wsed = reservoir.Sediment_res.create(
+				name='sedwet1',
+				sed_amt=1,
+				d50=10,
+				carbon=0,
+				bd=0,
+				sed_stl=1,
+				stl_vel=1
+			)
 
-		db_lib.bulk_insert(self.project_db, hydrology.Hydrology_hyd, hyds)
-		db_lib.bulk_insert(self.project_db, hydrology.Topography_hyd, topos)
-		db_lib.bulk_insert(self.project_db, hru.Hru_data_hru, hrus)
-		db_lib.bulk_insert(self.project_db, connect.Hru_con, hru_cons)
-		db_lib.bulk_insert(self.project_db, connect.Rout_unit_ele, elem_subs)
-		db_lib.bulk_insert(self.project_db, regions.Ls_unit_ele, lsu_eles)
-		db_lib.bulk_insert(self.project_db, reservoir.Hydrology_wet, hyd_wets)
-		db_lib.bulk_insert(self.project_db, reservoir.Wetland_wet, wetlands)
+		hyd_start = conn.execute("SELECT IFNULL(MAX(id), 0) FROM hydrology_wet").fetchone()[0]
+		wet_start = conn.execute("SELECT IFNULL(MAX(id), 0) FROM wetland_wet").fetchone()[0]
+		conn.execute("""INSERT INTO hydrology_wet (id, name, hru_ps, dp_ps, hru_es, dp_es, k, evap, vol_area_co, vol_dp_a, vol_dp_b, hru_frac)
+			SELECT ? + w.wi, printf('hydwet%0{d}d', h.gis_id), 0.1, 20, 0.25, 100, 0.01, 0.7, 1, 1, 1, 0.5
+			FROM temp.hru_wet w JOIN temp.hru_import h ON h.i = w.i""".format(d=digits), (hyd_start,))
+		conn.execute("""INSERT INTO wetland_wet (id, name, init_id, hyd_id, rel_id, sed_id, nut_id)
+			SELECT ? + w.wi, printf('wet%0{d}d', h.gis_id), ?, ? + w.wi, ?, ?, ?
+			FROM temp.hru_wet w JOIN temp.hru_import h ON h.i = w.i""".format(d=digits), (wet_start, winit.id, hyd_start, res_rel_id, wsed.id, wnut.id))
+		return wet_start
 
 	def insert_hru_ltes(self):
 		distinct_lu = gis.Gis_hrus.select(gis.Gis_hrus.landuse).where((gis.Gis_hrus.landuse.is_null(False)) & (gis.Gis_hrus.landuse != 'NULL')).distinct()
@@ -1410,55 +1485,55 @@ class GisImport(ExecutableApi):
 			db_lib.bulk_insert(self.project_db, connect.Aquifer_con, aquifer_cons)
 
 	def insert_connections(self):
-		pt_source_row_dict = dict()
-		pt_source_rows = gis.Gis_routing.select().where(gis.Gis_routing.sourcecat == RouteCat.PT)
-		for row in pt_source_rows:
-			pt_source_row_dict[row.sourceid] = row
-
-		rtu_con_outs = self.get_connections([RouteCat.LSU], 'rtu_con', self.gis_to_rtu_ids, pt_source_row_dict)
-		utils.debug_stdout(DO_DEBUG, 'Inserting rtu_con_outs: {}'.format(len(rtu_con_outs)))
-		db_lib.bulk_insert(self.project_db, connect.Rout_unit_con_out, rtu_con_outs)
-
-		cha_con_outs = self.get_connections([RouteCat.CH], 'chandeg_con', self.gis_to_cha_ids, pt_source_row_dict)
-		utils.debug_stdout(DO_DEBUG, 'Inserting cha_con_outs: {}'.format(len(cha_con_outs)))
-		db_lib.bulk_insert(self.project_db, connect.Chandeg_con_out, cha_con_outs)
-
-		aqu_con_outs = self.get_connections([RouteCat.AQU], 'aquifer_con', self.gis_to_aqu_ids, pt_source_row_dict)
-		utils.debug_stdout(DO_DEBUG, 'Inserting aqu_con_outs: {}'.format(len(aqu_con_outs)))
-		db_lib.bulk_insert(self.project_db, connect.Aquifer_con_out, aqu_con_outs)
-
-		res_con_outs = self.get_connections([RouteCat.WTR, RouteCat.PND, RouteCat.RES], 'reservoir_con', self.gis_to_res_ids, pt_source_row_dict)
-		utils.debug_stdout(DO_DEBUG, 'Inserting res_con_outs: {}'.format(len(res_con_outs)))
-		db_lib.bulk_insert(self.project_db, connect.Reservoir_con_out, res_con_outs)
+		graph = RoutingGraph.load(self.project_db)
+		con_outs = self.get_connections(graph, {
+			RouteCat.LSU: ('rtu_con', self.gis_to_rtu_ids),
+			RouteCat.CH: ('chandeg_con', self.gis_to_cha_ids),
+			RouteCat.AQU: ('aquifer_con', self.gis_to_aqu_ids),
+			RouteCat.WTR: ('reservoir_con', self.gis_to_res_ids),
+			RouteCat.PND: ('reservoir_con', self.gis_to_res_ids),
+			RouteCat.RES: ('reservoir_con', self.gis_to_res_ids)
+		})
+
+		for attach_key, table in [('rtu_con', connect.Rout_unit_con_out), ('chandeg_con', connect.Chandeg_con_out), ('aquifer_con', connect.Aquifer_con_out), ('reservoir_con', connect.Reservoir_con_out)]:
+			utils.debug_stdout(DO_DEBUG, 'Inserting {} outs: {}'.format(attach_key, len(con_outs[attach_key])))
+			db_lib.bulk_insert(self.project_db, table, con_outs[attach_key])
+
+		self.report_routing_cycles(graph)
 
 	def insert_connections_lte(self):
-		pt_source_row_dict = dict()
-		pt_source_rows = gis.Gis_routing.select().where(gis.Gis_routing.sourcecat == RouteCat.PT)
-		for row in pt_source_rows:
-			pt_source_row_dict[row.sourceid] = row
-
-		cha_con_outs = self.get_connections([RouteCat.CH], 'chandeg_con', self.gis_to_cha_ids, pt_source_row_dict, True)
-		db_lib.bulk_insert(self.project_db, connect.Chandeg_con_out, cha_con_outs)
+		graph = RoutingGraph.load(self.project_db)
+		con_outs = self.get_connections(graph, {RouteCat.CH: ('chandeg_con', self.gis_to_cha_ids)}, True)
+		db_lib.bulk_insert(self.project_db, connect.Chandeg_con_out, con_outs['chandeg_con'])
 
 		# Send 100% HRU to channel
 		hru_con_outs = []
-		rows = gis.Gis_routing.select().where((gis.Gis_routing.sourcecat == RouteCat.HRU) 
-				& (gis.Gis_routing.percent > 0) 
-				& (gis.Gis_routing.sinkcat == RouteCat.CH)).order_by(gis.Gis_routing.sourceid)
-		for row in rows:
-			hru_con_outs.append({
-				'hru_lte_con': self.gis_to_hru_ids[row.sourceid],
-				'order': 1,
-				'obj_typ': 'sdc',
-				'obj_id': self.gis_to_cha_ids[row.sinkid],
-				'hyd_typ': 'tot',
-				'frac': 1
-			})
+		for row in graph.outflows([RouteCat.HRU]):
+			if row[SINK_CAT] == RouteCat.CH:
+				hru_con_outs.append({
+					'hru_lte_con': self.gis_to_hru_ids[row[SOURCE_ID]],
+					'order': 1,
+					'obj_typ': 'sdc',
+					'obj_id': self.gis_to_cha_ids[row[SINK_ID]],
+					'hyd_typ': 'tot',
+					'frac': 1
+				})
 		db_lib.bulk_insert(self.project_db, connect.Hru_lte_con_out, hru_con_outs)
 
-	def get_connections(self, sourcecats, attach_key, id_list, pt_source_row_dict, is_lte=False):
-		con_outs = []
+		self.report_routing_cycles(graph)
+
+	def report_routing_cycles(self, graph):
+		"""Report cycles in the surface routing of gis_routing, as a progress message with the cycles in its stats."""
+		cycles = [["{} {}".format(cat, id) for cat, id in component] for component in graph.cycles(RouteCat.SurfaceTypes)]
+		if len(cycles) > 0:
+			self.emit_progress(90, "Check gis_routing - routing cycles found ({n}): {cycles}".format(n=len(cycles), cycles="; ".join(", ".join(c) for c in cycles)), stats={"routing_cycles": cycles})
 
+	def get_connections(self, graph, sources, is_lte=False):
+		"""
+		Build the *_con_out rows of every source category in one pass over the routing graph.
+		sources maps each source category to the attach key of its con_out rows and its gis to SWAT+ id dictionary.
+		Returns the rows by attach key, each list in source id order.
+		"""
 		cats_to_obj_typ = {
 			RouteCat.CH: 'sdc',
 			RouteCat.AQU: 'aqu',
@@ -1494,87 +1569,42 @@ class GisImport(ExecutableApi):
 				RouteCat.CH
 			]
 
-		rows = gis.Gis_routing.select().where((gis.Gis_routing.sourcecat << sourcecats) 
-				& (gis.Gis_routing.percent > 0) 
-				& (gis.Gis_routing.sinkcat != RouteCat.OUTLET)).order_by(gis.Gis_routing.sourceid)
-		
-		num_rows = len(rows)
-		utils.debug_stdout(DO_DEBUG, '{}, routing rows: {}'.format(attach_key, num_rows))
-
-		ch_source_rows_dict = dict()
-		res_source_rows_dict = dict()
-		if RouteCat.AQU in sourcecats:
-			ch_source_rows = gis.Gis_routing.select().where((gis.Gis_routing.sourcecat == RouteCat.CH) & (gis.Gis_routing.sinkcat == RouteCat.PT))
-			for row in ch_source_rows:
-				ch_source_rows_dict[row.sinkid] = row
+		con_outs = {attach_key: [] for attach_key, id_list in sources.values()}
+		orders = dict()
+		for row in graph.outflows(sources.keys()):
+			attach_key, id_list = sources[row[SOURCE_CAT]]
+			if row[SINK_CAT] == RouteCat.PT and row[SOURCE_CAT] == RouteCat.AQU:
+				# Aquifers recharging a point source connect to the channel or reservoir discharging there
+				con_row = graph.point_inflow(row[SINK_ID], [RouteCat.CH, RouteCat.RES])
+			else:
+				con_row = graph.resolve(row)
+				if con_row is not None and con_row[SINK_CAT] not in supported_sinkcats:
+					con_row = None
 
-			res_source_rows = gis.Gis_routing.select().where((gis.Gis_routing.sourcecat == RouteCat.RES) & (gis.Gis_routing.sinkcat == RouteCat.PT))
-			for row in res_source_rows:
-				res_source_rows_dict[row.sinkid] = row
+			if con_row is None:
+				continue
 
-		orders = dict()
-		row_cnt = 1
-		for row in rows:
-			utils.debug_stdout(DO_DEBUG, '{}, row: {} of {}'.format(attach_key, row_cnt, num_rows))
-			row_cnt += 1
-			if row.sinkcat == RouteCat.PT and RouteCat.AQU in sourcecats:
-				"""source_row = gis.Gis_routing.get_or_none((gis.Gis_routing.sourcecat == RouteCat.CH) & (gis.Gis_routing.sinkcat == RouteCat.PT) & (gis.Gis_routing.sinkid == row.sinkid))
-				if source_row is None:
-					source_row = gis.Gis_routing.get_or_none((gis.Gis_routing.sourcecat == RouteCat.RES) & (gis.Gis_routing.sinkcat == RouteCat.PT) & (gis.Gis_routing.sinkid == row.sinkid))"""
-				source_row = ch_source_rows_dict.get(row.sinkid, None)
-				if source_row is None:
-					source_row = res_source_rows_dict.get(row.sinkid, None)
-
-				if source_row is not None:
-					id = id_list[row.sourceid]
-					if id in orders:
-						orders[id] += 1
-					else:
-						orders[id] = 1
-
-					try:				
-						con_outs.append({
-							attach_key: id,
-							'order': orders[id],
-							'obj_typ': cats_to_obj_typ[source_row.sourcecat],
-							'obj_id': cats_to_list[source_row.sourcecat][source_row.sourceid],
-							'hyd_typ': source_row.hyd_typ,
-							'frac': source_row.percent / 100
-						})
-					except KeyError as ke:
-						raise KeyError('Check gis_routing. It is referencing a missing element. Key error id {}, source_row.sinkcat {}, source_row.sinkid {}. Error: {}'.format(id, source_row.sourcecat, source_row.sourceid, str(ke)))
+			# Rows into a point connect to the object at the other end of it
+			if con_row[SINK_CAT] == RouteCat.PT:
+				obj_cat, obj_gis_id = con_row[SOURCE_CAT], con_row[SOURCE_ID]
 			else:
-				con_row = row
-				#pt_cnt = 1
-				#used_sinkids = []
-				while con_row is not None and con_row.sinkcat == RouteCat.PT:
-					con_row = pt_source_row_dict.get(con_row.sinkid, None)
-					#con_row = gis.Gis_routing.get_or_none((gis.Gis_routing.sourcecat == RouteCat.PT) & (gis.Gis_routing.sourceid == con_row.sinkid))
-					"""if con_row is not None:
-						if con_row.sinkid in used_sinkids:
-							raise KeyError('Check gis_routing - loop detected with source/sink id {}'.format(con_row.sinkid))
-						used_sinkids.append(con_row.sinkid)
-					utils.debug_stdout(DO_DEBUG, 'con_row.sinkid {}, pt_cnt: {}'.format(con_row.sinkid, pt_cnt))
-					pt_cnt += 1"""
-				
-				if con_row is not None and con_row.sinkcat in supported_sinkcats:
-					id = id_list[row.sourceid]
-					if id in orders:
-						orders[id] += 1
-					else:
-						orders[id] = 1
-
-					try:				
-						con_outs.append({
-							attach_key: id,
-							'order': orders[id],
-							'obj_typ': cats_to_obj_typ[con_row.sinkcat],
-							'obj_id': cats_to_list[con_row.sinkcat][con_row.sinkid],
-							'hyd_typ': con_row.hyd_typ,
-							'frac': con_row.percent / 100
-						})
-					except KeyError as ke:
-						raise KeyError('Check gis_routing. It is referencing a missing element. Key error id {}, con_row.sinkcat {}, con_row.sinkid {}. Error: {}'.format(id, con_row.sinkcat, con_row.sinkid, str(ke)))
+				obj_cat, obj_gis_id = con_row[SINK_CAT], con_row[SINK_ID]
+
+			id = id_list[row[SOURCE_ID]]
+			order_key = (attach_key, id)
+			orders[order_key] = orders.get(order_key, 0) + 1
+
+			try:
+				con_outs[attach_key].append({
+					attach_key: id,
+					'order': orders[order_key],
+					'obj_typ': cats_to_obj_typ[obj_cat],
+					'obj_id': cats_to_list[obj_cat][obj_gis_id],
+					'hyd_typ': con_row[HYD_TYP],
+					'frac': con_row[PERCENT] / 100
+				})
+			except KeyError as ke:
+				raise KeyError('Check gis_routing. It is referencing a missing element. Key error id {}, sinkcat {}, sinkid {}. Error: {}'.format(id, obj_cat, obj_gis_id, str(ke)))
 
 		return con_outs
 
@@ -7,6 +7,7 @@ from database.project.connect import Aquifer_con, Channel_con, Rout_unit_con, Re
 from database.project.simulation import Time_sim
 from database import lib as db_lib
 from helpers import utils
+from helpers.spatial import NearestIndex
 from fileio import base as fileio
 
 import sys
@@ -17,6 +18,9 @@ import time, datetime
 import sqlite3
 from peewee import *
 import csv
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import calendar
+import itertools
 
 
 HMD_TXT = "hmd.txt"
@@ -37,6 +41,12 @@ TMP_CLI = "tmp.cli"
 WND_CLI = "wnd.cli"
 PET_CLI = "pet.cli"
 
+# Raw statements for the atmospheric deposition import, run through executemany
+ATMO_STA_INSERT = "INSERT INTO atmo_cli_sta (atmo_cli_id, name) VALUES (?, ?)"
+ATMO_VALUE_INSERT = "INSERT INTO atmo_cli_sta_value (sta_id, timestep, nh4_wet, no3_wet, nh4_dry, no3_dry) VALUES (?, ?, ?, ?, ?, ?)"
+# name, month, year, nh4_rf, no3_rf, nh4_dry, no3_dry columns of the atmospheric deposition CSV file
+ATMO_CSV_CONVERTERS = [str, int, int, float, float, float, float]
+
 WEATHER_DESC = {
 	"hmd": "Relative humidity",
 	"pcp": "Precipitation",
@@ -54,26 +64,26 @@ def weather_sta_name(lat, lon, prefix = 's', mult = 1000):
 	return name
 
 
-def update_closest_lat_lon(update_table, update_field, select_table, select_field="id", wtype=None):
-	where = ""
-	if wtype is not None:
-		where = "where t2.type = ?"
-
-	sql = """with r as
-		(
-			select t1.id as con_id, t2.{select_field} as wid, ((t1.lat - t2.lat) * (t1.lat - t2.lat) + (t1.lon - t2.lon) * (t1.lon - t2.lon)) as ord
-			from {update_table} t1, {select_table} t2 {where}
-			group by con_id
-			having min(ord) or ord = 0
-			order by con_id, ord
-		)
-		update {update_table} set {update_field} = (select wid from r where con_id = {update_table}.id)""".format(
-			update_table=update_table, update_field=update_field, select_table=select_table, select_field=select_field, where=where)
-	
-	if wtype is not None:
-		project_base.db.execute_sql(sql, (wtype,))
+def station_index(select_table, select_field="id", wtype=None):
+	"""Load the coordinates of select_table (rows of type wtype only, if given) into a NearestIndex returning select_field."""
+	if wtype is None:
+		cursor = project_base.db.execute_sql("select lat, lon, {field} from {table} order by id".format(field=select_field, table=select_table))
 	else:
-		project_base.db.execute_sql(sql)
+		cursor = project_base.db.execute_sql("select lat, lon, {field} from {table} where type = ? order by id".format(field=select_field, table=select_table), (wtype,))
+	return NearestIndex(cursor.fetchall())
+
+
+def update_closest_lat_lon(update_table, update_field, select_table, select_field="id", wtype=None, index=None):
+	"""
+	Set update_field of each row of update_table to select_field of the closest row in select_table.
+	Pass index (from station_index) to reuse one index across several tables; rows without coordinates are left as they are.
+	"""
+	if index is None:
+		index = station_index(select_table, select_field, wtype)
+
+	cursor = project_base.db.execute_sql("select id, lat, lon from {table} where lat is not null and lon is not null".format(table=update_table))
+	values = [(id, index.nearest(lat, lon)) for id, lat, lon in cursor.fetchall()]
+	db_lib.bulk_update_column(project_base.db, update_table, update_field, values)
 
 
 def closest_lat_lon(db, table_name, lat, lon, wtype=None):
@@ -102,6 +112,108 @@ def closest_lat_lon(db, table_name, lat, lon, wtype=None):
 	return res[0]
 
 
+def swat2012_value(text):
+	"""Format one SWAT2012 daily value like utils.num_pad(text, default_pad=10), with a fast path for numbers."""
+	try:
+		return "{:10.5f}  ".format(float(text))
+	except ValueError:
+		return utils.num_pad(text, default_pad=10)
+
+
+def write_swat2012_station(source_dir, output_dir, station_obj, weather_type):
+	"""
+	Convert one SWAT2012 station file (start date line, then one value per day) to a SWAT+ weather file.
+	Module level so it can run in a process pool; returns a warning or None.
+	"""
+	source_file = os.path.join(source_dir, "{s}.txt".format(s=station_obj[1]))
+	if not os.path.exists(source_file):
+		return "Skipping {type} import. Station file does not exist: {file}".format(type=weather_type, file=source_file)
+
+	dest_file_name = "{s}.{ext}".format(s=station_obj[1].replace("-", ""), ext=weather_type)
+	dest_file = os.path.join(output_dir, dest_file_name)
+
+	with open(source_file, "r") as station_file:
+		lines = station_file.readlines()
+
+	out = ["{file}: {desc} data - file written by SWAT+ editor {today}\n".format(file=dest_file_name, desc=WEATHER_DESC[weather_type], today=datetime.datetime.now())]
+	out.append("{:>4}{:>10}{:>10}{:>10}{:>10}\n".format("nbyr", "tstep", "lat", "lon", "elev"))
+
+	if len(lines) > 0:
+		ts = time.strptime(lines[0].strip(), "%Y%m%d")
+		start_date = datetime.date(ts.tm_year, ts.tm_mon, ts.tm_mday)
+		end_date = start_date + datetime.timedelta(days=len(lines) - 2)
+		nbyr = end_date.year - start_date.year + 1
+		out.append("{:>4}{:>10}{:>10.3f}{:>10.3f}{:>10.3f}\n".format(nbyr, "0", float(station_obj[2]), float(station_obj[3]), float(station_obj[4])))
+
+		# Step the day of year arithmetically rather than building a date per row
+		year = start_date.year
+		day_of_year = start_date.timetuple().tm_yday
+		days_in_year = 366 if calendar.isleap(year) else 365
+		is_tmp = weather_type == "tmp" or weather_type == "tem"
+		for line in itertools.islice(lines, 1, None):
+			if is_tmp:
+				tmp = [x.strip() for x in line.split(',')]
+				values = swat2012_value(tmp[0]) + swat2012_value(tmp[1])
+			else:
+				values = swat2012_value(line)
+			out.append("{}{:>5} {}\n".format(year, day_of_year, values))
+
+			day_of_year += 1
+			if day_of_year > days_in_year:
+				year += 1
+				day_of_year = 1
+				days_in_year = 366 if calendar.isleap(year) else 365
+
+	with open(dest_file, 'w+') as new_file:
+		new_file.write("".join(out))
+
+	return None
+
+
+def read_last_line(file_path, block_size=4096):
+	"""Return the last non-empty line of a file, reading blocks back from the end instead of the whole file."""
+	with open(file_path, "rb") as f:
+		f.seek(0, os.SEEK_END)
+		pos = f.tell()
+		tail = b""
+		while pos > 0:
+			read_size = min(block_size, pos)
+			pos -= read_size
+			f.seek(pos)
+			tail = f.read(read_size) + tail
+			content = tail.rstrip()
+			line_start = content.rfind(b"\n")
+			if line_start >= 0 or pos == 0:
+				return content[line_start + 1:].decode()
+	return ""
+
+
+def read_station_file_info(station_file):
+	"""
+	Return the lat, lon, first date and last date of a SWAT+ weather station file.
+	Only the header lines and first record are read; the last record is found by seeking from the end of the file.
+	"""
+	with open(station_file, "r") as station_data:
+		lines = [station_data.readline() for j in range(4)]
+
+	station_info = lines[2].strip().split()
+	if len(station_info) < 4:
+		raise ValueError("Invalid value at line 3 of {file}. Expecting nbyr, tstep, lat, long, elev values separated by a space.".format(file=station_file))
+
+	begin_data = lines[3].strip().split()
+	if len(begin_data) < 3:
+		raise ValueError("Invalid value at line 4 of {file}. Expecting year, julian day, and weather value separated by a space.".format(file=station_file))
+
+	start_date = datetime.datetime(int(begin_data[0]), 1, 1) + datetime.timedelta(days=int(begin_data[1])-1)
+
+	last_line = read_last_line(station_file).strip().split()
+	if len(last_line) < 2:
+		raise ValueError("Invalid last line in {file}. Expecting year, julian day, and weather value separated by a space.".format(file=station_file))
+
+	end_date = datetime.datetime(int(last_line[0]), 1, 1) + datetime.timedelta(days=int(last_line[1])-1)
+	return float(station_info[2]), float(station_info[3]), start_date, end_date
+
+
 class WeatherImport(ExecutableApi):
 	def __init__(self, project_db_file, delete_existing, create_stations):
 		self.__abort = False
@@ -140,15 +252,16 @@ class WeatherImport(ExecutableApi):
 		self.emit_progress(start_prog, "Adding weather stations to spatial connection tables...")
 		wst_col = "wst_id"
 		wst_table = "weather_sta_cli"
-		update_closest_lat_lon("aquifer_con", wst_col, wst_table)
-		update_closest_lat_lon("channel_con", wst_col, wst_table)
-		update_closest_lat_lon("chandeg_con", wst_col, wst_table)
-		update_closest_lat_lon("rout_unit_con", wst_col, wst_table)
-		update_closest_lat_lon("reservoir_con", wst_col, wst_table)
-		update_closest_lat_lon("recall_con", wst_col, wst_table)
-		update_closest_lat_lon("exco_con", wst_col, wst_table)
-		update_closest_lat_lon("hru_con", wst_col, wst_table)
-		update_closest_lat_lon("hru_lte_con", wst_col, wst_table)
+		wst_index = station_index(wst_table)
+		update_closest_lat_lon("aquifer_con", wst_col, wst_table, index=wst_index)
+		update_closest_lat_lon("channel_con", wst_col, wst_table, index=wst_index)
+		update_closest_lat_lon("chandeg_con", wst_col, wst_table, index=wst_index)
+		update_closest_lat_lon("rout_unit_con", wst_col, wst_table, index=wst_index)
+		update_closest_lat_lon("reservoir_con", wst_col, wst_table, index=wst_index)
+		update_closest_lat_lon("recall_con", wst_col, wst_table, index=wst_index)
+		update_closest_lat_lon("exco_con", wst_col, wst_table, index=wst_index)
+		update_closest_lat_lon("hru_con", wst_col, wst_table, index=wst_index)
+		update_closest_lat_lon("hru_lte_con", wst_col, wst_table, index=wst_index)
 		update_closest_lat_lon("weather_sta_cli", "wgn_id", "weather_wgn_cli")
 
 		"""self.match_stations_table(Aquifer_con, "aquifer connections", start_prog)
@@ -164,25 +277,12 @@ class WeatherImport(ExecutableApi):
 
 	def match_stations_table(self, table, name, prog):
 		self.emit_progress(prog, "Adding weather stations to {name}...".format(name=name))
-		with project_base.db.atomic():
-			for row in table.select():
-				coords_key = "{lat},{lon}".format(lat=row.lat, lon=row.lon)
-				id = self.coords_to_stations.get(coords_key, None)
-				if id is None:
-					id = closest_lat_lon(project_base.db, "weather_sta_cli", row.lat, row.lon)
-					self.coords_to_stations[coords_key] = id
-
-				row.wst = id
-				row.save()
+		update_closest_lat_lon(table._meta.table_name, "wst_id", "weather_sta_cli")
 
 	def match_wgn(self, prog):
 		if Weather_wgn_cli.select().count() > 0:
 			self.emit_progress(prog, "Matching wgn to weather stations...")
-			with project_base.db.atomic():
-				for row in Weather_sta_cli.select():
-					id = closest_lat_lon(project_base.db, "weather_wgn_cli", row.lat, row.lon)
-					row.wgn = id
-					row.save()
+			update_closest_lat_lon("weather_sta_cli", "wgn_id", "weather_wgn_cli")
 
 	def create_weather_stations(self, start_prog, total_prog):  # total_prog is the total progress percentage available for this method
 		if self.__abort: return
@@ -311,6 +411,8 @@ class WeatherImport(ExecutableApi):
 			self.emit_progress(prog, "Inserting {type} files and coordinates...".format(type=weather_type))
 			weather_files = []
 			dir = os.path.dirname(source_file)
+			existing = set(row.filename for row in Weather_file.select(Weather_file.filename).where(Weather_file.type == weather_type))
+			scan_files = []
 			try:
 				with open(source_file, "r") as source_data:
 					i = 0
@@ -318,68 +420,46 @@ class WeatherImport(ExecutableApi):
 						if self.__abort:
 							break
 
-						if i > 1:
+						if i > 1 and line.strip():
 							station_name = line.strip('\n')
 							station_file = os.path.join(dir, station_name)
 							if not os.path.exists(station_file):
 								raise IOError("File {file} not found. Weather data import aborted.".format(file=station_file))
 
-							existing = Weather_file.get_or_none((Weather_file.filename == station_name) & (Weather_file.type == weather_type))
-							if existing is None:
-								try:
-									with open(station_file, "r") as station_data:
-										j = 0
-										for sline in station_data:
-											if j == 2:
-												station_info = sline.strip().split()
-												if len(station_info) < 4:
-													raise ValueError("Invalid value at line {ln} of {file}. Expecting nbyr, tstep, lat, long, elev values separated by a space.".format(ln=str(j + 1), file=station_file))
-
-												lat = float(station_info[2])
-												lon = float(station_info[3])
-
-												file = {
-													"filename": station_name,
-													"type": weather_type,
-													"lat": lat,
-													"lon": lon
-												}
-												weather_files.append(file)
-											elif j == 3:
-												begin_data = sline.strip().split()
-												if len(begin_data) < 3:
-													raise ValueError("Invalid value at line {ln} of {file}. Expecting year, julian day, and weather value separated by a space.".format(ln=str(j + 1), file=station_file))
-
-												date = datetime.datetime(int(begin_data[0]), 1, 1)
-												current_start_date = date + datetime.timedelta(days=int(begin_data[1])-1)
-												#if start_date is not None and current_start_date != start_date:
-												#	raise ValueError("Start dates in weather files do not match. Make sure all weather files have the same starting and ending dates.")
-
-												#start_date = current_start_date
-												starts.append(current_start_date)
-											elif j > 3:
-												break
-
-											j += 1
-
-										#non_empty_lines = [sline for sline in station_data if sline]
-										#last_line = non_empty_lines[len(non_empty_lines)-1].strip().split()
-										last_line = list(filter(str.strip, station_data))[-1].strip().split()
-										
-										date = datetime.datetime(int(last_line[0]), 1, 1)
-										current_end_date = date + datetime.timedelta(days=int(last_line[1])-1)
-										#if end_date is not None and current_end_date != end_date:
-										#	raise ValueError("Ending dates in weather files do not match. Make sure all weather files have the same starting and ending dates.")
-
-										#end_date = current_end_date
-										ends.append(current_end_date)
-								except UnicodeDecodeError:
-									sys.exit('Non-unicode character detected in {}. Please check the first line of the file and remove any accents or other characters that are not UTF-8 encoding.'.format(station_file))
+							if station_name not in existing:
+								existing.add(station_name)
+								scan_files.append((station_name, station_file))
 
 						i += 1
 			except UnicodeDecodeError:
 				sys.exit('Non-unicode character detected in {}. Please check your station names and remove any accents or other characters that are not UTF-8 encoding.'.format(source_file))
 
+			# Station files are independent and mostly waiting on disk, so scan them in a thread pool
+			with ThreadPoolExecutor() as executor:
+				futures = [executor.submit(read_station_file_info, station_file) for station_name, station_file in scan_files]
+				for (station_name, station_file), future in zip(scan_files, futures):
+					if self.__abort:
+						executor.shutdown(cancel_futures=True)
+						break
+
+					try:
+						lat, lon, current_start_date, current_end_date = future.result()
+					except UnicodeDecodeError:
+						executor.shutdown(cancel_futures=True)
+						sys.exit('Non-unicode character detected in {}. Please check the first line of the file and remove any accents or other characters that are not UTF-8 encoding.'.format(station_file))
+					except Exception:
+						executor.shutdown(cancel_futures=True)
+						raise
+
+					weather_files.append({
+						"filename": station_name,
+						"type": weather_type,
+						"lat": lat,
+						"lon": lon
+					})
+					starts.append(current_start_date)
+					ends.append(current_end_date)
+
 			db_lib.bulk_insert(project_base.db, Weather_file, weather_files)
 			if len(starts) > 0 and len(ends) > 0:
 				start_date = max(starts)
@@ -618,15 +698,16 @@ class NetCDFWeatherImport(ExecutableApi):
 		self.emit_progress(start_prog, "Adding weather stations to spatial connection tables...")
 		wst_col = "wst_id"
 		wst_table = "weather_sta_cli"
-		update_closest_lat_lon("aquifer_con", wst_col, wst_table)
-		update_closest_lat_lon("channel_con", wst_col, wst_table)
-		update_closest_lat_lon("chandeg_con", wst_col, wst_table)
-		update_closest_lat_lon("rout_unit_con", wst_col, wst_table)
-		update_closest_lat_lon("reservoir_con", wst_col, wst_table)
-		update_closest_lat_lon("recall_con", wst_col, wst_table)
-		update_closest_lat_lon("exco_con", wst_col, wst_table)
-		update_closest_lat_lon("hru_con", wst_col, wst_table)
-		update_closest_lat_lon("hru_lte_con", wst_col, wst_table)
+		wst_index = station_index(wst_table)
+		update_closest_lat_lon("aquifer_con", wst_col, wst_table, index=wst_index)
+		update_closest_lat_lon("channel_con", wst_col, wst_table, index=wst_index)
+		update_closest_lat_lon("chandeg_con", wst_col, wst_table, index=wst_index)
+		update_closest_lat_lon("rout_unit_con", wst_col, wst_table, index=wst_index)
+		update_closest_lat_lon("reservoir_con", wst_col, wst_table, index=wst_index)
+		update_closest_lat_lon("recall_con", wst_col, wst_table, index=wst_index)
+		update_closest_lat_lon("exco_con", wst_col, wst_table, index=wst_index)
+		update_closest_lat_lon("hru_con", wst_col, wst_table, index=wst_index)
+		update_closest_lat_lon("hru_lte_con", wst_col, wst_table, index=wst_index)
 		update_closest_lat_lon("weather_sta_cli", "wgn_id", "weather_wgn_cli")
 
 	def add_scale_factors(self, start_prog):
@@ -654,7 +735,7 @@ class NetCDFWeatherImport(ExecutableApi):
 
 
 class Swat2012WeatherImport(ExecutableApi):
-	def __init__(self, project_db_file, delete_existing, create_stations, source_dir):
+	def __init__(self, project_db_file, delete_existing, create_stations, source_dir, workers=None):
 		self.__abort = False
 		SetupProjectDatabase.init(project_db_file)
 		config = Project_config.get()
@@ -669,6 +750,8 @@ class Swat2012WeatherImport(ExecutableApi):
 		self.source_dir = source_dir
 		self.delete_existing = delete_existing
 		self.create_stations = create_stations
+		self.workers = workers if workers is not None else (os.cpu_count() or 1)
+		self.progress_batch_size = 50
 
 	def import_data(self):
 		try:
@@ -736,105 +819,55 @@ class Swat2012WeatherImport(ExecutableApi):
 			with open(dest_file, 'w+') as new_file:
 				new_file.write("{file}.cli: {desc} file names - file written by SWAT+ editor {today}\n".format(file=weather_type, desc=WEATHER_DESC[weather_type], today=datetime.datetime.now()))
 				new_file.write("filename\n")
-				new_file_names = []
 
+				stations = []
 				try:
 					with open(source_file, "r") as source_data:
-						i = 0
-						curr_file_num = starting_file_num
-						for line in source_data:
-							if self.__abort:
-								break
-
+						for i, line in enumerate(source_data):
 							if i == 0 and not "ID,NAME,LAT,LONG,ELEVATION" in line:
-								return curr_file_num, "Skipping {type} import. Invalid file format in header: {file}. Expecting 'ID,NAME,LAT,LONG,ELEVATION'".format(type=weather_type, file=source_file)
+								return starting_file_num, "Skipping {type} import. Invalid file format in header: {file}. Expecting 'ID,NAME,LAT,LONG,ELEVATION'".format(type=weather_type, file=source_file)
 							if i > 0:
 								station_obj = [x.strip() for x in line.split(',')]
 								if len(station_obj) != 5:
-									return curr_file_num, "Skipping {type} import. Invalid file format in line {line_no}: {file}, {line}".format(type=weather_type, line_no=i+1, file=source_file, line=line)
-
-								new_file_name = "{s}.{ext}".format(s=station_obj[1].replace("-", ""), ext=weather_type)
-								new_file_names.append(new_file_name)
-								#new_file.write(new_file_name)
-								#new_file.write("\n")
-
-								self.write_station(os.path.dirname(source_file), station_obj, weather_type)
-								prog = round(curr_file_num * 100 / total_files)
-								self.emit_progress(prog, "Writing {type}, {file}...".format(type=weather_type, file=new_file_name))
-								curr_file_num += 1
-
-							i += 1
+									return starting_file_num, "Skipping {type} import. Invalid file format in line {line_no}: {file}, {line}".format(type=weather_type, line_no=i+1, file=source_file, line=line)
+								stations.append(station_obj)
 				except UnicodeDecodeError:
 					sys.exit('Non-unicode character detected in {}. Please check your station names and remove any accents or other characters that are not UTF-8 encoding.'.format(source_file))
 
+				new_file_names = ["{s}.{ext}".format(s=station_obj[1].replace("-", ""), ext=weather_type) for station_obj in stations]
+				curr_file_num = self.write_stations(os.path.dirname(source_file), stations, weather_type, starting_file_num, total_files)
+
 				for fn in sorted(new_file_names, key=str.lower):
 					new_file.write(fn)
 					new_file.write("\n")
 
 			return curr_file_num, None
 
-	def write_station(self, dir, station_obj, weather_type):
-		source_file = os.path.join(dir, "{s}.txt".format(s=station_obj[1]))
-		if not os.path.exists(source_file):
-			return "Skipping {type} import. Station file does not exist: {file}".format(type=weather_type, file=source_file)
-
-		dest_file_name = "{s}.{ext}".format(s=station_obj[1].replace("-", ""), ext=weather_type)
-		dest_file = os.path.join(self.output_dir, dest_file_name)
-
-		with open(dest_file, 'w+') as new_file:
-			new_file.write("{file}: {desc} data - file written by SWAT+ editor {today}\n".format(file=dest_file_name, desc=WEATHER_DESC[weather_type], today=datetime.datetime.now()))
-			new_file.write("nbyr".rjust(4))
-			new_file.write("tstep".rjust(10))
-			new_file.write("lat".rjust(10))
-			new_file.write("lon".rjust(10))
-			new_file.write("elev".rjust(10))
-			new_file.write("\n")
-
-			linecount = self.file_len(source_file)
-			total_days = linecount - 2 if linecount > 0 else 0
-
-			with open(source_file, "r") as station_file:
-				i = 0
-				date = None
-				for line in station_file:
-					if i == 0:
-						ts = time.strptime(line.strip(), "%Y%m%d")
-						date = datetime.datetime(ts.tm_year, ts.tm_mon, ts.tm_mday)
-						start_date = date
-
-						end_date = start_date + datetime.timedelta(days=total_days)
-						nbyr = end_date.year - start_date.year + 1
-
-						new_file.write(str(nbyr).rjust(4))
-						new_file.write("0".rjust(10))
-						new_file.write("{0:.3f}".format(float(station_obj[2])).rjust(10))
-						new_file.write("{0:.3f}".format(float(station_obj[3])).rjust(10))
-						new_file.write("{0:.3f}".format(float(station_obj[4])).rjust(10))
-						new_file.write("\n")
-					else:
-						day_of_year = date.timetuple().tm_yday
-
-						new_file.write(str(date.year))
-						new_file.write(str(day_of_year).rjust(5))
-						new_file.write(' ')
+	def write_stations(self, dir, stations, weather_type, starting_file_num, total_files):
+		"""Convert the station files in a process pool, reporting progress once per batch of finished stations."""
+		curr_file_num = starting_file_num
+		if len(stations) < 1:
+			return curr_file_num
 
-						if weather_type == "tmp" or weather_type == "tem":
-							tmp = [x.strip() for x in line.split(',')]
-							utils.write_num(new_file, tmp[0], default_pad=10)
-							utils.write_num(new_file, tmp[1], default_pad=10)
-						else:
-							utils.write_num(new_file, line, default_pad=10)
-						new_file.write("\n")
-
-						date = date + datetime.timedelta(days=1)
+		workers = min(self.workers, len(stations))
+		batch_size = max(self.progress_batch_size, workers)
+		with ProcessPoolExecutor(max_workers=workers) as executor:
+			futures = [executor.submit(write_swat2012_station, dir, self.output_dir, station_obj, weather_type) for station_obj in stations]
+			try:
+				for i, future in enumerate(futures):
+					if self.__abort:
+						break
 
-					i += 1
+					future.result()
+					curr_file_num += 1
+					if (i + 1) % batch_size == 0 or i + 1 == len(futures):
+						prog = round(curr_file_num * 100 / total_files)
+						self.emit_progress(prog, "Writing {type}, {done}/{total} stations...".format(type=weather_type, done=i + 1, total=len(futures)))
+			finally:
+				for future in futures:
+					future.cancel()
 
-	def file_len(self, fname):
-		with open(fname) as f:
-			for i, l in enumerate(f):
-				pass
-		return i + 1
+		return curr_file_num
 
 
 class WgnImport(ExecutableApi):
@@ -912,9 +945,12 @@ class WgnImport(ExecutableApi):
 			sys.exit('Your CSV files contain a character that is not UTF-8 encoding. Please check your station names and remove any accents or other non-unicode characters.')
 
 	def add_wgn_stations_db(self, start_prog, total_prog):
+		"""
+		Copy stations and their monthly values from the WGN database with two INSERT ... SELECT statements on the attached database.
+		Stations are limited to the extent of the project (routing units, else channels) plus a tolerance, and skipped if the name already exists.
+		"""
 		if self.__abort: return
 		conn = sqlite3.connect(self.wgn_database)
-		conn.row_factory = sqlite3.Row
 
 		monthly_table = "{}_mon".format(self.wgn_table)
 
@@ -925,115 +961,45 @@ class WgnImport(ExecutableApi):
 		if not db_lib.exists_table(conn, monthly_table):
 			raise ValueError(
 				"Table {table} does not exist in {file}.".format(table=monthly_table, file=self.wgn_database))
-
-		if Rout_unit_con.select().count() > 0:
-			coords = Rout_unit_con.select(fn.Min(Rout_unit_con.lat).alias("min_lat"),
-										  fn.Max(Rout_unit_con.lat).alias("max_lat"),
-										  fn.Min(Rout_unit_con.lon).alias("min_lon"),
-										  fn.Max(Rout_unit_con.lon).alias("max_lon")
-										  ).get()
-
-			query = "select * from {table_name} where lat between ? and ? and lon between ? and ? order by name".format(table_name=self.wgn_table)
-			tol = 0.5
-			cursor = conn.cursor().execute(query, (coords.min_lat - tol, coords.max_lat + tol, coords.min_lon - tol, coords.max_lon + tol))
-		elif Chandeg_con.select().count() > 0:
-			coords = Chandeg_con.select(fn.Min(Chandeg_con.lat).alias("min_lat"),
-										  fn.Max(Chandeg_con.lat).alias("max_lat"),
-										  fn.Min(Chandeg_con.lon).alias("min_lon"),
-										  fn.Max(Chandeg_con.lon).alias("max_lon")
-										  ).get()
-
-			query = "select * from {table_name} where lat between ? and ? and lon between ? and ? order by name".format(table_name=self.wgn_table)
+		conn.close()
+
+		where = ""
+		params = []
+		bounds_table = Rout_unit_con if Rout_unit_con.select().count() > 0 else (Chandeg_con if Chandeg_con.select().count() > 0 else None)
+		if bounds_table is not None:
+			coords = bounds_table.select(fn.Min(bounds_table.lat).alias("min_lat"),
+										 fn.Max(bounds_table.lat).alias("max_lat"),
+										 fn.Min(bounds_table.lon).alias("min_lon"),
+										 fn.Max(bounds_table.lon).alias("max_lon")
+										 ).get()
 			tol = 0.5
-			cursor = conn.cursor().execute(query, (coords.min_lat - tol, coords.max_lat + tol, coords.min_lon - tol, coords.max_lon + tol))
-		else:
-			query = "select * from {table_name} order by name".format(table_name=self.wgn_table)
-			cursor = conn.cursor().execute(query)
-
-		wgns = []
-		ids = []
-
-		data = cursor.fetchall()
-		records = len(data)
-		#print(records)
-
-		i = 1
-		for row in data:
-			if self.__abort: return
+			where = "and w.lat between ? and ? and w.lon between ? and ?"
+			params = [coords.min_lat - tol, coords.max_lat + tol, coords.min_lon - tol, coords.max_lon + tol]
 
-			try:
-				existing = Weather_wgn_cli.get(Weather_wgn_cli.name == row['name'])
-			except Weather_wgn_cli.DoesNotExist:
-				prog = round(i * (total_prog / 2) / records) + start_prog
-				self.emit_progress(prog, "Preparing weather generator {name}...".format(name=row['name']))
-				i += 1
+		mon_cols = ["month", "tmp_max_ave", "tmp_min_ave", "tmp_max_sd", "tmp_min_sd", "pcp_ave", "pcp_sd", "pcp_skew", "wet_dry", "wet_wet", "pcp_days", "pcp_hhr", "slr_ave", "dew_ave", "wnd_ave"]
 
-				ids.append(row['id'])
-				wgn = {
-					"id": row['id'],
-					"name": row['name'],
-					"lat": row['lat'],
-					"lon": row['lon'],
-					"elev": row['elev'],
-					"rain_yrs": row['rain_yrs']
-				}
-				wgns.append(wgn)
-
-		prog = start_prog if records < 1 else round(i * (total_prog / 2) / records) + start_prog
-		self.emit_progress(prog, "Inserting {total} weather generators...".format(total=len(ids)))
-		db_lib.bulk_insert(project_base.db, Weather_wgn_cli, wgns)
-
-		# Chunk the id array so we don't hit the SQLite parameter limit!
-		max_length = 999
-		id_chunks = [ids[i:i + max_length] for i in range(0, len(ids), max_length)]
-
-		i = 1
-		start_prog = start_prog + (total_prog / 2)
-
-		mon_count_query = "select count(*) from {table_name}".format(table_name=monthly_table)
-		total_mon_rows = conn.cursor().execute(mon_count_query).fetchone()[0]
-		current_total = 0
-
-		for chunk in id_chunks:
-			monthly_values = []
-			mon_query = "select * from {table_name} where wgn_id in ({ids})".format(table_name=monthly_table, ids=",".join('?'*len(chunk)))
-			mon_cursor = conn.cursor().execute(mon_query, chunk)
-			mon_data = mon_cursor.fetchall()
-			mon_records = len(mon_data)
-			i = 1
+		db = project_base.db
+		db.execute_sql("ATTACH DATABASE ? AS wgn_source", (self.wgn_database,))
+		try:
+			with db.atomic():
+				self.emit_progress(start_prog, "Inserting weather generators...")
+				db.execute_sql("drop table if exists temp.wgn_new")
+				db.execute_sql("""create temp table wgn_new as
+					select w.id from wgn_source.{table} w
+					where not exists (select 1 from weather_wgn_cli p where p.name = w.name) {where}""".format(table=self.wgn_table, where=where), params)
+				cursor = db.execute_sql("""insert into weather_wgn_cli (id, name, lat, lon, elev, rain_yrs)
+					select w.id, w.name, w.lat, w.lon, w.elev, w.rain_yrs from wgn_source.{table} w
+					where w.id in (select id from temp.wgn_new) order by w.name""".format(table=self.wgn_table))
+				records = cursor.rowcount
 
-			for row in mon_data:
 				if self.__abort: return
-
-				if i == 1 or (i % 12 == 0):
-					prog = round(i * (total_prog / 2) / mon_records) + start_prog
-					self.emit_progress(prog, "Preparing monthly values {i}/{total}...".format(i=i, total=mon_records))
-				i += 1
-
-				mon = {
-					"weather_wgn_cli": row['wgn_id'],
-					"month": row['month'],
-					"tmp_max_ave": row['tmp_max_ave'],
-					"tmp_min_ave": row['tmp_min_ave'],
-					"tmp_max_sd": row['tmp_max_sd'],
-					"tmp_min_sd": row['tmp_min_sd'],
-					"pcp_ave": row['pcp_ave'],
-					"pcp_sd": row['pcp_sd'],
-					"pcp_skew": row['pcp_skew'],
-					"wet_dry": row['wet_dry'],
-					"wet_wet": row['wet_wet'],
-					"pcp_days": row['pcp_days'],
-					"pcp_hhr": row['pcp_hhr'],
-					"slr_ave": row['slr_ave'],
-					"dew_ave": row['dew_ave'],
-					"wnd_ave": row['wnd_ave']
-				}
-				monthly_values.append(mon)
-
-			prog = round(i * (total_prog / 2) / mon_records) + start_prog
-			current_total = current_total + mon_records
-			self.emit_progress(prog, "Inserting monthly values {rec}/{total}...".format(rec=current_total, total=total_mon_rows))
-			db_lib.bulk_insert(project_base.db, Weather_wgn_cli_mon, monthly_values)
+				self.emit_progress(round(start_prog + total_prog / 2), "Inserting monthly values for {total} weather generators...".format(total=records))
+				db.execute_sql("""insert into weather_wgn_cli_mon (weather_wgn_cli_id, {cols})
+					select m.wgn_id, {m_cols} from wgn_source.{table} m
+					where m.wgn_id in (select id from temp.wgn_new) order by m.id""".format(table=monthly_table, cols=", ".join(mon_cols), m_cols=", ".join("m." + c for c in mon_cols)))
+				db.execute_sql("drop table temp.wgn_new")
+		finally:
+			db.execute_sql("DETACH DATABASE wgn_source")
 
 	def add_wgn_stations_sf(self, start_prog, total_prog):
 		if self.__abort: return
@@ -1182,22 +1148,12 @@ class WgnImport(ExecutableApi):
 
 	def match_to_weather_stations(self, start_prog, total_prog):
 		if Weather_wgn_cli.select().count() > 0:
-			with project_base.db.atomic():
-				query = Weather_sta_cli.select()
-				records = query.count()
-				i = 1
-				for row in query:
-					if self.__abort: return
-
-					prog = round(i * total_prog / records) + start_prog
-					i += 1
-
-					if row.lat is not None and row.lon is not None:
-						id = closest_lat_lon(project_base.db, "weather_wgn_cli", row.lat, row.lon)
+			if self.__abort: return
 
-						self.emit_progress(prog, "Updating weather station with generator {i}/{total}...".format(i=i, total=records))
-						row.wgn_id = id
-						row.save()
+			records = Weather_sta_cli.select().count()
+			self.emit_progress(start_prog, "Updating {total} weather stations with closest generator...".format(total=records))
+			update_closest_lat_lon("weather_sta_cli", "wgn_id", "weather_wgn_cli")
+			self.emit_progress(start_prog + total_prog, "Updated weather stations with closest generator")
 
 
 
@@ -1211,6 +1167,7 @@ class AtmoImport(ExecutableApi):
 		self.import_method = import_method
 		self.atmo_data_file = file1
 		self.atmo_to_stations_file = file2
+		self.chunk_size = 10000
 
 		if delete_existing:
 			self.delete_existing()
@@ -1238,102 +1195,85 @@ class AtmoImport(ExecutableApi):
 		#csv headers: name,month,year,nh4_rf,no3_rf,nh4_dry,no3_dry
 		if self.__abort: return
 
-		csv_file = open(self.atmo_data_file, "r")
-
-		dialect = csv.Sniffer().sniff(csv_file.readline())
-		csv_file.seek(0)
-		replace_commas = dialect is not None and dialect.delimiter != ','
-		hasHeader = csv.Sniffer().has_header(csv_file.readline())
-		csv_file.seek(0)
-
-		csv_reader = csv.reader(csv_file, dialect)
-
-		if hasHeader:
-			headerLine = next(csv_reader)
+		with open(self.atmo_data_file, "r") as csv_file:
+			dialect = csv.Sniffer().sniff(csv_file.readline())
+			csv_file.seek(0)
+			replace_commas = dialect is not None and dialect.delimiter != ','
+			hasHeader = csv.Sniffer().has_header(csv_file.readline())
+			csv_file.seek(0)
 
-		i = 0
-		stations = []
-		stations_to_values = {}
-		self.emit_progress(round(total_prog*0.5), 'Reading CSV file...')
-		for val in csv_reader:
-			if replace_commas:
-				val = [item.replace(',', '.', 1) for item in val]
-
-			if len(val) < 7:
-				sys.exit('Invalid csv file format. Ensure your data has the following columns: name,month,year,nh4_rf,no3_rf,nh4_dry,no3_dry')
-			name = utils.val_if_null(val[0], 'atmo{}'.format(i+1))
-			month = utils.val_if_null(int(val[1]), 0)
-			year = utils.val_if_null(int(val[2]), 0)
-			nh4_rf = utils.val_if_null(float(val[3]), 0)
-			no3_rf = utils.val_if_null(float(val[4]), 0)
-			nh4_dry = utils.val_if_null(float(val[5]), 0)
-			no3_dry = utils.val_if_null(float(val[6]), 0)
-
-			if i == 0:
-				if month == 0 and year == 0:
-					self.atmo_cli.timestep = 'aa'
-				elif month == 0:
-					self.atmo_cli.timestep = 'yr'
-				else:
-					self.atmo_cli.timestep = 'mo'
-
-				self.atmo_cli.mo_init = month
-				self.atmo_cli.yr_init = year
-				self.atmo_cli.save()
+			csv_reader = csv.reader(csv_file, dialect)
 
-			if name not in stations:
-				stations.append(name)
-				stations_to_values[name] = []
-
-			timestep = 0
-			if self.atmo_cli.timestep == 'mo':
-				timestep = int('{y}{m}'.format(y=year, m=str(month).rjust(2, '0')))
-			elif self.atmo_cli.timestep == 'yr':
-				timestep = year
-
-			data = {
-				'timestep': timestep,
-				'nh4_wet': nh4_rf,
-				'no3_wet': no3_rf,
-				'nh4_dry': nh4_dry,
-				'no3_dry': no3_dry
-			}
-
-			stations_to_values[name].append(data)
-			i += 1
+			if hasHeader:
+				headerLine = next(csv_reader)
 
-		self.emit_progress(round(total_prog*0.75), 'Inserting stations into project database...')
-		stations_db = [{ 'atmo_cli': self.atmo_cli.id, 'name': v } for v in stations]
-		db_lib.bulk_insert(self.project_db, Atmo_cli_sta, stations_db)
-		name_to_id = {}
-		for row in Atmo_cli_sta.select(Atmo_cli_sta.id, Atmo_cli_sta.name):
-			name_to_id[row.name] = row.id
-
-		station_values = []
-		i = 0
-		for name in stations_to_values:
-			id = name_to_id[name]
-			for v in stations_to_values[name]:
-				v['sta'] = id
-				station_values.append(v)
-			if i == 0:
-				self.atmo_cli.num_aa = 0 if self.atmo_cli.timestep == 'aa' else len(stations_to_values[name])
+			self.emit_progress(start_prog, 'Reading CSV file...')
+			conn = self.project_db.connection()
+			station_ids = {}
+			first_station_id = None
+			first_station_rows = 0
+			chunk = []
+			rows = 0
+			with self.project_db.atomic():
+				for val in csv_reader:
+					if replace_commas:
+						val = [item.replace(',', '.', 1) for item in val]
+
+					if len(val) < 7:
+						sys.exit('Invalid csv file format. Ensure your data has the following columns: name,month,year,nh4_rf,no3_rf,nh4_dry,no3_dry')
+					name, month, year, nh4_rf, no3_rf, nh4_dry, no3_dry = [convert(v) for convert, v in zip(ATMO_CSV_CONVERTERS, val)]
+					name = utils.val_if_null(name, 'atmo{}'.format(rows + 1))
+
+					if rows == 0:
+						if month == 0 and year == 0:
+							self.atmo_cli.timestep = 'aa'
+						elif month == 0:
+							self.atmo_cli.timestep = 'yr'
+						else:
+							self.atmo_cli.timestep = 'mo'
+
+						self.atmo_cli.mo_init = month
+						self.atmo_cli.yr_init = year
+
+					sta_id = station_ids.get(name, None)
+					if sta_id is None:
+						sta_id = conn.execute(ATMO_STA_INSERT, (self.atmo_cli.id, name)).lastrowid
+						station_ids[name] = sta_id
+						if first_station_id is None:
+							first_station_id = sta_id
+					if sta_id == first_station_id:
+						first_station_rows += 1
+
+					timestep = 0
+					if self.atmo_cli.timestep == 'mo':
+						timestep = year * 100 + month
+					elif self.atmo_cli.timestep == 'yr':
+						timestep = year
+
+					chunk.append((sta_id, timestep, nh4_rf, no3_rf, nh4_dry, no3_dry))
+					rows += 1
+					if len(chunk) >= self.chunk_size:
+						conn.executemany(ATMO_VALUE_INSERT, chunk)
+						chunk = []
+						self.emit_progress(start_prog + round(total_prog * 0.5), 'Inserting values into project database, {n} rows...'.format(n=rows))
+
+				conn.executemany(ATMO_VALUE_INSERT, chunk)
+
+				self.atmo_cli.num_aa = 0 if self.atmo_cli.timestep == 'aa' else first_station_rows
 				self.atmo_cli.save()
-			i += 1
-
-		self.emit_progress(round(total_prog*0.90), 'Inserting values into project database...')
-		db_lib.bulk_insert(self.project_db, Atmo_cli_sta_value, station_values)
-		
 
 	def read_data_file_cli(self, start_prog, total_prog):
 		if self.__abort: return
-		with open(self.atmo_data_file, 'r') as atmo_data:
+		conn = self.project_db.connection()
+		with open(self.atmo_data_file, 'r') as atmo_data, self.project_db.atomic():
 			i = 0
 			current_station_line = 3
-			current_station = ''
-			stations = []
-			stations_to_values = {}
-			self.emit_progress(start_prog + round(total_prog*0.5), 'Reading atmo.cli file...')
+			sta_id = None
+			lines = {}
+			timesteps = []
+			chunk = []
+			stations = 0
+			self.emit_progress(start_prog, 'Reading atmo.cli file...')
 			for line in atmo_data:
 				if self.__abort: break
 				if i == 2:
@@ -1346,67 +1286,44 @@ class AtmoImport(ExecutableApi):
 					self.atmo_cli.yr_init = int(val[3].strip())
 					self.atmo_cli.num_aa = int(val[4].strip())
 					self.atmo_cli.save()
+					timesteps = self.get_atmo_timesteps()
 				
 				if i > 2:
 					val = line.split()
 					if len(val) > 0:
 						if i == current_station_line:
-							current_station = val[0].strip()
-							stations.append(current_station)
-							stations_to_values[current_station] = {}
-						elif i == current_station_line + 1:
-							stations_to_values[current_station]['nh4_rf'] = self.get_atmo_cli_data_line(line)
-						elif i == current_station_line + 2:
-							stations_to_values[current_station]['no3_rf'] = self.get_atmo_cli_data_line(line)
-						elif i == current_station_line + 3:
-							stations_to_values[current_station]['nh4_dry'] = self.get_atmo_cli_data_line(line)
+							sta_id = conn.execute(ATMO_STA_INSERT, (self.atmo_cli.id, val[0].strip())).lastrowid
+						elif i < current_station_line + 4:
+							lines[i - current_station_line] = self.get_atmo_cli_data_line(line, i + 1)
 						elif i == current_station_line + 4:
-							stations_to_values[current_station]['no3_dry'] = self.get_atmo_cli_data_line(line)
+							chunk.extend(zip(itertools.repeat(sta_id), timesteps, lines[1], lines[2], lines[3], self.get_atmo_cli_data_line(line, i + 1)))
 							current_station_line += 5
+							stations += 1
+							if len(chunk) >= self.chunk_size:
+								conn.executemany(ATMO_VALUE_INSERT, chunk)
+								chunk = []
+								self.emit_progress(start_prog + round(total_prog * 0.5), 'Inserting values into project database, {n} stations...'.format(n=stations))
 				
 				i += 1
 
-		self.emit_progress(round(total_prog*0.75), 'Inserting stations into project database...')
-		stations_db = [{ 'atmo_cli': self.atmo_cli.id, 'name': v } for v in stations]
-		db_lib.bulk_insert(self.project_db, Atmo_cli_sta, stations_db)
-		name_to_id = {}
-		for row in Atmo_cli_sta.select(Atmo_cli_sta.id, Atmo_cli_sta.name):
-			name_to_id[row.name] = row.id
+			conn.executemany(ATMO_VALUE_INSERT, chunk)
 
-		station_values = []
-		num_aa = 1 if self.atmo_cli.timestep == 'aa' else self.atmo_cli.num_aa
-		start_date = datetime.date.today()
+	def get_atmo_timesteps(self):
+		"""Return the timestep value of each of the num_aa values of a station in atmo.cli."""
 		if self.atmo_cli.timestep == 'mo':
 			start_date = datetime.date(self.atmo_cli.yr_init, self.atmo_cli.mo_init, 1)
-		for name in stations_to_values:
-			id = name_to_id[name]
-			j = 0
-			while j < num_aa:
-				timestep = 0
-				if self.atmo_cli.timestep == 'mo':
-					item_date = utils.add_months(start_date, j)
-					timestep = int('{y}{m}'.format(y=item_date.year, m=str(item_date.month).rjust(2, '0')))
-				elif self.atmo_cli.timestep == 'yr':
-					timestep = self.atmo_cli.yr_init + j
-				data = {
-					'sta': id,
-					'timestep': timestep,
-					'nh4_wet': stations_to_values[name]['nh4_rf'][j],
-					'no3_wet': stations_to_values[name]['no3_rf'][j],
-					'nh4_dry': stations_to_values[name]['nh4_dry'][j],
-					'no3_dry': stations_to_values[name]['no3_dry'][j]
-				}
-				station_values.append(data)
-				j += 1
-				
-		self.emit_progress(round(total_prog*0.90), 'Inserting values into project database...')
-		db_lib.bulk_insert(self.project_db, Atmo_cli_sta_value, station_values)
+			return [int('{y}{m}'.format(y=d.year, m=str(d.month).rjust(2, '0'))) for d in (utils.add_months(start_date, j) for j in range(self.atmo_cli.num_aa))]
+		elif self.atmo_cli.timestep == 'yr':
+			return [self.atmo_cli.yr_init + j for j in range(self.atmo_cli.num_aa)]
+		return [0] * (1 if self.atmo_cli.timestep == 'aa' else self.atmo_cli.num_aa)
 
-	def get_atmo_cli_data_line(self, line):
+	def get_atmo_cli_data_line(self, line, line_num):
 		data = line.split()
 		j = 0
 		values = []
 		num_aa = 1 if self.atmo_cli.timestep == 'aa' else self.atmo_cli.num_aa
+		if len(data) < num_aa:
+			sys.exit('Invalid atmo.cli file format in {file}, line {line_num}: expected {num_aa} values, found {found}.'.format(file=self.atmo_data_file, line_num=line_num, num_aa=num_aa, found=len(data)))
 		while j < num_aa:
 			values.append(float(data[j].strip()))
 			j += 1
@@ -1416,38 +1333,48 @@ class AtmoImport(ExecutableApi):
 		#csv headers: atmo_station,weather_station,lat,lon
 		if self.__abort: return
 
-		csv_file = open(self.atmo_to_stations_file, "r")
+		with open(self.atmo_to_stations_file, "r") as csv_file:
+			dialect = csv.Sniffer().sniff(csv_file.readline())
+			csv_file.seek(0)
+			replace_commas = dialect is not None and dialect.delimiter != ','
+			hasHeader = csv.Sniffer().has_header(csv_file.readline())
+			csv_file.seek(0)
 
-		dialect = csv.Sniffer().sniff(csv_file.readline())
-		csv_file.seek(0)
-		replace_commas = dialect is not None and dialect.delimiter != ','
-		hasHeader = csv.Sniffer().has_header(csv_file.readline())
-		csv_file.seek(0)
+			csv_reader = csv.reader(csv_file, dialect)
 
-		csv_reader = csv.reader(csv_file, dialect)
+			if hasHeader:
+				headerLine = next(csv_reader)
 
-		if hasHeader:
-			headerLine = next(csv_reader)
+			self.emit_progress(start_prog + round(total_prog*0.5), 'Matching atmo data to weather stations...')
+			# Match every station with the name, as updating by name did, in case a project has duplicate names
+			name_to_ids = {}
+			for row in Weather_sta_cli.select(Weather_sta_cli.id, Weather_sta_cli.name).order_by(Weather_sta_cli.id):
+				name_to_ids.setdefault(row.name, []).append(row.id)
+			index = None
 
-		self.emit_progress(round(total_prog*0.5), 'Matching atmo data to weather stations...')
-		for val in csv_reader:
-			if replace_commas:
-				val = [item.replace(',', '.', 1) for item in val]
+			# Later rows override earlier ones for the same station, as when each row was updated in turn
+			atmo_deps = {}
+			for val in csv_reader:
+				if replace_commas:
+					val = [item.replace(',', '.', 1) for item in val]
 
-			if len(val) < 2:
-				sys.exit('Invalid csv file format. Ensure your data has the following columns: atmo_station,weather_station')
-			
-			atmo_station = val[0].strip()
-			weather_station = val[1].strip()
-			if atmo_station is not None and atmo_station != '' and atmo_station != 'null':
-				if weather_station is not None and weather_station != '' and weather_station != 'null':
-					Weather_sta_cli.update(atmo_dep=atmo_station).where(Weather_sta_cli.name == weather_station).execute()
-				else:
-					lat = float(val[2].strip())
-					lon = float(val[3].strip())
-					id = closest_lat_lon(project_base.db, "weather_sta_cli", lat, lon)
-					Weather_sta_cli.update(atmo_dep=atmo_station).where(Weather_sta_cli.id == id).execute()
+				if len(val) < 2:
+					sys.exit('Invalid csv file format. Ensure your data has the following columns: atmo_station,weather_station')
+				
+				atmo_station = val[0].strip()
+				weather_station = val[1].strip()
+				if atmo_station is not None and atmo_station != '' and atmo_station != 'null':
+					if weather_station is not None and weather_station != '' and weather_station != 'null':
+						ids = name_to_ids.get(weather_station, [])
+					else:
+						if index is None:
+							index = station_index("weather_sta_cli")
+						id = index.nearest(float(val[2].strip()), float(val[3].strip()))
+						ids = [] if id is None else [id]
+					for id in ids:
+						atmo_deps[id] = atmo_station
 
+		db_lib.bulk_update_column(self.project_db, "weather_sta_cli", "atmo_dep", list(atmo_deps.items()))
 
 if __name__ == '__main__':
 	sys.stdout = Unbuffered(sys.stdout)
@@ -1462,6 +1389,7 @@ if __name__ == '__main__':
 	parser.add_argument("--import_method", type=str, help="import method for wgn (database, two_file, one_file)", nargs="?")
 	parser.add_argument("--file1", type=str, help="full path of file", nargs="?")
 	parser.add_argument("--file2", type=str, help="full path of file", nargs="?")
+	parser.add_argument("--workers", type=int, help="number of processes converting SWAT2012 station files (default CPU count)", nargs="?")
 	args = parser.parse_args()
 
 	del_ex = True if args.delete_existing == "y" else False
@@ -1471,7 +1399,7 @@ if __name__ == '__main__':
 		api = WeatherImport(args.project_db_file, del_ex, cre_sta)
 		api.import_data()
 	elif args.import_type == "observed2012":
-		api = Swat2012WeatherImport(args.project_db_file, del_ex, cre_sta, args.source_dir)
+		api = Swat2012WeatherImport(args.project_db_file, del_ex, cre_sta, args.source_dir, args.workers)
 		api.import_data()
 	elif args.import_type == "wgn":
 		api = WgnImport(args.project_db_file, del_ex, cre_sta, args.import_method, args.file1, args.file2)
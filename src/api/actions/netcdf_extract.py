@@ -0,0 +1,266 @@
+"""
+Trim a gridded NetCDF weather data file to the cells around the project, so TxtInOut gets a file of a few hundred
+cells instead of a continental grid. The window is the smallest lat/lon index box holding the grid cells nearest to
+every *_con object and to the weather stations they use, plus a buffer of cells. Gridded variables are copied in
+slices of time_chunk steps, so memory stays bounded by time_chunk x window cells whatever the size of the source.
+The trimmed file is kept in <project folder>/weather_cache and only extracted again when the source file or window changes.
+Only grids with 1-D latitude and longitude coordinates are trimmed; other files are copied whole.
+"""
+from helpers.executable_api import ExecutableApi, Unbuffered
+from database.project import base as project_base
+from database.project.setup import SetupProjectDatabase
+from database.project.config import Project_config
+from helpers import utils
+from .weather_cache import CACHE_DIR
+
+from bisect import bisect_left
+import argparse
+import os, os.path
+import sys
+
+CON_TABLES = ["aquifer_con", "channel_con", "chandeg_con", "rout_unit_con", "reservoir_con", "recall_con", "exco_con", "hru_con", "hru_lte_con"]
+LAT_NAMES = ["lat", "latitude", "nav_lat"]
+LON_NAMES = ["lon", "longitude", "nav_lon"]
+BUFFER_CELLS = 1
+TIME_CHUNK = 365
+
+
+def load_netcdf4():
+	try:
+		import netCDF4
+	except ImportError:
+		return None
+	return netCDF4
+
+
+def find_coordinate(dataset, names, units):
+	"""Return the name of the 1-D coordinate variable matching one of names or units, or None."""
+	for name, var in dataset.variables.items():
+		if len(var.dimensions) != 1:
+			continue
+		if name.lower() in names or getattr(var, "units", None) in units:
+			return name
+	return None
+
+
+def project_points(db):
+	"""Return the (lat, lon) of every spatial object and of every weather station assigned to one."""
+	points = []
+	station_ids = set()
+	for table in CON_TABLES:
+		if not db.table_exists(table):
+			continue
+		cursor = db.execute_sql("SELECT lat, lon, wst_id FROM {t} WHERE lat IS NOT NULL AND lon IS NOT NULL".format(t=table))
+		for lat, lon, wst_id in cursor.fetchall():
+			points.append((lat, lon))
+			if wst_id is not None:
+				station_ids.add(wst_id)
+
+	if len(station_ids) > 0:
+		cursor = db.execute_sql("SELECT id, lat, lon FROM weather_sta_cli WHERE lat IS NOT NULL AND lon IS NOT NULL")
+		points.extend((lat, lon) for id, lat, lon in cursor.fetchall() if id in station_ids)
+	return points
+
+
+def axis_window(values, targets, buffer):
+	"""Return the first and last index of the grid coordinates holding the cell nearest each target, widened by buffer cells."""
+	descending = len(values) > 1 and values[0] > values[-1]
+	keys = [-v for v in values] if descending else values
+	indices = []
+	for target in targets:
+		key = -target if descending else target
+		i = bisect_left(keys, key)
+		if i == len(keys) or (i > 0 and key - keys[i - 1] <= keys[i] - key):
+			i -= 1
+		indices.append(i)
+	return max(0, min(indices) - buffer), min(len(values) - 1, max(indices) + buffer)
+
+
+def grid_window(dataset, points, buffer=BUFFER_CELLS):
+	"""
+	Return {dimension name: (first, last)} for the latitude and longitude dimensions of the grid around points,
+	or None if the file has no 1-D latitude and longitude coordinates.
+	"""
+	lat_name = find_coordinate(dataset, LAT_NAMES, ["degrees_north", "degree_north", "degrees_N"])
+	lon_name = find_coordinate(dataset, LON_NAMES, ["degrees_east", "degree_east", "degrees_E"])
+	if lat_name is None or lon_name is None:
+		return None
+
+	lats = [float(v) for v in dataset.variables[lat_name][:]]
+	lons = [float(v) for v in dataset.variables[lon_name][:]]
+	if len(lats) < 1 or len(lons) < 1:
+		return None
+
+	# Grids stored in 0 to 360 longitudes
+	shift = 360 if max(lons) > 180 else 0
+	window = {}
+	window[dataset.variables[lat_name].dimensions[0]] = axis_window(lats, [lat for lat, lon in points], buffer)
+	window[dataset.variables[lon_name].dimensions[0]] = axis_window(lons, [lon + shift if lon < 0 else lon for lat, lon in points], buffer)
+	return window
+
+
+def source_fingerprint(source_file, window):
+	"""Global attributes identifying the source file and window of a trimmed file. Strings, so they fit the classic format too."""
+	stat = os.stat(source_file)
+	return {
+		"swatplus_source_file": os.path.basename(source_file),
+		"swatplus_source_size": str(stat.st_size),
+		"swatplus_source_mtime_ns": str(stat.st_mtime_ns),
+		"swatplus_window": ";".join("{d}={s}:{e}".format(d=d, s=s, e=e) for d, (s, e) in sorted(window.items()))
+	}
+
+
+def is_current(netCDF4, trimmed_file, fingerprint):
+	if not os.path.isfile(trimmed_file):
+		return False
+	try:
+		with netCDF4.Dataset(trimmed_file) as dataset:
+			return all(getattr(dataset, key, None) == value for key, value in fingerprint.items())
+	except (OSError, RuntimeError):
+		return False
+
+
+def copy_variable(var, out, window, time_chunk):
+	"""Copy a variable restricted to window, in slices of time_chunk along its first dimension when that is not a grid dimension."""
+	if len(var.dimensions) < 1:
+		out.assignValue(var.getValue())
+		return
+
+	src_index = []
+	dst_index = []
+	for dim, size in zip(var.dimensions, var.shape):
+		start, end = window.get(dim, (0, size - 1))
+		src_index.append(slice(start, end + 1))
+		dst_index.append(slice(0, end - start + 1))
+
+	n = var.shape[0]
+	if len(var.dimensions) < 2 or var.dimensions[0] in window or n <= time_chunk:
+		if n > 0:
+			out[tuple(dst_index)] = var[tuple(src_index)]
+		return
+
+	for start in range(0, n, time_chunk):
+		end = min(n, start + time_chunk)
+		out[tuple([slice(start, end)] + dst_index[1:])] = var[tuple([slice(start, end)] + src_index[1:])]
+
+
+def extract_window(netCDF4, source_file, trimmed_file, window, fingerprint, time_chunk=TIME_CHUNK, progress=None):
+	"""
+	Write the window of source_file to trimmed_file with the same dimensions, variables and attributes.
+	Values are copied unscaled and unmasked so packed variables keep their exact stored values.
+	The file is written next to trimmed_file first and renamed when complete.
+	"""
+	temp_file = trimmed_file + ".tmp"
+	with netCDF4.Dataset(source_file) as src, netCDF4.Dataset(temp_file, "w", format=src.data_model) as dst:
+		src.set_auto_maskandscale(False)
+		dst.set_auto_maskandscale(False)
+		dst.setncatts({key: src.getncattr(key) for key in src.ncattrs()})
+		dst.setncatts(fingerprint)
+
+		for name, dim in src.dimensions.items():
+			if dim.isunlimited():
+				dst.createDimension(name, None)
+			elif name in window:
+				dst.createDimension(name, window[name][1] - window[name][0] + 1)
+			else:
+				dst.createDimension(name, len(dim))
+
+		variables = list(src.variables.items())
+		for i, (name, var) in enumerate(variables):
+			if progress is not None:
+				progress(i / len(variables), "Extracting NetCDF variable {name}...".format(name=name))
+
+			attrs = var.ncattrs()
+			filters = var.filters() or {}
+			out = dst.createVariable(name, var.datatype, var.dimensions,
+				zlib=filters.get("zlib", False), complevel=filters.get("complevel", 4), shuffle=filters.get("shuffle", False),
+				fill_value=var.getncattr("_FillValue") if "_FillValue" in attrs else None)
+			out.setncatts({key: var.getncattr(key) for key in attrs if key != "_FillValue"})
+			copy_variable(var, out, window, time_chunk)
+
+	os.replace(temp_file, trimmed_file)
+
+
+def project_netcdf_file(project_db_file, source_file, time_chunk=TIME_CHUNK, progress=None):
+	"""
+	Return the path of the trimmed copy of source_file for the project, extracting it if missing or out of date.
+	Returns None when the file can't be trimmed (netCDF4 not installed, no 1-D lat/lon grid, no located objects)
+	and the whole file should be used. The project database must be initialized.
+	"""
+	netCDF4 = load_netcdf4()
+	if netCDF4 is None:
+		print("The netCDF4 package is not installed; using the full NetCDF data file.")
+		return None
+
+	points = project_points(project_base.db)
+	if len(points) < 1:
+		print("No spatial objects with coordinates; using the full NetCDF data file.")
+		return None
+
+	try:
+		with netCDF4.Dataset(source_file) as dataset:
+			window = grid_window(dataset, points)
+		if window is None:
+			print("NetCDF data file {} has no 1-D latitude and longitude coordinates; using the full file.".format(os.path.basename(source_file)))
+			return None
+
+		cache_dir = os.path.join(os.path.dirname(project_db_file), CACHE_DIR)
+		if not os.path.exists(cache_dir):
+			os.makedirs(cache_dir)
+
+		trimmed_file = os.path.join(cache_dir, os.path.basename(source_file))
+		fingerprint = source_fingerprint(source_file, window)
+		if not is_current(netCDF4, trimmed_file, fingerprint):
+			extract_window(netCDF4, source_file, trimmed_file, window, fingerprint, time_chunk, progress)
+		return trimmed_file
+	except (OSError, RuntimeError) as err:
+		print("Could not extract the project window of {}: {}; using the full file.".format(os.path.basename(source_file), err))
+		return None
+
+
+class NetCDFExtract(ExecutableApi):
+	"""Extract the project window of the NetCDF weather data file ahead of writing input files."""
+	def __init__(self, project_db_file, nc_file=None, time_chunk=TIME_CHUNK):
+		SetupProjectDatabase.init(project_db_file)
+		self.project_db_file = project_db_file
+		self.nc_file = nc_file
+		self.time_chunk = time_chunk
+
+	def __del__(self):
+		SetupProjectDatabase.close()
+
+	def run(self):
+		if load_netcdf4() is None:
+			sys.exit('Extracting NetCDF weather data requires the netCDF4 package.')
+
+		if self.nc_file is None:
+			try:
+				config = Project_config.get()
+			except Project_config.DoesNotExist:
+				sys.exit('Could not retrieve project configuration from database')
+			if config.netcdf_data_file is None:
+				sys.exit('The project does not have a NetCDF data file.')
+			self.nc_file = utils.full_path(self.project_db_file, config.netcdf_data_file)
+
+		if not os.path.isfile(self.nc_file):
+			sys.exit('NetCDF data file {file} does not exist.'.format(file=self.nc_file))
+
+		self.emit_progress(0, "Finding grid cells near the project...")
+		trimmed_file = project_netcdf_file(self.project_db_file, self.nc_file, self.time_chunk, lambda f, message: self.emit_progress(round(f * 100), message))
+		if trimmed_file is None:
+			sys.exit('Could not extract the project window of {file}.'.format(file=self.nc_file))
+
+		self.emit_progress(100, "Extracted NetCDF data to {file}.".format(file=trimmed_file))
+		return trimmed_file
+
+
+if __name__ == '__main__':
+	sys.stdout = Unbuffered(sys.stdout)
+	parser = argparse.ArgumentParser(description="Extract the grid cells near the project from its NetCDF weather data file.")
+	parser.add_argument("--project_db_file", type=str, help="full path of project SQLite database file", nargs="?")
+	parser.add_argument("--nc_file", type=str, help="full path of NetCDF data file (default the project's netcdf_data_file)", nargs="?")
+	parser.add_argument("--time_chunk", type=int, help="number of time steps copied at once (default 365)", nargs="?", default=TIME_CHUNK)
+	args = parser.parse_args()
+
+	api = NetCDFExtract(args.project_db_file, args.nc_file, args.time_chunk)
+	api.run()
@@ -1,5 +1,5 @@
 from helpers.executable_api import ExecutableApi, Unbuffered
-from database.output import data, check_toolbox
+from database.output import data, check_toolbox, schema, series
 
 import csv
 import os, os.path
@@ -7,9 +7,20 @@ import sqlite3
 import re
 import sys
 import traceback
+import hashlib
+import json
+import gc
+import multiprocessing
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
-from itertools import zip_longest
+from itertools import zip_longest, chain
+from functools import lru_cache
+from operator import add, itemgetter
+from array import array
+from math import nan
 
 def clean_column_name(name):
 	"""Clean column names to be valid SQL identifiers."""
@@ -20,6 +31,31 @@ def clean_column_name(name):
 		name = 'col_' + name
 	return name.lower()
 
+@lru_cache(maxsize=256)
+def parse_column_headers(column_headers_raw):
+	"""Clean a raw heading line into unique column names. Cached since every time step of a table shares the same headings."""
+	null_counter = 1
+	column_headers = []
+	seen_columns = {}
+
+	for col in column_headers_raw.split(','):
+		cleaned = clean_column_name(col)
+		
+		# Handle "null" columns
+		if cleaned == 'null':
+			column_headers.append(f'undefined{null_counter}')
+			null_counter += 1
+		else:
+			# Handle duplicate columns
+			if cleaned in seen_columns:
+				seen_columns[cleaned] += 1
+				column_headers.append(f'{cleaned}{seen_columns[cleaned]}')
+			else:
+				seen_columns[cleaned] = 0
+				column_headers.append(cleaned)
+
+	return tuple(column_headers)
+
 def infer_sql_type(value):
 	"""Infer SQL data type from a string value."""
 	value = value.strip()
@@ -60,6 +96,18 @@ def adjust_gis_id(gis_id_value, name_value):
 	except (ValueError, TypeError):
 		return gis_id_value
 
+def output_table_name(file):
+	return file[:-4].replace('hru-lte', 'hru_lte')
+
+def file_fingerprint(file_path, chunk_size=1024*1024):
+	"""Return the size, modified time and content hash of a file."""
+	stat = os.stat(file_path)
+	h = hashlib.blake2b(digest_size=20)
+	with open(file_path, 'rb') as f:
+		for chunk in iter(lambda: f.read(chunk_size), b''):
+			h.update(chunk)
+	return stat.st_size, stat.st_mtime, h.hexdigest()
+
 def reset_database(db_file):
 	"""Completely reset a SQLite database."""
 	conn = sqlite3.connect(db_file)
@@ -88,14 +136,508 @@ def reset_database(db_file):
 	cursor.execute("VACUUM")
 	conn.close()
 
+def convert_text(value):
+	value = value.strip()
+	return value if value else None
+
+sql_type_converters = {
+	'INTEGER': int,
+	'REAL': float,
+	'TEXT': convert_text
+}
+
+def build_row_converter(column_types):
+	"""
+	Build a function converting a full row of strings to typed values.
+	Adjacent columns of the same type are grouped so each group is converted with a single map call;
+	int and float accept surrounding whitespace and raise ValueError on blanks, which callers use to fall back to convert_row_safe.
+	"""
+	spans = []
+	start = 0
+	for i in range(1, len(column_types) + 1):
+		if i == len(column_types) or column_types[i] != column_types[start]:
+			spans.append((start, i, sql_type_converters.get(column_types[start], convert_text)))
+			start = i
+
+	if len(spans) == 1:
+		s, e, func = spans[0]
+		return lambda row: list(map(func, row))
+
+	spans = tuple(spans)
+	def convert_row(row):
+		converted_row = []
+		for s, e, func in spans:
+			converted_row.extend(map(func, row[s:e]))
+		return converted_row
+	return convert_row
+
+def convert_row_safe(row, column_types):
+	"""Convert a row value by value, using None for blank or invalid values and padding short rows."""
+	converted_row = []
+	for value, col_type in zip_longest(row, column_types, fillvalue=None):
+		value = None if value is None else value.strip()
+		if not value:
+			converted_row.append(None)
+		elif col_type == 'INTEGER':
+			try:
+				converted_row.append(int(value))
+			except ValueError:
+				converted_row.append(None)
+		elif col_type == 'REAL':
+			try:
+				converted_row.append(float(value))
+			except ValueError:
+				converted_row.append(None)
+		else:
+			converted_row.append(value)
+	return converted_row
+
+class RollupAccumulator:
+	"""
+	Running per-object monthly and yearly totals of a daily output table.
+	Rows of an object are expected in date order; a month is closed as soon as the object's next month starts,
+	so only the current month and year of each object are held in memory. Months roll into years as they close.
+	Closed periods collect in month_rows and year_rows until the caller writes them out.
+	"""
+	def __init__(self, rollup):
+		self.key_idx = rollup['key_idx']
+		self.yr_idx = rollup['yr_idx']
+		self.mon_idx = rollup['mon_idx']
+		self.value_idx = rollup['value_idx']
+		self.mean = rollup['mean']
+		self.get_values = itemgetter(*self.value_idx)
+		self.months = {}
+		self.years = {}
+		self.month_rows = []
+		self.year_rows = []
+
+	def add(self, row):
+		key = tuple(row[i] for i in self.key_idx)
+		yr = row[self.yr_idx]
+		mon = row[self.mon_idx]
+
+		current = self.months.get(key, None)
+		if current is not None and (current[0] != yr or current[1] != mon):
+			self.close_month(key, current)
+			current = None
+		if current is None:
+			current = [yr, mon, 0, [0.0] * len(self.value_idx)]
+			self.months[key] = current
+
+		current[2] += 1
+		values = self.get_values(row) if len(self.value_idx) > 1 else (row[self.value_idx[0]],)
+		try:
+			current[3] = list(map(add, current[3], values))
+		except TypeError:
+			current[3] = [t if v is None else t + v for t, v in zip(current[3], values)]
+
+	def close_month(self, key, month):
+		yr, mon, days, totals = month
+		year = self.years.get(key, None)
+		if year is not None and year[0] != yr:
+			self.close_year(key, year)
+			year = None
+		if year is None:
+			self.years[key] = [yr, days, list(totals)]
+		else:
+			year[1] += days
+			year[2] = list(map(add, year[2], totals))
+		self.month_rows.append(list(key) + [yr, mon, days] + self.period_values(days, totals))
+
+	def close_year(self, key, year):
+		yr, days, totals = year
+		self.year_rows.append(list(key) + [yr, days] + self.period_values(days, totals))
+
+	def period_values(self, days, totals):
+		return [t / days if is_mean else t for t, is_mean in zip(totals, self.mean)]
+
+	def flush(self):
+		"""Close every open month and year at the end of the file."""
+		for key, month in self.months.items():
+			self.close_month(key, month)
+		for key, year in self.years.items():
+			self.close_year(key, year)
+		self.months = {}
+		self.years = {}
+
+series_max_values = 16*1024*1024  # Values held in open compact series chunks, 128 MB of doubles
+
+class SeriesAccumulator:
+	"""
+	Collects converted rows of a daily or monthly table into per-object, per-variable chunks of compressed float64 values.
+	Dates and objects are numbered in order of first appearance to build the table calendar and object table, so chunks
+	only carry small integer ids. A chunk holds up to a year of values; it closes early when its object skips a date,
+	and every open chunk closes once they hold max_values values, which bounds memory on files with many objects.
+	"""
+	calendar_sql = 'INSERT INTO series_calendar (table_name, idx, jday, mon, day, yr) VALUES (?, ?, ?, ?, ?, ?)'
+
+	def __init__(self, series, max_values=series_max_values):
+		self.calendar_name = series['calendar_name']
+		self.insert_sql = series['insert_sql']
+		self.object_sql = series['object_sql']
+		self.key_idx = series['key_idx']
+		self.jday_idx, self.mon_idx, self.day_idx, self.yr_idx = series['time_idx']
+		self.value_idx = series['value_idx']
+		self.daily = series['daily']
+		self.max_values = max_values
+		self.calendar = {}
+		self.objects = {}
+		self.chunks = {}
+		self.open_values = 0
+		self.series_rows = []
+		self.calendar_rows = []
+		self.object_rows = []
+
+	def add(self, row):
+		yr = row[self.yr_idx]
+		mon = row[self.mon_idx]
+		date = (yr, row[self.jday_idx]) if self.daily else (yr, mon)
+		idx = self.calendar.get(date, None)
+		if idx is None:
+			idx = len(self.calendar)
+			self.calendar[date] = idx
+			self.calendar_rows.append([self.calendar_name, idx, row[self.jday_idx], mon, row[self.day_idx], yr])
+
+		key = tuple(row[i] for i in self.key_idx)
+		obj_id = self.objects.get(key, None)
+		if obj_id is None:
+			obj_id = len(self.objects) + 1
+			self.objects[key] = obj_id
+			self.object_rows.append([obj_id] + list(key))
+
+		chunk = self.chunks.get(obj_id, None)
+		if chunk is not None and (chunk[0] != yr or chunk[1] + len(chunk[2][0]) != idx):
+			self.close(obj_id, chunk)
+			del self.chunks[obj_id]
+			chunk = None
+		if chunk is None:
+			chunk = [yr, idx, [array('d') for _ in self.value_idx]]
+			self.chunks[obj_id] = chunk
+
+		for values, i in zip(chunk[2], self.value_idx):
+			v = row[i]
+			values.append(nan if v is None else v)
+
+		self.open_values += len(self.value_idx)
+		if self.open_values >= self.max_values:
+			self.flush()
+
+	def close(self, obj_id, chunk):
+		yr, start_idx, values = chunk
+		for var_id, variable_values in enumerate(values, 1):
+			self.series_rows.append([obj_id, var_id, start_idx, len(variable_values), series.pack_values(variable_values)])
+		self.open_values -= len(values) * len(values[0])
+
+	def flush(self):
+		for obj_id, chunk in self.chunks.items():
+			self.close(obj_id, chunk)
+		self.chunks = {}
+		self.open_values = 0
+
+	def take_batches(self):
+		"""Return the (insert statement, rows) batches collected so far, calendar and objects first."""
+		batches = [(sql, rows) for sql, rows in [(self.calendar_sql, self.calendar_rows), (self.object_sql, self.object_rows), (self.insert_sql, self.series_rows)] if rows]
+		self.calendar_rows = []
+		self.object_rows = []
+		self.series_rows = []
+		return batches
+
+def line_reader(lines, delimiter):
+	"""Split lines of an output file into rows of string values."""
+	if delimiter == 'whitespace':
+		# Custom generator for whitespace-delimited files
+		return (re.split(r'\s+', line.strip()) for line in lines)
+	# Standard csv.reader for comma or tab (single character delimiters)
+	return csv.reader(lines, delimiter=delimiter)
+
+class RowStream:
+	"""
+	Filter and type-convert the lines of one output file into (insert statement, batch of rows) pairs.
+	Lines can be fed in several pieces, e.g. as the file grows while SWAT+ runs. Rollup and compact series
+	rows that span pieces are held until finish.
+	Uses only the picklable layout from ReadOutput.prepare_file so it can run in a worker process.
+	"""
+	def __init__(self, layout, batch_size):
+		self.layout = layout
+		self.batch_size = batch_size
+		self.header_lines = layout['data_start_line'] - 1
+		self.convert_row = build_row_converter(layout['column_types'])
+		self.adjusted_count = 0
+
+		self.series_acc = None
+		if layout.get('series', None) is not None:
+			self.series_acc = SeriesAccumulator(layout['series'])
+
+		self.rollup = None
+		if layout.get('rollup', None) is not None:
+			self.rollup = RollupAccumulator(layout['rollup'])
+
+	def feed(self, reader):
+		layout = self.layout
+		batch_size = self.batch_size
+		column_types = layout['column_types']
+		gis_id_idx = layout['gis_id_idx']
+		name_idx = layout['name_idx']
+		fix_gis_id = gis_id_idx is not None and name_idx is not None
+		filter_idx = layout['filter_idx']
+		filter_values = layout['filter_values']
+		yr_idx = layout['yr_idx']
+		yr_start = layout['yr_start']
+		yr_end = layout['yr_end']
+		column_count = len(column_types)
+		convert_row = self.convert_row
+		insert_sql = layout['insert_sql']
+		series_acc = self.series_acc
+		rollup = self.rollup
+		if rollup is not None:
+			rollup_mon_sql = layout['rollup']['mon_insert_sql']
+			rollup_yr_sql = layout['rollup']['yr_insert_sql']
+
+		# Skip header lines, which may arrive over several pieces
+		reader = iter(reader)
+		while self.header_lines > 0:
+			if next(reader, None) is None:
+				return
+			self.header_lines -= 1
+
+		batch = []
+
+		# Rows are flat lists of scalars, so pause the cyclic garbage collector that otherwise rescans every pending batch
+		gc_enabled = gc.isenabled()
+		gc.disable()
+		try:
+			for row in reader:
+				if not row:
+					continue
+				
+				# Adjust gis_id if needed (before type conversion)
+				if fix_gis_id:
+					gis_id_val = row[gis_id_idx].strip()
+					name_val = row[name_idx].strip()
+					
+					try:
+						if gis_id_val and int(gis_id_val) == 0:
+							adjusted_val = adjust_gis_id(gis_id_val, name_val)
+							if adjusted_val != 0:
+								row[gis_id_idx] = str(adjusted_val)
+								self.adjusted_count += 1
+					except (ValueError, TypeError):
+						pass
+				
+				# Discard rows outside the requested objects and years before converting them
+				if filter_idx is not None and (len(row) <= filter_idx or row[filter_idx].strip() not in filter_values):
+					continue
+				if yr_idx is not None:
+					try:
+						yr = int(row[yr_idx])
+					except (ValueError, IndexError):
+						continue
+					if yr < yr_start or yr > yr_end:
+						continue
+
+				# Convert values with the precompiled converter, rows with blanks or bad values take the per-value path
+				if len(row) == column_count:
+					try:
+						batch.append(convert_row(row))
+					except ValueError:
+						batch.append(convert_row_safe(row, column_types))
+				else:
+					batch.append(convert_row_safe(row, column_types))
+				
+				if rollup is not None:
+					rollup.add(batch[-1])
+					if len(rollup.month_rows) >= batch_size:
+						yield rollup_mon_sql, rollup.month_rows
+						rollup.month_rows = []
+					if len(rollup.year_rows) >= batch_size:
+						yield rollup_yr_sql, rollup.year_rows
+						rollup.year_rows = []
+
+				if series_acc is not None:
+					series_acc.add(batch.pop())
+					if len(series_acc.series_rows) >= batch_size:
+						yield from series_acc.take_batches()
+
+				if len(batch) >= batch_size:
+					yield insert_sql, batch
+					batch = []
+			
+			if batch:
+				yield insert_sql, batch
+		finally:
+			if gc_enabled:
+				gc.enable()
+
+	def finish(self):
+		"""Yield the rows still held by the series and rollup accumulators once the whole file has been fed."""
+		series_acc = self.series_acc
+		if series_acc is not None:
+			series_acc.flush()
+			yield from series_acc.take_batches()
+
+		rollup = self.rollup
+		if rollup is not None:
+			rollup.flush()
+			if rollup.month_rows:
+				yield self.layout['rollup']['mon_insert_sql'], rollup.month_rows
+			if rollup.year_rows:
+				yield self.layout['rollup']['yr_insert_sql'], rollup.year_rows
+			rollup.month_rows = []
+			rollup.year_rows = []
+
+def read_file_rows(layout, batch_size):
+	"""
+	Stream the data rows of an output file as (insert statement, batch of type-converted rows) pairs.
+	Batches for the table itself come first, followed by any monthly and yearly rollup rows.
+	"""
+	stream = RowStream(layout, batch_size)
+	with open(layout['file_path'], 'r', buffering=8192*1024) as f:  # 8MB buffer
+		yield from stream.feed(line_reader(f, layout['delimiter']))
+	yield from stream.finish()
+
+_parse_queue = None
+
+def _init_parse_worker(batch_queue):
+	global _parse_queue
+	_parse_queue = batch_queue
+
+def _parse_file_worker(layout, batch_size):
+	"""Parse one output file in a worker process and hand its batches to the writer through the shared queue."""
+	file = layout['file']
+	try:
+		start = time.perf_counter()
+		parse_seconds = 0.0
+		batch_start = start
+		for batch_sql, batch in read_file_rows(layout, batch_size):
+			parse_seconds += time.perf_counter() - batch_start
+			_parse_queue.put(('rows', file, (batch_sql, batch)))
+			batch_start = time.perf_counter()
+		parse_seconds += time.perf_counter() - batch_start
+		_parse_queue.put(('done', file, {'parse_seconds': parse_seconds, 'total_seconds': time.perf_counter() - start}))
+	except Exception as e:
+		_parse_queue.put(('error', file, '{}\n{}'.format(e, traceback.format_exc())))
+
+mgt_out_columns = ['hru', 'year', 'mon', 'day', 'crop', 'operation', 'phubase', 'phuplant', 'soil_water', 'plant_bioms', 'surf_rsd', 'soil_no3', 'soil_solp', 'op_var', 'var1', 'var2', 'var3', 'var4', 'var5', 'var6', 'var7']
+mgt_out_types = ['INTEGER', 'INTEGER', 'INTEGER', 'INTEGER', 'TEXT', 'TEXT', 'REAL', 'REAL', 'REAL', 'REAL', 'REAL', 'REAL', 'REAL', 'REAL', 'REAL', 'REAL', 'REAL', 'REAL', 'REAL', 'REAL', 'REAL']
+mgt_out_start_line = 4
+mgt_out_chunk_size = 32*1024*1024
+mgt_out_no_crop_ops = frozenset(['IRRIGATE', 'FERT'])  # Written without the crop column
+number_start_chars = frozenset('0123456789.-+')
+number_words = frozenset(['NaN', 'nan', 'Infinity', '-Infinity', 'inf', '-inf'])
+
+def mgt_out_rows(lines, row_filter, batch_size):
+	"""
+	Parse data lines of mgt_out.txt into batches of typed rows.
+	Each line is split once on whitespace: hru, year, mon, day, crop and operation, then the numeric values.
+	IRRIGATE and FERT lines have no crop, and operation names may contain spaces, so the values start at the
+	first numeric field after the operation. Extra trailing fields are ignored.
+	"""
+	column_count = len(mgt_out_columns)
+	convert_row = build_row_converter(mgt_out_types)
+	filter_idx = row_filter['filter_idx']
+	filter_values = row_filter['filter_values']
+	yr_idx = row_filter['yr_idx']
+	yr_start = row_filter['yr_start']
+	yr_end = row_filter['yr_end']
+
+	batch = []
+	gc_enabled = gc.isenabled()
+	gc.disable()
+	try:
+		for line in lines:
+			row = line.split()
+			n = len(row)
+			if n < 1:
+				continue
+
+			if n > 4 and row[4] in mgt_out_no_crop_ops:
+				row.insert(4, '')
+				n += 1
+
+			if n > 6:
+				k = 6
+				while k < n and row[k][0] not in number_start_chars and row[k] not in number_words:
+					k += 1
+				if k > 6:
+					row[5:k] = [' '.join(row[5:k])]
+					n = len(row)
+
+			if filter_idx is not None and (n <= filter_idx or row[filter_idx] not in filter_values):
+				continue
+			if yr_idx is not None:
+				try:
+					yr = int(row[yr_idx])
+				except (ValueError, IndexError):
+					continue
+				if yr < yr_start or yr > yr_end:
+					continue
+
+			if n >= column_count:
+				if n > column_count:
+					del row[column_count:]
+				try:
+					batch.append(convert_row(row))
+				except ValueError:
+					batch.append(convert_row_safe(row, mgt_out_types))
+			else:
+				batch.append(convert_row_safe(row, mgt_out_types))
+
+			if len(batch) >= batch_size:
+				yield batch
+				batch = []
+
+		if batch:
+			yield batch
+	finally:
+		if gc_enabled:
+			gc.enable()
+
+def mgt_out_chunk_lines(file_path, start, end):
+	"""
+	Return the lines of mgt_out.txt starting within the byte range [start, end).
+	A line crossing start belongs to the previous range; the first range skips the headings.
+	"""
+	with open(file_path, 'rb') as f:
+		if start > 0:
+			f.seek(start - 1)
+			f.readline()
+		else:
+			for i in range(mgt_out_start_line - 1):
+				f.readline()
+
+		pos = f.tell()
+		if pos >= end:
+			return []
+		chunk = f.read(end - pos)
+		if not chunk.endswith(b'\n'):
+			chunk += f.readline()
+	return chunk.decode('utf-8', errors='replace').splitlines()
+
+def _parse_mgt_out_worker(chunk, file_path, start, end, row_filter, batch_size):
+	try:
+		for batch in mgt_out_rows(mgt_out_chunk_lines(file_path, start, end), row_filter, batch_size):
+			_parse_queue.put(('rows', chunk, batch))
+		_parse_queue.put(('done', chunk, None))
+	except Exception as e:
+		_parse_queue.put(('error', chunk, '{}\n{}'.format(e, traceback.format_exc())))
+
+def failed_workers(futures, pending):
+	"""
+	Return {key: exception} for the pending keys whose worker future ended with an exception, e.g. BrokenProcessPool
+	when the process was killed. A future that completed normally may still have its last messages in the queue's
+	feeder thread, so only failed futures mean a key will never report back.
+	"""
+	return {key: futures[key].exception() for key in pending if futures[key].done() and futures[key].exception() is not None}
+
 class ReadOutput(ExecutableApi):
-	def __init__(self, output_files_dir, db_file, swat_version, editor_version, project_name, skip_files=[], only_read_swatcheck=False, batch_size=100000):
+	def __init__(self, output_files_dir, db_file, swat_version, editor_version, project_name, skip_files=[], only_read_swatcheck=False, batch_size=100000, workers=1, incremental=False, build_indexes=True, object_filters=None, year_start=None, year_end=None, rollups=False, storage='rows'):
 		self.__abort = False
 		db_file_sanitized = db_file.replace("\\","/")
-		try:
-			os.remove(db_file_sanitized)
-		except:
-			reset_database(db_file_sanitized)
+		if not incremental:
+			try:
+				os.remove(db_file_sanitized)
+			except:
+				reset_database(db_file_sanitized)
 
 		self.output_files_dir = output_files_dir.replace("\\","/")
 		self.swat_version = swat_version
@@ -104,45 +646,77 @@ class ReadOutput(ExecutableApi):
 		self.skip_files = skip_files
 		self.only_read_swatcheck = only_read_swatcheck
 		self.batch_size = batch_size
+		self.workers = max(1, workers)
+		self.incremental = incremental
+		self.build_indexes = build_indexes
+		self.object_filters = object_filters if object_filters is not None else {}
+		self.year_start = year_start
+		self.year_end = year_end
+		self.rollups = rollups
+		self.storage = storage
+		self.file_row_counts = {}
+		self.file_stats = {}
+		self.progress_bytes = 0
+		self.progress_total_bytes = 0
+		self.import_start = time.perf_counter()
 		self.conn = sqlite3.connect(db_file_sanitized)
 		self.cursor = self.conn.cursor()
+		if storage == 'compact' and not incremental:
+			# A compressed year of values is 1-2 KB, which 8 KB pages hold with less unused space than 4 KB pages.
+			# The database is empty here; vacuuming it applies the page size even when it was reset rather than removed.
+			self.cursor.execute('PRAGMA page_size = 8192')
+			self.cursor.execute('VACUUM')
 	
 	def __del__(self):
 		self.conn.close()
 
 	def read(self):	
-		self.set_safety_level('fastest')	
-		self.setup_meta_tables()
+		self.import_start = time.perf_counter()
 
-		files_out_file = os.path.join(self.output_files_dir, 'files_out.out')
+		# Incremental imports keep the database between runs, so use a journal that survives an interrupted import
+		self.set_safety_level('safe' if self.incremental else 'fastest')	
+		self.setup_meta_tables()
 
-		# Read files_out.out to get list of output CSV files
-		files = []
 		try:
-			with open(files_out_file, "r") as file:
-				i = 1
-				for line in file:
-					if i > 1:
-						val = line.split()
-						if len(val) < 2:
-							raise ValueError('Unexpected number of columns in {}'.format(files_out_file))
-
-						file_name = val[len(val)-1].strip()
-						file_name_no_ext = os.path.splitext(file_name)[0]
-						if file_name.endswith('.csv') and (not self.only_read_swatcheck or file_name_no_ext in check_toolbox.required_tables or file_name_no_ext in check_toolbox.opt_tables):
-							files.append(file_name)
-
-					i += 1
-		except FileNotFoundError:
-			pass
+			files = self.get_output_files()
 		except ValueError as ve:
 			sys.exit(ve)
 
-		log_file_name = 'output_db_log.txt'
-		log_file = os.path.join(self.output_files_dir, log_file_name)
+		log_file = self.start_log()
 		files_with_errors = []
+		import_files = self.get_import_files(files, log_file)
+		import_files = self.check_manifest(import_files)
+		if self.incremental:
+			with open(log_file, 'a') as f:
+				f.write('Incremental import: {} of {} files changed since the last import.\n'.format(len(import_files), len(files)))
 
-		system_skip_files = ['hydcon.csv']  # Files that are known to have formatting issues or no data
+		# Progress is weighted by file size, the time to import a file grows with its size rather than being the same per file
+		self.progress_total_bytes = sum(self.file_size(file) for file in import_files)
+		log_issue_count = 0
+		if self.workers > 1 and len(import_files) > 1:
+			results = self.read_files_parallel(import_files)
+		else:
+			results = self.read_files_sequential(import_files)
+
+		for file, warnings, error in results:
+			if not error:
+				self.complete_manifest(file)
+				self.save_file_stats(file)
+			if warnings:
+				with open(log_file, 'a') as f:
+					f.write(warnings + '\n')
+					log_issue_count += 1
+			if error:
+				with open(log_file, 'a') as f:
+					f.write(error)
+					log_issue_count += 1
+				files_with_errors.append(file)
+
+		self.finish_import(log_file, len(files), log_issue_count)
+
+	def start_log(self):
+		log_file_name = 'output_db_log.txt'
+		log_file = os.path.join(self.output_files_dir, log_file_name)
 
 		# Clear/create the log file
 		with open(log_file, 'w') as f:
@@ -151,9 +725,15 @@ class ReadOutput(ExecutableApi):
 			f.write('Other errors may occur due to formatting issues and bugs in writing the output that SWAT+ Editor is unaware of. \n')
 			f.write('In these cases, a detailed stack trace is available below and should be sent to the development team at the SWAT+ Editor Google Group: https://groups.google.com/g/swatplus-editor \n\n')
 
-		prog_step = 0 if len(files) < 1 else round(100 / len(files))
-		prog = 0
-		log_issue_count = 0
+			if self.object_filters or self.year_start is not None or self.year_end is not None:
+				f.write('Importing filtered rows only. Objects: {}; years: {} to {}\n'.format(json.dumps(self.object_filters), self.year_start, self.year_end))
+
+		return log_file
+
+	def get_import_files(self, files, log_file):
+		system_skip_files = ['hydcon.csv']  # Files that are known to have formatting issues or no data
+
+		import_files = []
 		for file in files:
 			if file in system_skip_files:
 				continue
@@ -161,36 +741,45 @@ class ReadOutput(ExecutableApi):
 				with open(log_file, 'a') as f:
 					f.write('Skipping file per user\'s request: {}\n'.format(file))
 				continue
-			self.emit_progress(prog, 'Importing {}...'.format(file))
+			import_files.append(file)
+		return import_files
+
+	def finish_import(self, log_file, file_count, log_issue_count):
+		"""Import mgt_out.txt, build indexes and record the import in project_config."""
+		if 'mgt_out.txt' not in self.skip_files and len(self.check_manifest(['mgt_out.txt'])) > 0:
 			try:
-				warnings = self.read_file(file)
+				warnings = self.read_mgt_out_file()
+				self.complete_manifest('mgt_out.txt')
+				self.save_file_stats('mgt_out.txt')
 				if warnings:
 					with open(log_file, 'a') as f:
 						f.write(warnings + '\n')
 						log_issue_count += 1
 			except Exception as e:
 				with open(log_file, 'a') as f:
-					f.write('Error processing {}:\n {}\n{}\n\n'.format(file, e, traceback.format_exc()))
+					f.write('Error processing mgt_out.txt:\n {}\n{}\n\n'.format(e, traceback.format_exc()))
 					log_issue_count += 1
-				files_with_errors.append(file)
-			prog += prog_step
 
-		if 'mgt_out.txt' not in self.skip_files:
+		import_seconds = time.perf_counter() - self.import_start
+		index_seconds = None
+		if self.build_indexes:
 			try:
-				warnings = self.read_mgt_out_file()
-				if warnings:
-					with open(log_file, 'a') as f:
-						f.write(warnings + '\n')
-						log_issue_count += 1
+				self.emit_progress(99, 'Building indexes...')
+				start = time.perf_counter()
+				self.create_indexes()
+				index_seconds = time.perf_counter() - start
 			except Exception as e:
 				with open(log_file, 'a') as f:
-					f.write('Error processing mgt_out.txt:\n {}\n{}\n\n'.format(e, traceback.format_exc()))
+					f.write('Error building indexes:\n {}\n{}\n\n'.format(e, traceback.format_exc()))
 					log_issue_count += 1
 
+		self.write_stats_summary(log_file, import_seconds, index_seconds)
+
 		if log_issue_count < 1:
 			with open(log_file, 'a') as f:
-				f.write('Import completed with no issues in {} files.\n'.format(len(files)))
+				f.write('Import completed with no issues in {} files.\n'.format(file_count))
 					
+		self.cursor.execute('DELETE FROM project_config')
 		self.cursor.execute("""
 			INSERT INTO project_config (project_name, editor_version, swat_version, output_import_time, skip_files)
 			VALUES (?, ?, ?, ?, ?)
@@ -198,8 +787,59 @@ class ReadOutput(ExecutableApi):
 		self.conn.commit()
 		self.conn.close()
 
+	def get_output_files(self):
+		"""Read files_out.out to get list of output CSV files"""
+		files_out_file = os.path.join(self.output_files_dir, 'files_out.out')
+		files = []
+		try:
+			with open(files_out_file, "r") as file:
+				i = 1
+				for line in file:
+					if i > 1:
+						val = line.split()
+						if len(val) < 2:
+							raise ValueError('Unexpected number of columns in {}'.format(files_out_file))
+
+						file_name = val[len(val)-1].strip()
+						file_name_no_ext = os.path.splitext(file_name)[0]
+						if file_name.endswith('.csv') and (not self.only_read_swatcheck or file_name_no_ext in check_toolbox.required_tables or file_name_no_ext in check_toolbox.opt_tables):
+							files.append(file_name)
+
+					i += 1
+		except FileNotFoundError:
+			pass
+		return files
+
 	def read_file(self, file):
-		table_name = file[:-4].replace('hru-lte', 'hru_lte')
+		start = time.perf_counter()
+		layout, warnings = self.prepare_file(file)
+		if layout is None:
+			return warnings
+
+		self.file_row_counts[file] = self.insert_rows(layout['insert_sql'], read_file_rows(layout, self.batch_size), file)
+		self.add_file_stats(file, total_seconds=time.perf_counter() - start)
+		return None
+
+	def output_file_path(self, file):
+		"""Return the full path of an output file and whether it exists."""
+		file_path = os.path.join(self.output_files_dir, file)
+		if Path(file_path).is_file():
+			return file_path, True
+
+		# Special check for bug in SWAT+ versions where "channel_sdmorph_mon.csv" was written as "channel_mon_sdmorph.csv"
+		if file == 'channel_sdmorph_mon.csv':
+			file_path = os.path.join(self.output_files_dir, 'channel_mon_sdmorph.csv')
+			if Path(file_path).is_file():
+				return file_path, True
+
+		return file_path, False
+
+	def prepare_file(self, file):
+		"""
+		Read the headings and first data row of an output file, create its table and column descriptions.
+		Returns a picklable layout used to stream the rows of the file, or None and a warning message.
+		"""
+		table_name = output_table_name(file)
 		desc_key = table_name
 		time_series_key = ''
 		for key in data.time_series_labels:
@@ -219,18 +859,9 @@ class ReadOutput(ExecutableApi):
 		if table_cat is not None:
 			cat_cols = data.category_descriptions.get(table_cat, None)
 
-		file_path = os.path.join(self.output_files_dir, file)
-		check_path = Path(file_path)
-		if not check_path.is_file():
-			# Special check for bug in SWAT+ versions where "channel_sdmorph_mon.csv" was written as "channel_mon_sdmorph.csv"
-			if file == 'channel_sdmorph_mon.csv':
-				file = 'channel_mon_sdmorph.csv'
-				file_path = os.path.join(self.output_files_dir, file)
-				check_path = Path(file_path)
-				if not check_path.is_file():
-					return 'File not found: {}'.format(file_path)
-			else:
-				return 'File not found: {}'.format(file_path)
+		file_path, found = self.output_file_path(file)
+		if not found:
+			return None, 'File not found: {}'.format(file_path)
 
 		# Read column headers, units (if applicable), and first data line for type inference
 		with open(file_path, 'r') as f:
@@ -239,26 +870,7 @@ class ReadOutput(ExecutableApi):
 				f.readline()
 				i += 1
 			
-			column_headers_raw = f.readline()
-			null_counter = 1
-			column_headers = []
-			seen_columns = {}
-
-			for col in column_headers_raw.split(','):
-				cleaned = clean_column_name(col)
-				
-				# Handle "null" columns
-				if cleaned == 'null':
-					column_headers.append(f'undefined{null_counter}')
-					null_counter += 1
-				else:
-					# Handle duplicate columns
-					if cleaned in seen_columns:
-						seen_columns[cleaned] += 1
-						column_headers.append(f'{cleaned}{seen_columns[cleaned]}')
-					else:
-						seen_columns[cleaned] = 0
-						column_headers.append(cleaned)
+			column_headers = list(parse_column_headers(f.readline()))
 
 			units = []
 			if read_units:
@@ -306,25 +918,36 @@ class ReadOutput(ExecutableApi):
 		if len(column_headers) > len(first_data_row):
 			while len(column_types) < len(column_headers):
 				column_types.append('REAL') # Default to REAL for extra columns that don't have data in the first row (could be all nulls)
+
+		# Known SWAT+ tables take their types from the output models, inference only covers columns the models don't have
+		known_types = schema.get_column_types(table_name, column_headers)
+		if known_types is not None:
+			column_types = [known if known is not None else inferred for known, inferred in zip(known_types, column_types)]
 		
 		# Create table schema
 		columns_with_types = [f"{col_name} {col_type}" for col_name, col_type in zip(column_headers, column_types)]
 		if not columns_with_types:
-			return 'No data found in file: {}'.format(file_path)
+			return None, 'No data found in file: {}'.format(file_path)
 		
-		create_table_sql = f"""
-		CREATE TABLE IF NOT EXISTS {table_name} (
-			id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
-			{', '.join(columns_with_types)}
-		)
-		"""	
-		try:		
-			self.cursor.execute(create_table_sql)
-		except Exception as e:
-			raise Exception('Error creating table {} SQL: {}'.format(table_name, create_table_sql))
+		series_layout = None
+		if self.storage == 'compact' and (table_name.endswith('_day') or table_name.endswith('_mon')):
+			series_layout = self.prepare_series(table_name, description, column_headers, column_types)
+
+		if series_layout is None:
+			create_table_sql = f"""
+			CREATE TABLE IF NOT EXISTS {table_name} (
+				id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+				{', '.join(columns_with_types)}
+			)
+			"""	
+			try:		
+				self.cursor.execute(create_table_sql)
+			except Exception as e:
+				raise Exception('Error creating table {} SQL: {}'.format(table_name, create_table_sql))
 
 		# Insert column descriptions (only for columns with units)
 		column_desc_count = 0
+		desc_table_name = table_name if series_layout is None else series_layout['table_name']
 		for col_name, unit in zip(column_headers, units):
 			# Only insert if unit is not empty
 			if unit and unit.strip():
@@ -332,84 +955,572 @@ class ReadOutput(ExecutableApi):
 				self.cursor.execute("""
 					INSERT INTO column_description (table_name, column_name, units, description)
 					VALUES (?, ?, ?, ?)
-				""", (table_name, col_name, unit.strip(), description))
+				""", (desc_table_name, col_name, unit.strip(), description))
 				column_desc_count += 1
 		
 		self.conn.commit()
 
 		# Prepare insert statement
-		placeholders = ','.join(['?' for _ in column_headers])
-		insert_sql = f"INSERT INTO {table_name} ({','.join(column_headers)}) VALUES ({placeholders})"
+		if series_layout is None:
+			placeholders = ','.join(['?' for _ in column_headers])
+			insert_sql = f"INSERT INTO {table_name} ({','.join(column_headers)}) VALUES ({placeholders})"
+		else:
+			insert_sql = series_layout['insert_sql']
+
+		layout = {
+			'file': file,
+			'file_path': file_path,
+			'table_name': table_name,
+			'columns': column_headers,
+			'insert_sql': insert_sql,
+			'column_types': column_types,
+			'delimiter': delimiter,
+			'data_start_line': data_start_line,
+			'gis_id_idx': gis_id_idx if fix_gis_id else None,
+			'name_idx': name_idx if fix_gis_id else None,
+			'series': series_layout
+		}
+		layout.update(self.get_row_filter(table_name, column_headers))
+		if self.rollups and table_name.endswith('_day'):
+			layout['rollup'] = self.prepare_rollup(table_name, desc_key, column_headers, column_types, units, cat_cols)
+		return layout, None
+
+	def prepare_series(self, table_name, description, column_headers, column_types):
+		"""
+		Create the compact series tables replacing a daily or monthly output table and return the layout used to fill them.
+		Values are stored per object and variable as compressed float64 chunks of up to a year, keyed on small integer ids:
+		objects in <table>_series_obj, variables in series_variable and dates in series_calendar, each kept once per table.
+		Tables with text value columns keep row storage.
+		"""
+		key_columns = [col for col in data.rollup_key_columns if col in column_headers]
+		time_columns = ['jday', 'mon', 'day', 'yr']
+		if len(key_columns) < 1 or not all(col in column_headers for col in time_columns):
+			return None
+
+		skip_columns = set(key_columns + time_columns)
+		value_columns = [col for col in column_headers if col not in skip_columns]
+		if len(value_columns) < 1 or any(column_types[column_headers.index(col)] != 'REAL' for col in value_columns):
+			return None
+
+		series_table = '{}_series'.format(table_name)
+		object_table = '{}_series_obj'.format(table_name)
+		key_types = [column_types[column_headers.index(col)] for col in key_columns]
+		self.cursor.execute("""
+		CREATE TABLE IF NOT EXISTS {} (
+			obj_id INTEGER NOT NULL PRIMARY KEY,
+			{}
+		)
+		""".format(object_table, ', '.join('{} {}'.format(col, col_type) for col, col_type in zip(key_columns, key_types))))
+		self.cursor.execute("""
+		CREATE TABLE IF NOT EXISTS {} (
+			obj_id INTEGER NOT NULL,
+			var_id INTEGER NOT NULL,
+			start_idx INTEGER NOT NULL,
+			n INTEGER NOT NULL,
+			vals BLOB NOT NULL,
+			PRIMARY KEY (obj_id, var_id, start_idx)
+		)
+		""".format(series_table))
+		self.cursor.execute('UPDATE table_description SET table_name = ?, description = ? WHERE table_name = ?', (series_table, '{} (compact series)'.format(description), table_name))
+		self.cursor.execute('DELETE FROM series_calendar WHERE table_name = ?', (table_name,))
+		self.cursor.execute('DELETE FROM series_variable WHERE table_name = ?', (table_name,))
+		self.cursor.executemany('INSERT INTO series_variable (table_name, var_id, variable) VALUES (?, ?, ?)', [(table_name, i, col) for i, col in enumerate(value_columns, 1)])
+
+		object_columns = ['obj_id'] + key_columns
+		series_columns = ['obj_id', 'var_id', 'start_idx', 'n', 'vals']
+		return {
+			'table_name': series_table,
+			'calendar_name': table_name,
+			'insert_sql': 'INSERT INTO {} ({}) VALUES ({})'.format(series_table, ','.join(series_columns), ','.join(['?' for _ in series_columns])),
+			'object_sql': 'INSERT INTO {} ({}) VALUES ({})'.format(object_table, ','.join(object_columns), ','.join(['?' for _ in object_columns])),
+			'key_idx': [column_headers.index(col) for col in key_columns],
+			'time_idx': [column_headers.index(col) for col in time_columns],
+			'value_idx': [column_headers.index(col) for col in value_columns],
+			'daily': table_name.endswith('_day')
+		}
+
+	def prepare_rollup(self, table_name, desc_key, column_headers, column_types, units, cat_cols):
+		"""
+		Create the monthly and yearly rollup tables of a daily output table and return the layout used to fill them while streaming.
+		Value columns are summed, or averaged when their units or name mark them as states or rates (see data.rollup_mean_units).
+		"""
+		if 'yr' not in column_headers or 'mon' not in column_headers:
+			return None
+
+		key_columns = [col for col in data.rollup_key_columns if col in column_headers]
+		skip_columns = set(key_columns + ['jday', 'mon', 'day', 'yr'])
+		value_columns = [col for col, col_type in zip(column_headers, column_types) if col_type == 'REAL' and col not in skip_columns]
+		if len(key_columns) < 1 or len(value_columns) < 1:
+			return None
+
+		column_units = {col: unit.strip() for col, unit in zip(column_headers, units)}
+		mean = []
+		for col in value_columns:
+			unit = column_units.get(col, '').lower()
+			mean.append(unit == '' or unit in data.rollup_mean_units or col in data.rollup_mean_columns or any(col.endswith(sfx) for sfx in data.rollup_mean_suffixes))
+
+		family = table_name[:-len('_day')]
+		key_types = [column_types[column_headers.index(col)] for col in key_columns]
+		rollup = {
+			'key_idx': [column_headers.index(col) for col in key_columns],
+			'yr_idx': column_headers.index('yr'),
+			'mon_idx': column_headers.index('mon'),
+			'value_idx': [column_headers.index(col) for col in value_columns],
+			'mean': mean
+		}
+
+		for period, time_columns in (('mon', ['yr', 'mon']), ('yr', ['yr'])):
+			rollup_table = '{}_{}_rollup'.format(family, period)
+			period_columns = key_columns + time_columns + ['days'] + value_columns
+			period_types = key_types + ['INTEGER' for _ in time_columns] + ['INTEGER'] + ['REAL' for _ in value_columns]
+
+			description = '{ts} {n} (rolled up from daily)'.format(ts=data.time_series_labels[period], n=data.table_labels.get(desc_key, family))
+			self.cursor.execute('INSERT INTO table_description (table_name, description) VALUES (?, ?)', (rollup_table, description))
+			self.cursor.execute("""
+			CREATE TABLE IF NOT EXISTS {} (
+				id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+				{}
+			)
+			""".format(rollup_table, ', '.join('{} {}'.format(col, col_type) for col, col_type in zip(period_columns, period_types))))
 
-		# Process file in streaming fashion
+			for col, is_mean in zip(value_columns, mean):
+				unit = column_units.get(col, '')
+				if unit:
+					col_desc = cat_cols.get(col, '') if cat_cols else ''
+					col_desc = '{} ({})'.format(col_desc, 'mean' if is_mean else 'sum').strip()
+					self.cursor.execute("""
+						INSERT INTO column_description (table_name, column_name, units, description)
+						VALUES (?, ?, ?, ?)
+					""", (rollup_table, col, unit, col_desc))
+
+			rollup['{}_insert_sql'.format(period)] = 'INSERT INTO {} ({}) VALUES ({})'.format(rollup_table, ','.join(period_columns), ','.join(['?' for _ in period_columns]))
+
+		self.conn.commit()
+		return rollup
+
+	def get_row_filter(self, table_name, column_headers, year_column='yr'):
+		"""
+		Return the column positions and values used to discard rows outside the requested objects and years while streaming.
+		Object filters are keyed by table name or table family (e.g. channel_sd for every time step), with a single
+		gis_id, unit or name column and its values. Average annual tables are not filtered by year.
+		"""
+		row_filter = {'filter_idx': None, 'filter_values': None, 'yr_idx': None, 'yr_start': None, 'yr_end': None}
+
+		object_filter = self.object_filters.get(table_name, self.object_filters.get(schema.table_family(table_name), None))
+		if object_filter:
+			column, values = next(iter(object_filter.items()))
+			if column in column_headers:
+				row_filter['filter_idx'] = column_headers.index(column)
+				row_filter['filter_values'] = set(str(v).strip() for v in values)
+
+		if (self.year_start is not None or self.year_end is not None) and not table_name.endswith('_aa') and year_column in column_headers:
+			row_filter['yr_idx'] = column_headers.index(year_column)
+			row_filter['yr_start'] = self.year_start if self.year_start is not None else 0
+			row_filter['yr_end'] = self.year_end if self.year_end is not None else 9999
+
+		return row_filter
+
+	def get_filter_key(self, table_name):
+		"""Describe the filters applied to a table, stored in the import manifest so changing filters triggers a re-import."""
+		object_filter = self.object_filters.get(table_name, self.object_filters.get(schema.table_family(table_name), None))
+		years = None if table_name.endswith('_aa') else [self.year_start, self.year_end]
+		rollups = self.rollups and table_name.endswith('_day')
+		compact = self.storage == 'compact' and (table_name.endswith('_day') or table_name.endswith('_mon'))
+		if not object_filter and (years is None or years == [None, None]) and not rollups and not compact:
+			return None
+		return json.dumps({'objects': object_filter, 'years': years, 'rollups': rollups, 'compact': compact}, sort_keys=True)
+
+	def insert_rows(self, insert_sql, batches, file=None):
+		"""
+		Write (insert statement, rows) batches, returning the number of rows inserted with insert_sql.
+		Time spent writing is added to the import stats of file, if given.
+		"""
 		inserted_count = 0
-		adjusted_count = 0
-		batch = []
-		
-		with open(file_path, 'r', buffering=8192*1024) as f:  # 8MB buffer
-			if delimiter == 'whitespace':
-				# Custom generator for whitespace-delimited files
-				reader = (re.split(r'\s+', line.strip()) for line in f)
-			else:
-				# Standard csv.reader for comma or tab (single character delimiters)
-				reader = csv.reader(f, delimiter=delimiter)
+		insert_seconds = 0.0
+		for batch_sql, batch in batches:
+			start = time.perf_counter()
+			self.cursor.executemany(batch_sql, batch)
+			self.conn.commit()
+			insert_seconds += time.perf_counter() - start
+			if batch_sql == insert_sql:
+				inserted_count += len(batch)
 
-			# Skip header lines
-			i = 0
-			for row in reader:
-				i += 1
-				if i < data_start_line or not row or len(row) < 1:
+		if file is not None:
+			self.add_file_stats(file, insert_seconds=insert_seconds)
+		return inserted_count
+
+	def read_files_sequential(self, files):
+		for file in files:
+			self.emit_progress(self.get_progress(), 'Importing {}...'.format(file))
+			try:
+				warnings = self.read_file(file)
+				self.progress_bytes += self.file_size(file)
+				if warnings is None:
+					self.emit_progress(self.get_progress(), 'Imported {}'.format(file), self.get_file_stats(file))
+				yield file, warnings, None
+			except Exception as e:
+				self.progress_bytes += self.file_size(file)
+				yield file, None, 'Error processing {}:\n {}\n{}\n\n'.format(file, e, traceback.format_exc())
+
+	def file_size(self, file):
+		file_path, found = self.output_file_path(file)
+		return os.path.getsize(file_path) if found else 0
+
+	def get_progress(self):
+		if self.progress_total_bytes < 1:
+			return 0
+		return min(98, round(self.progress_bytes * 98 / self.progress_total_bytes))
+
+	def add_file_stats(self, file, **seconds):
+		stats = self.file_stats.setdefault(file, {'parse_seconds': None, 'insert_seconds': 0.0, 'total_seconds': 0.0})
+		for key, value in seconds.items():
+			stats[key] = value if stats[key] is None else stats[key] + value
+
+	def get_file_stats(self, file):
+		"""
+		Return the rows, bytes and timings of an imported file. Parse time is measured by the parallel workers,
+		otherwise it is the time not spent writing to the database.
+		"""
+		stats = self.file_stats.get(file, {'parse_seconds': None, 'insert_seconds': 0.0, 'total_seconds': 0.0})
+		rows = self.file_row_counts.get(file, 0)
+		size = self.file_size(file)
+		total = stats['total_seconds']
+		parse = stats['parse_seconds'] if stats['parse_seconds'] is not None else max(0.0, total - stats['insert_seconds'])
+		return {
+			'file': file,
+			'rows': rows,
+			'bytes': size,
+			'parse_seconds': round(parse, 3),
+			'insert_seconds': round(stats['insert_seconds'], 3),
+			'total_seconds': round(total, 3),
+			'rows_per_second': round(rows / total) if total > 0 else None,
+			'mb_per_second': round(size / 1024 / 1024 / total, 2) if total > 0 else None
+		}
+
+	def save_file_stats(self, file):
+		stats = self.get_file_stats(file)
+		table_name = 'mgt_out' if file == 'mgt_out.txt' else output_table_name(file)
+		self.cursor.execute("""
+			INSERT OR REPLACE INTO import_stats (file_name, table_name, row_count, file_bytes, parse_seconds, insert_seconds, total_seconds, rows_per_second, mb_per_second, workers, import_time)
+			VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+		""", (file, table_name, stats['rows'], stats['bytes'], stats['parse_seconds'], stats['insert_seconds'], stats['total_seconds'], stats['rows_per_second'], stats['mb_per_second'], self.workers, datetime.now()))
+		self.conn.commit()
+
+	def write_stats_summary(self, log_file, import_seconds, index_seconds=None, slowest=10):
+		"""Append the import totals and the slowest files to the log. Rates use the elapsed import time, as files may overlap with workers."""
+		stats = [self.get_file_stats(file) for file in self.file_stats.keys()]
+		if len(stats) < 1:
+			return
+
+		rows = sum(s['rows'] for s in stats)
+		size = sum(s['bytes'] for s in stats)
+		with open(log_file, 'a') as f:
+			f.write('\nImported {:,} rows ({:.1f} MB) from {} files in {:.1f} s'.format(rows, size / 1024 / 1024, len(stats), import_seconds))
+			if import_seconds > 0:
+				f.write(', {:,.0f} rows/s, {:.1f} MB/s'.format(rows / import_seconds, size / 1024 / 1024 / import_seconds))
+			f.write(' (parse {:.1f} s, insert {:.1f} s).\n'.format(sum(s['parse_seconds'] for s in stats), sum(s['insert_seconds'] for s in stats)))
+			if index_seconds is not None:
+				f.write('Built indexes in {:.1f} s.\n'.format(index_seconds))
+
+			f.write('Slowest files:\n')
+			for s in sorted(stats, key=lambda s: -s['total_seconds'])[:slowest]:
+				f.write('  {:<36} {:>12,} rows {:>9.1f} MB {:>8.2f} s {:>10} rows/s\n'.format(s['file'], s['rows'], s['bytes'] / 1024 / 1024, s['total_seconds'], '{:,}'.format(s['rows_per_second']) if s['rows_per_second'] is not None else '-'))
+			f.write('\n')
+
+	def read_files_parallel(self, files):
+		"""
+		Parse and type-convert files in a pool of worker processes while this process is the single writer.
+		Headings are read and tables created up front so workers only stream converted row batches through a bounded queue.
+		"""
+		layouts = []
+		for file in files:
+			try:
+				layout, warnings = self.prepare_file(file)
+				if layout is None:
+					self.progress_bytes += self.file_size(file)
+					yield file, warnings, None
+				else:
+					layouts.append(layout)
+			except Exception as e:
+				yield file, None, 'Error processing {}:\n {}\n{}\n\n'.format(file, e, traceback.format_exc())
+
+		if len(layouts) < 1:
+			return
+
+		ctx = multiprocessing.get_context()
+		batch_queue = ctx.Queue(maxsize=self.workers * 2)
+		pending = set(layout['file'] for layout in layouts)
+		insert_sqls = {layout['file']: layout['insert_sql'] for layout in layouts}
+		with ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx, initializer=_init_parse_worker, initargs=(batch_queue,)) as executor:
+			futures = {layout['file']: executor.submit(_parse_file_worker, layout, self.batch_size) for layout in layouts}
+			self.emit_progress(self.get_progress(), 'Importing {} files with {} workers...'.format(len(layouts), self.workers))
+
+			while len(pending) > 0:
+				try:
+					message = batch_queue.get(timeout=1)
+				except queue.Empty:
+					# A worker died without reporting back, e.g. killed by the OS for running out of memory
+					for file, e in failed_workers(futures, pending).items():
+						pending.discard(file)
+						self.progress_bytes += self.file_size(file)
+						yield file, None, 'Error processing {}:\n Worker process ended unexpectedly: {!r}\n\n'.format(file, e)
 					continue
-				
-				# Adjust gis_id if needed (before type conversion)
-				if fix_gis_id and gis_id_idx is not None and name_idx is not None:
-					gis_id_val = row[gis_id_idx].strip()
-					name_val = row[name_idx].strip()
-					
-					try:
-						if gis_id_val and int(gis_id_val) == 0:
-							adjusted_val = adjust_gis_id(gis_id_val, name_val)
-							if adjusted_val != 0:
-								row[gis_id_idx] = str(adjusted_val)
-								adjusted_count += 1
-					except (ValueError, TypeError):
-						pass
-				
-				# Convert values - minimal processing for speed
-				converted_row = []
-				for value, col_type in zip_longest(row, column_types, fillvalue=None):
-					value = None if value is None else value.strip()
-					if not value:
-						converted_row.append(None)
-					elif col_type == 'INTEGER':
-						try:
-							converted_row.append(int(value))
-						except ValueError:
-							converted_row.append(None)
-					elif col_type == 'REAL':
-						try:
-							converted_row.append(float(value))
-						except ValueError:
-							converted_row.append(None)
-					else:
-						converted_row.append(value)
-				
-				batch.append(converted_row)
-				
-				# Batch insert for efficiency
-				if len(batch) >= self.batch_size:
-					self.cursor.executemany(insert_sql, batch)
-					self.conn.commit()
-					inserted_count += len(batch)
-					batch = []
-			
-			# Insert remaining rows
-			if batch:
-				self.cursor.executemany(insert_sql, batch)
-				self.conn.commit()
-				inserted_count += len(batch)
-		
-		return None
+
+				kind, file, payload = message
+				if kind == 'rows':
+					self.file_row_counts[file] = self.file_row_counts.get(file, 0) + self.insert_rows(insert_sqls[file], [payload], file)
+				elif kind == 'done':
+					pending.discard(file)
+					self.add_file_stats(file, **payload)
+					self.progress_bytes += self.file_size(file)
+					self.emit_progress(self.get_progress(), 'Imported {}'.format(file), self.get_file_stats(file))
+					yield file, None, None
+				elif kind == 'error':
+					pending.discard(file)
+					self.progress_bytes += self.file_size(file)
+					yield file, None, 'Error processing {}:\n {}\n\n'.format(file, payload)
+
+	def read_live(self, is_running, since=None, poll_interval=2.0):
+		"""
+		Import output while SWAT+ is still writing it, so most of the import overlaps the model run.
+		Files listed in files_out.out are tailed from a byte offset each poll and only complete lines are imported;
+		the database uses WAL so partial results can be read meanwhile. is_running is checked every poll and once it
+		returns False a last pass picks up the remaining lines before the import is finished as with read().
+		Files not modified since `since` (default: now) are left over from an earlier run and wait to be rewritten.
+		"""
+		self.import_start = time.perf_counter()
+		self.set_safety_level('safe')
+		self.setup_meta_tables()
+		log_file = self.start_log()
+		since = time.time() if since is None else since
+
+		tails = {}
+		watch_files = []
+		listed_files = set()
+		files_with_errors = []
+		log_issue_count = 0
+		finished = False
+		while not finished:
+			finished = not is_running()
+
+			try:
+				files = self.get_output_files()
+			except ValueError as ve:
+				# files_out.out may be caught mid-write, read it again next poll
+				if finished:
+					sys.exit(ve)
+				files = []
+
+			new_files = [file for file in files if file not in listed_files]
+			listed_files.update(new_files)
+			watch_files += self.get_import_files(new_files, log_file)
+
+			for file in list(watch_files):
+				try:
+					tail = tails.get(file, None)
+					if tail is not None and os.path.getsize(tail['layout']['file_path']) < tail['offset']:
+						# Truncated, e.g. a file from an earlier run reopened by SWAT+, so start it over
+						del tails[file]
+						self.file_row_counts.pop(file, None)
+						tail = None
+
+					if tail is None:
+						tail, warnings = self.start_tail(file, since, finished)
+						if warnings:
+							watch_files.remove(file)
+							with open(log_file, 'a') as f:
+								f.write(warnings + '\n')
+								log_issue_count += 1
+						if tail is None:
+							continue
+						tails[file] = tail
+
+					start = time.perf_counter()
+					batches = self.read_tail(tail)
+					if finished:
+						batches = chain(batches, tail['stream'].finish())
+					self.file_row_counts[file] = self.file_row_counts.get(file, 0) + self.insert_rows(tail['layout']['insert_sql'], batches, file)
+					self.add_file_stats(file, total_seconds=time.perf_counter() - start)
+				except Exception as e:
+					watch_files.remove(file)
+					tails.pop(file, None)
+					files_with_errors.append(file)
+					with open(log_file, 'a') as f:
+						f.write('Error processing {}:\n {}\n{}\n\n'.format(file, e, traceback.format_exc()))
+						log_issue_count += 1
+
+			if not finished:
+				self.emit_progress(0, 'Importing output while SWAT+ runs: {} rows from {} files...'.format(sum(self.file_row_counts.values()), len(tails)))
+				time.sleep(poll_interval)
+
+		for file, tail in tails.items():
+			file_path = tail['layout']['file_path']
+			self.pending_manifest(file, tail['layout']['table_name'], file_fingerprint(file_path), self.get_filter_key(tail['layout']['table_name']))
+			self.complete_manifest(file)
+			self.save_file_stats(file)
+
+		self.finish_import(log_file, len(listed_files), log_issue_count)
+
+	def start_tail(self, file, since, force=False):
+		"""
+		Create the table of a file being written and return its tail state, or None while the file is still a leftover
+		from an earlier run or has not yet written its headings and first data line. With force the file is prepared as is.
+		"""
+		file_path, found = self.output_file_path(file)
+		if not force:
+			if not found or os.path.getmtime(file_path) < since:
+				return None, None
+
+			with open(file_path, 'rb') as f:
+				for i in range(self.get_data_start_line(output_table_name(file))):
+					if not f.readline().endswith(b'\n'):
+						return None, None
+
+		self.drop_output_table(output_table_name(file))
+		layout, warnings = self.prepare_file(file)
+		if layout is None:
+			return None, warnings
+		return {'layout': layout, 'stream': RowStream(layout, self.batch_size), 'offset': 0}, None
+
+	def read_tail(self, tail, chunk_size=8192*1024):
+		"""Yield the batches of the complete lines appended to a tailed file since the last poll."""
+		layout = tail['layout']
+		with open(layout['file_path'], 'rb') as f:
+			while True:
+				f.seek(tail['offset'])
+				chunk = f.read(chunk_size)
+				end = chunk.rfind(b'\n') + 1
+				if end < 1:
+					return
+
+				# Keep a partly written last line for the next poll
+				tail['offset'] += end
+				lines = chunk[:end].decode('utf-8', errors='replace').splitlines()
+				yield from tail['stream'].feed(line_reader(lines, layout['delimiter']))
+				if len(chunk) < chunk_size:
+					return
+
+	def get_data_start_line(self, table_name):
+		desc_key = table_name
+		for key in data.time_series_labels:
+			desc_key = desc_key.replace('_{}'.format(key), '')
+		return data.special_start_lines.get(desc_key, data.default_start_line)
+
+	def check_manifest(self, files):
+		"""
+		Fingerprint files against the import manifest and return the ones that need importing.
+		Outside of incremental mode every file is returned. Files to import are marked pending and their old tables dropped,
+		so an import that stops partway is picked up again on the next incremental run.
+		"""
+		changed = []
+		for file in files:
+			table_name = 'mgt_out' if file == 'mgt_out.txt' else output_table_name(file)
+			file_path, found = self.output_file_path(file)
+			if not found:
+				self.drop_output_table(table_name)
+				self.cursor.execute('DELETE FROM import_manifest WHERE file_name = ?', (file,))
+				self.cursor.execute('DELETE FROM import_stats WHERE file_name = ?', (file,))
+				changed.append(file)
+				continue
+
+			stat = os.stat(file_path)
+			filter_key = self.get_filter_key(table_name)
+			self.cursor.execute('SELECT file_size, file_mtime, file_hash, status, filter_key FROM import_manifest WHERE file_name = ?', (file,))
+			existing = self.cursor.fetchone()
+			if self.incremental and existing is not None and existing[3] == 'complete' and existing[0] == stat.st_size and existing[4] == filter_key:
+				if existing[1] == stat.st_mtime:
+					if existing[2] is None:
+						# Imported by a full import, which doesn't hash files; hash now so later runs can compare contents
+						self.cursor.execute('UPDATE import_manifest SET file_hash = ? WHERE file_name = ?', (file_fingerprint(file_path)[2], file))
+					continue
+
+				# Touched but possibly unchanged, e.g. a scenario re-run printing the same object
+				size, mtime, file_hash = file_fingerprint(file_path)
+				if file_hash == existing[2]:
+					self.cursor.execute('UPDATE import_manifest SET file_mtime = ? WHERE file_name = ?', (mtime, file))
+					continue
+			elif self.incremental:
+				size, mtime, file_hash = file_fingerprint(file_path)
+			else:
+				# Reading every file twice would double the time of a full import, so only incremental runs hash contents
+				size, mtime, file_hash = stat.st_size, stat.st_mtime, None
+
+			self.drop_output_table(table_name)
+			self.pending_manifest(file, table_name, (size, mtime, file_hash), filter_key)
+			changed.append(file)
+
+		if self.incremental:
+			# Remove tables of files that no longer exist in the output folder
+			self.cursor.execute('SELECT file_name, table_name FROM import_manifest')
+			for file, table_name in self.cursor.fetchall():
+				if not self.output_file_path(file)[1]:
+					self.drop_output_table(table_name)
+					self.cursor.execute('DELETE FROM import_manifest WHERE file_name = ?', (file,))
+					self.cursor.execute('DELETE FROM import_stats WHERE file_name = ?', (file,))
+
+		self.conn.commit()
+		return changed
+
+	def pending_manifest(self, file, table_name, fingerprint, filter_key):
+		size, mtime, file_hash = fingerprint
+		self.cursor.execute("""
+			INSERT OR REPLACE INTO import_manifest (file_name, table_name, file_size, file_mtime, file_hash, filter_key, status, row_count, import_time)
+			VALUES (?, ?, ?, ?, ?, ?, 'pending', NULL, NULL)
+		""", (file, table_name, size, mtime, file_hash, filter_key))
+
+	def complete_manifest(self, file):
+		self.cursor.execute("UPDATE import_manifest SET status = 'complete', row_count = ?, import_time = ? WHERE file_name = ?", (self.file_row_counts.get(file, 0), datetime.now(), file))
+		self.conn.commit()
+
+	def drop_output_table(self, table_name):
+		tables = [table_name, '{}_series'.format(table_name), '{}_series_obj'.format(table_name)]
+		if table_name.endswith('_day'):
+			tables += ['{}_mon_rollup'.format(table_name[:-4]), '{}_yr_rollup'.format(table_name[:-4])]
+		self.cursor.execute('DELETE FROM series_calendar WHERE table_name = ?', (table_name,))
+		self.cursor.execute('DELETE FROM series_variable WHERE table_name = ?', (table_name,))
+
+		for table in tables:
+			self.cursor.execute('DROP TABLE IF EXISTS {}'.format(table))
+			self.cursor.execute('DELETE FROM table_description WHERE table_name = ?', (table,))
+			self.cursor.execute('DELETE FROM column_description WHERE table_name = ?', (table,))
+
+	def get_index_columns(self, table_name):
+		if table_name.endswith('_series'):
+			# Keyed on (obj_id, var_id, start_idx) already
+			return []
+
+		if table_name.endswith('_rollup'):
+			table_name = table_name[:-len('_rollup')]
+
+		special = data.special_index_columns.get(schema.table_family(table_name), data.special_index_columns.get(table_name, None))
+		if special is not None:
+			return special
+
+		for key in data.time_series_labels:
+			if table_name.endswith('_{}'.format(key)):
+				return data.index_columns[key]
+		return []
+
+	def create_indexes(self):
+		"""
+		Index the object and time columns of the imported tables per data.index_columns, then refresh the query planner statistics.
+		Run once after the bulk load so inserts don't maintain the indexes row by row.
+		"""
+		self.cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name IN (SELECT table_name FROM table_description UNION SELECT 'mgt_out')")
+		tables = [row[0] for row in self.cursor.fetchall()]
+		for table_name in tables:
+			self.cursor.execute('PRAGMA table_info({})'.format(table_name))
+			table_columns = set(row[1] for row in self.cursor.fetchall())
+			for columns in self.get_index_columns(table_name):
+				if all(col in table_columns for col in columns):
+					index_name = 'idx_{}_{}'.format(table_name, '_'.join(columns))
+					self.cursor.execute('CREATE INDEX IF NOT EXISTS {} ON {} ({})'.format(index_name, table_name, ', '.join(columns)))
+			self.conn.commit()
+
+		# Sample rather than scan full indexes when gathering statistics on large tables
+		self.cursor.execute('PRAGMA analysis_limit = 1000')
+		self.cursor.execute('ANALYZE')
+		self.conn.commit()
 
 	def setup_meta_tables(self):
 		self.cursor.execute("""
@@ -439,6 +1550,57 @@ class ReadOutput(ExecutableApi):
 				skip_files VARCHAR (255)
 			)
 		""")
+
+		self.cursor.execute("""
+			CREATE TABLE IF NOT EXISTS series_calendar (
+				table_name VARCHAR (255) NOT NULL,
+				idx INTEGER NOT NULL,
+				jday INTEGER,
+				mon INTEGER,
+				day INTEGER,
+				yr INTEGER,
+				PRIMARY KEY (table_name, idx)
+			)
+		""")
+
+		self.cursor.execute("""
+			CREATE TABLE IF NOT EXISTS series_variable (
+				table_name VARCHAR (255) NOT NULL,
+				var_id INTEGER NOT NULL,
+				variable VARCHAR (255) NOT NULL,
+				PRIMARY KEY (table_name, var_id)
+			)
+		""")
+
+		self.cursor.execute("""
+			CREATE TABLE IF NOT EXISTS import_manifest (
+				file_name VARCHAR (255) NOT NULL PRIMARY KEY,
+				table_name VARCHAR (255) NOT NULL,
+				file_size INTEGER,
+				file_mtime REAL,
+				file_hash VARCHAR (64),
+				filter_key TEXT,
+				status VARCHAR (16) NOT NULL,
+				row_count INTEGER,
+				import_time DATETIME
+			)
+		""")
+
+		self.cursor.execute("""
+			CREATE TABLE IF NOT EXISTS import_stats (
+				file_name VARCHAR (255) NOT NULL PRIMARY KEY,
+				table_name VARCHAR (255) NOT NULL,
+				row_count INTEGER,
+				file_bytes INTEGER,
+				parse_seconds REAL,
+				insert_seconds REAL,
+				total_seconds REAL,
+				rows_per_second REAL,
+				mb_per_second REAL,
+				workers INTEGER,
+				import_time DATETIME
+			)
+		""")
 		self.conn.commit()
 	
 	def set_safety_level(self, safety_level):
@@ -463,21 +1625,17 @@ class ReadOutput(ExecutableApi):
 			#self.cursor.execute("PRAGMA locking_mode = EXCLUSIVE")
 
 	def read_mgt_out_file(self):
+		"""
+		Import mgt_out.txt with the fixed-layout parser in mgt_out_rows.
+		Large files are split into byte ranges parsed by the worker processes when workers > 1.
+		"""
 		file_path = os.path.join(self.output_files_dir, 'mgt_out.txt')
 		check_path = Path(file_path)
 		if check_path.is_file():
 			self.emit_progress(99, 'Importing mgt_out.txt...')
+			start = time.perf_counter()
 			table_name = 'mgt_out'
-			column_headers = ['hru', 'year', 'mon', 'day', 'crop', 'operation', 'phubase', 'phuplant', 'soil_water', 'plant_bioms', 'surf_rsd', 'soil_no3', 'soil_solp', 'op_var', 'var1', 'var2', 'var3', 'var4', 'var5', 'var6', 'var7']
-			column_types = ['INTEGER', 'INTEGER', 'INTEGER', 'INTEGER', 'TEXT', 'TEXT', 'REAL', 'REAL', 'REAL', 'REAL', 'REAL', 'REAL', 'REAL', 'REAL', 'REAL', 'REAL', 'REAL', 'REAL', 'REAL', 'REAL', 'REAL']
-			delimiter = 'whitespace'
-			data_start_line = 4
-
-			# Create table schema
-			columns_with_types = [f"{col_name} {col_type}" for col_name, col_type in zip(column_headers, column_types)]
-			if not columns_with_types:
-				return 'No data found in file: {}'.format(file_path)
-			
+			columns_with_types = [f"{col_name} {col_type}" for col_name, col_type in zip(mgt_out_columns, mgt_out_types)]
 			create_table_sql = f"""
 			CREATE TABLE IF NOT EXISTS {table_name} (
 				id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
@@ -489,85 +1647,49 @@ class ReadOutput(ExecutableApi):
 			except Exception as e:
 				raise Exception('Error creating table {} SQL: {}'.format(table_name, create_table_sql))
 
-			# Process file in streaming fashion
-			inserted_count = 0
-			adjusted_count = 0
-			batch = []
-
-			placeholders = ','.join(['?' for _ in column_headers])
-			insert_sql = f"INSERT INTO {table_name} ({','.join(column_headers)}) VALUES ({placeholders})"
-			
-			with open(file_path, 'r', buffering=8192*1024) as f:  # 8MB buffer
-				if delimiter == 'whitespace':
-					# Custom generator for whitespace-delimited files
-					reader = (re.split(r'\s+', line.strip()) for line in f)
-				else:
-					# Standard csv.reader for comma or tab (single character delimiters)
-					reader = csv.reader(f, delimiter=delimiter)
+			placeholders = ','.join(['?' for _ in mgt_out_columns])
+			insert_sql = f"INSERT INTO {table_name} ({','.join(mgt_out_columns)}) VALUES ({placeholders})"
+			row_filter = self.get_row_filter(table_name, mgt_out_columns, year_column='year')
 
-				# Skip header lines
-				i = 0
-				for row in reader:
-					i += 1
-					if i < data_start_line or not row or len(row) < 1:
-						continue
+			file_size = os.path.getsize(file_path)
+			if self.workers > 1 and file_size > mgt_out_chunk_size:
+				inserted_count = self.read_mgt_out_parallel(file_path, file_size, insert_sql, row_filter)
+			else:
+				with open(file_path, 'r', buffering=8192*1024) as f:  # 8MB buffer
+					for i in range(mgt_out_start_line - 1):
+						f.readline()
+					batches = ((insert_sql, batch) for batch in mgt_out_rows(f, row_filter, self.batch_size))
+					inserted_count = self.insert_rows(insert_sql, batches, 'mgt_out.txt')
 
-					# Fix if column 5 is empty - column 6 will be "IRRIGATE" or "FERT"
-					if len(row) > 5 and row[4] and row[4].strip() in ('IRRIGATE', 'FERT'):
-						# Column 5 is missing, shift everything right
-						row = row[:4] + [''] + row[4:]
-
-					# Fix column 6 if it has spaces - column 7 should be a number
-					# Keep merging column 6 parts until column 7 is a valid number
-					if len(row) > 6:
-						# Check if position 6 (column 7) is a number
-						col_7_idx = 6
-						while col_7_idx < len(row):
-							try:
-								float(row[col_7_idx].strip()) if row[col_7_idx] else None
-								# Successfully converted - this is column 7
-								break
-							except (ValueError, AttributeError):
-								# Not a number yet, keep looking
-								col_7_idx += 1
-						
-						# If we moved past index 6, merge the split text in column 6
-						if col_7_idx > 6:
-							merged_text = ' '.join(row[5:col_7_idx])
-							row = row[:5] + [merged_text] + row[col_7_idx:]
-
-					# Convert values - minimal processing for speed
-					converted_row = []
-					for value, col_type in zip_longest(row, column_types, fillvalue=None):
-						value = None if value is None else value.strip()
-						if not value:
-							converted_row.append(None)
-						elif col_type == 'INTEGER':
-							try:
-								converted_row.append(int(value))
-							except ValueError:
-								converted_row.append(None)
-						elif col_type == 'REAL':
-							try:
-								converted_row.append(float(value))
-							except ValueError:
-								converted_row.append(None)
-						else:
-							converted_row.append(value)
-					
-					batch.append(converted_row)
-					
-					# Batch insert for efficiency
-					if len(batch) >= self.batch_size:
-						self.cursor.executemany(insert_sql, batch)
-						self.conn.commit()
-						inserted_count += len(batch)
-						batch = []
-				
-				# Insert remaining rows
-				if batch:
-					self.cursor.executemany(insert_sql, batch)
-					self.conn.commit()
-					inserted_count += len(batch)
+			self.file_row_counts['mgt_out.txt'] = inserted_count
+			self.add_file_stats('mgt_out.txt', total_seconds=time.perf_counter() - start)
 
 		return None
+
+	def read_mgt_out_parallel(self, file_path, file_size, insert_sql, row_filter):
+		"""Parse byte ranges of mgt_out.txt in worker processes, writing their batches as they arrive."""
+		chunk_count = max(self.workers, -(-file_size // mgt_out_chunk_size))
+		bounds = [round(file_size * i / chunk_count) for i in range(chunk_count + 1)]
+
+		ctx = multiprocessing.get_context()
+		batch_queue = ctx.Queue(maxsize=self.workers * 2)
+		pending = set(range(chunk_count))
+		inserted_count = 0
+		with ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx, initializer=_init_parse_worker, initargs=(batch_queue,)) as executor:
+			futures = {i: executor.submit(_parse_mgt_out_worker, i, file_path, bounds[i], bounds[i + 1], row_filter, self.batch_size) for i in range(chunk_count)}
+			while len(pending) > 0:
+				try:
+					kind, chunk, payload = batch_queue.get(timeout=1)
+				except queue.Empty:
+					failed = failed_workers(futures, pending)
+					if len(failed) > 0:
+						raise Exception('Worker process ended unexpectedly: {!r}'.format(next(iter(failed.values()))))
+					continue
+
+				if kind == 'rows':
+					inserted_count += self.insert_rows(insert_sql, [(insert_sql, payload)], 'mgt_out.txt')
+				elif kind == 'done':
+					pending.discard(chunk)
+				elif kind == 'error':
+					raise Exception(payload)
+		return inserted_count
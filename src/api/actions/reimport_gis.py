@@ -1,27 +1,241 @@
 from helpers.executable_api import ExecutableApi, Unbuffered
 from helpers import utils
-from database import lib
-from database.project import base as project_base, simulation
+from database import lib, snapshot
+from database.project import base as project_base, simulation, connect, climate
 from database.project.config import Project_config
 from database.project.setup import SetupProjectDatabase
 from database.datasets.setup import SetupDatasetsDatabase
 from database.datasets.definitions import Version
-from .import_gis import GisImport
+from .import_gis import GisImport, FINGERPRINT_TABLES, gis_digests, routing_digest, load_gis_fingerprint, save_gis_fingerprint
+from .import_weather import station_index
 from . import update_project, update_datasets
 
-import sys
+import sys, traceback
 import argparse
 import os, os.path
 import json
-from shutil import copyfile
-import time
+import sqlite3
+
+
+def changed_ids(stored, current):
+	"""Return the gis ids of stored ({gis id: (digest, object id)}) that are missing from or have another digest in current ({gis id: digest})."""
+	return [gis_id for gis_id, (digest, obj_id) in stored.items() if current.get(gis_id, None) != digest]
+
+
+class IncrementalGisImport(GisImport):
+	"""
+	Re-import only what changed in the gis_* tables since the fingerprint saved by the last import, so the cost follows
+	the size of the change and edits to everything else are kept. HRUs whose gis_hrus row was added, changed or removed
+	are inserted, replaced or deleted; changed channels and LSUs are updated in place; the connections are rebuilt when
+	gis_routing changed. Changes to other gis tables, or channels and LSUs added or removed, need a full re-import.
+	"""
+	def __init__(self, project_db_file, rollback_db=None):
+		super().__init__(project_db_file, False, True, rollback_db)
+
+	def reimport(self):
+		"""Apply the changes and return True, or return False, leaving the project as it is, if a full re-import is needed."""
+		if self.is_lte or not self.config.imported_gis:
+			return False
+
+		stored, stored_routing = load_gis_fingerprint(self.project_db)
+		if stored is None:
+			self.emit_progress(10, "No record of the last GIS import; running a full re-import...")
+			return False
+
+		self.emit_progress(10, "Comparing GIS tables to the last import...")
+		current = {table: gis_digests(self.project_db, table) for table in FINGERPRINT_TABLES}
+		reason = self.full_reimport_reason(stored, current)
+		if reason is not None:
+			self.emit_progress(10, "{reason}; running a full re-import...".format(reason=reason))
+			return False
+
+		self.gis_to_cha_ids = {gis_id: obj_id for gis_id, (digest, obj_id) in stored['gis_channels'].items()}
+		self.gis_to_rtu_ids = {gis_id: obj_id for gis_id, (digest, obj_id) in stored['gis_lsus'].items()}
+		self.gis_to_aqu_ids = {gis_id: obj_id for gis_id, (digest, obj_id) in stored['gis_aquifers'].items()}
+		self.gis_to_deep_aqu_ids = {gis_id: obj_id for gis_id, (digest, obj_id) in stored['gis_deep_aquifers'].items()}
+		self.gis_to_res_ids = {gis_id: obj_id for gis_id, (digest, obj_id) in stored['gis_water'].items() if obj_id is not None}
+		self.gis_to_rec_ids = {gis_id: obj_id for gis_id, (digest, obj_id) in stored['gis_points'].items() if obj_id is not None}
+
+		channels = changed_ids(stored['gis_channels'], current['gis_channels'])
+		lsus = changed_ids(stored['gis_lsus'], current['gis_lsus'])
+		old_hrus = [(obj_id, gis_id) for gis_id, (digest, obj_id) in stored['gis_hrus'].items() if obj_id is not None and current['gis_hrus'].get(gis_id, None) != digest]
+		new_hrus = [gis_id for gis_id, digest in current['gis_hrus'].items() if stored['gis_hrus'].get(gis_id, (None, None))[0] != digest]
+		routing = routing_digest(self.project_db)
+		routing_changed = routing != stored_routing
+
+		if len(channels) + len(lsus) + len(old_hrus) + len(new_hrus) == 0 and not routing_changed:
+			self.emit_progress(100, "No changes in GIS tables since the last import.")
+			return True
+
+		try:
+			with self.project_db.atomic():
+				if len(channels) > 0:
+					self.emit_progress(20, "Updating {n} channels from GIS...".format(n=len(channels)))
+					self.update_channels(channels)
+
+				if len(lsus) > 0:
+					self.emit_progress(30, "Updating {n} landscape units from GIS...".format(n=len(lsus)))
+					self.update_lsus(lsus)
+
+				rtu_ids = set()
+				if len(old_hrus) > 0:
+					self.emit_progress(40, "Removing {n} changed or deleted hrus...".format(n=len(old_hrus)))
+					rtu_ids.update(self.delete_hrus(old_hrus))
+
+				if len(new_hrus) > 0:
+					self.emit_progress(60, "Importing {n} new or changed hrus from GIS...".format(n=len(new_hrus)))
+					hru_con_start = self.project_db.execute_sql("SELECT IFNULL(MAX(id), 0) FROM hru_con").fetchone()[0]
+					lum_dict = self.insert_landuse(only_missing=True)
+					self.insert_hru_rows(lum_dict, self.get_soil_plant_ini(), new_hrus)
+					cursor = self.project_db.execute_sql("SELECT DISTINCT rtu_id FROM rout_unit_ele WHERE obj_typ = 'hru' AND obj_id > ?", (hru_con_start,))
+					rtu_ids.update(id for id, in cursor.fetchall())
+					self.match_hru_stations(hru_con_start)
+
+				if len(rtu_ids) > 0:
+					self.update_lsu_defs(rtu_ids)
+
+				if routing_changed:
+					self.emit_progress(80, "Rebuilding connections from GIS...")
+					self.rebuild_connections()
+
+				self.emit_progress(95, "Saving GIS import fingerprint...")
+				save_gis_fingerprint(self.project_db, self.fingerprint_obj_ids(), current, routing)
+		except Exception:
+			if self.rollback_db is not None:
+				self.emit_progress(50, "Error occurred. Rolling back database...")
+				SetupProjectDatabase.rollback(self.project_db_file, self.rollback_db)
+				self.emit_progress(100, "Error occurred.")
+			sys.exit(traceback.format_exc())
+
+		self.emit_progress(100, "Updated {c} channels and {l} landscape units, removed {r} and imported {a} hrus{routing}.".format(
+			c=len(channels), l=len(lsus), r=len(old_hrus), a=len(new_hrus), routing=", rebuilt connections" if routing_changed else ""))
+		return True
+
+	def full_reimport_reason(self, stored, current):
+		"""Return why the differences between stored and current digests can't be applied incrementally, or None if they can."""
+		for table in ['gis_subbasins', 'gis_aquifers', 'gis_deep_aquifers', 'gis_water', 'gis_points']:
+			if {gis_id: digest for gis_id, (digest, obj_id) in stored[table].items()} != current[table]:
+				return "{table} changed".format(table=table)
+
+		for table in ['gis_channels', 'gis_lsus']:
+			if stored[table].keys() != current[table].keys():
+				return "Objects were added to or removed from {table}".format(table=table)
+			if any(obj_id is None for digest, obj_id in stored[table].values()):
+				return "The last import did not record the objects created from {table}".format(table=table)
+
+		# Names are padded to the digits of the largest id
+		old_max = max(stored['gis_hrus'].keys(), default=0)
+		new_max = max(current['gis_hrus'].keys(), default=0)
+		if len(str(old_max)) != len(str(new_max)):
+			return "The number of digits of gis_hrus ids changed"
+		return None
+
+	def update_channels(self, gis_ids):
+		"""Update the values taken from GIS of the channels of gis_ids."""
+		ids = set(gis_ids)
+		rows = [row for row in self.project_db.execute_sql("SELECT id, strahler, wid2, dep2, slo2, len2, midlat, midlon, areac FROM gis_channels").fetchall() if row[0] in ids]
+		conn = self.project_db.connection()
+		conn.executemany("""UPDATE hyd_sed_lte_cha SET "order" = ?, wd = ?, dp = ?, slp = ?, len = ?
+			WHERE id = (SELECT l.hyd_id FROM chandeg_con c JOIN channel_lte_cha l ON l.id = c.lcha_id WHERE c.id = ?)""",
+			[(str(strahler), wid2, dep2, slo2 / 100, len2 / 1000, self.gis_to_cha_ids[id]) for id, strahler, wid2, dep2, slo2, len2, midlat, midlon, areac in rows])
+		conn.executemany("UPDATE chandeg_con SET lat = ?, lon = ?, area = ? WHERE id = ?",
+			[(midlat, midlon, areac, self.gis_to_cha_ids[id]) for id, strahler, wid2, dep2, slo2, len2, midlat, midlon, areac in rows])
+
+	def update_lsus(self, gis_ids):
+		"""Update the values taken from GIS of the routing units of gis_ids, their topography and landscape unit area."""
+		ids = set(gis_ids)
+		rows = [row for row in self.project_db.execute_sql("SELECT id, slope, elev, lat, lon, area FROM gis_lsus").fetchall() if row[0] in ids]
+		topography = []
+		for id, slope, elev, lat, lon, area in rows:
+			slp_len = self.get_slope_len(slope / 100)
+			topography.append((slope / 100, slp_len, slp_len, self.gis_to_rtu_ids[id]))
+
+		conn = self.project_db.connection()
+		conn.executemany("""UPDATE topography_hyd SET slp = ?, slp_len = ?, lat_len = ?
+			WHERE id = (SELECT r.topo_id FROM rout_unit_con c JOIN rout_unit_rtu r ON r.id = c.rtu_id WHERE c.id = ?)""", topography)
+		conn.executemany("UPDATE rout_unit_con SET elev = ?, lat = ?, lon = ?, area = ? WHERE id = ?",
+			[(elev, lat, lon, area, self.gis_to_rtu_ids[id]) for id, slope, elev, lat, lon, area in rows])
+		conn.executemany("UPDATE ls_unit_def SET area = ? WHERE id = (SELECT rtu_id FROM rout_unit_con WHERE id = ?)",
+			[(area, self.gis_to_rtu_ids[id]) for id, slope, elev, lat, lon, area in rows])
+
+	def delete_hrus(self, hrus):
+		"""
+		Delete the hru_con rows of hrus, a list of (id, gis_id), with their elements and hru_data rows.
+		Hydrology, topography and wetland rows are only deleted if no remaining HRU uses them.
+		Returns the ids of the routing units the HRUs belonged to.
+		"""
+		conn = self.project_db.connection()
+		conn.execute("DROP TABLE IF EXISTS temp.hru_delete")
+		conn.execute("DROP TABLE IF EXISTS temp.hru_data_delete")
+		conn.execute("DROP TABLE IF EXISTS temp.wet_delete")
+		conn.execute("CREATE TEMP TABLE hru_delete (id INTEGER PRIMARY KEY, hru_id INTEGER)")
+		conn.executemany("INSERT INTO temp.hru_delete (id, hru_id) SELECT id, hru_id FROM hru_con WHERE id = ? AND gis_id = ?", hrus)
+		conn.execute("CREATE TEMP TABLE hru_data_delete AS SELECT id, topo_id, hydro_id, surf_stor_id FROM hru_data_hru WHERE id IN (SELECT hru_id FROM temp.hru_delete)")
+
+		rtu_ids = [id for id, in conn.execute("SELECT DISTINCT rtu_id FROM rout_unit_ele WHERE obj_typ = 'hru' AND obj_id IN (SELECT id FROM temp.hru_delete) AND rtu_id IS NOT NULL").fetchall()]
+		conn.execute("DELETE FROM rout_unit_ele WHERE obj_typ = 'hru' AND obj_id IN (SELECT id FROM temp.hru_delete)")
+		conn.execute("DELETE FROM ls_unit_ele WHERE obj_typ = 'hru' AND obj_typ_no IN (SELECT id FROM temp.hru_delete)")
+		conn.execute("DELETE FROM hru_con_out WHERE hru_con_id IN (SELECT id FROM temp.hru_delete)")
+		conn.execute("DELETE FROM hru_con WHERE id IN (SELECT id FROM temp.hru_delete)")
+		conn.execute("DELETE FROM hru_data_hru WHERE id IN (SELECT id FROM temp.hru_data_delete)")
+
+		conn.execute("""DELETE FROM topography_hyd WHERE id IN (SELECT topo_id FROM temp.hru_data_delete)
+			AND id NOT IN (SELECT topo_id FROM hru_data_hru WHERE topo_id IS NOT NULL) AND id NOT IN (SELECT topo_id FROM rout_unit_rtu WHERE topo_id IS NOT NULL)""")
+		conn.execute("""DELETE FROM hydrology_hyd WHERE id IN (SELECT hydro_id FROM temp.hru_data_delete)
+			AND id NOT IN (SELECT hydro_id FROM hru_data_hru WHERE hydro_id IS NOT NULL)""")
+		conn.execute("""CREATE TEMP TABLE wet_delete AS SELECT id, hyd_id FROM wetland_wet WHERE id IN (SELECT surf_stor_id FROM temp.hru_data_delete)
+			AND id NOT IN (SELECT surf_stor_id FROM hru_data_hru WHERE surf_stor_id IS NOT NULL)""")
+		conn.execute("DELETE FROM wetland_wet WHERE id IN (SELECT id FROM temp.wet_delete)")
+		conn.execute("""DELETE FROM hydrology_wet WHERE id IN (SELECT hyd_id FROM temp.wet_delete)
+			AND id NOT IN (SELECT hyd_id FROM wetland_wet WHERE hyd_id IS NOT NULL)""")
+
+		conn.execute("DROP TABLE temp.hru_delete")
+		conn.execute("DROP TABLE temp.hru_data_delete")
+		conn.execute("DROP TABLE temp.wet_delete")
+		return rtu_ids
+
+	def update_lsu_defs(self, rtu_ids):
+		"""As insert_lsus does for all of them, give the routing units of rtu_ids a ls_unit_def row if and only if they have elements."""
+		conn = self.project_db.connection()
+		conn.execute("DROP TABLE IF EXISTS temp.lsu_update")
+		conn.execute("CREATE TEMP TABLE lsu_update (rtu_id INTEGER PRIMARY KEY)")
+		conn.executemany("INSERT INTO temp.lsu_update (rtu_id) VALUES (?)", ((id,) for id in rtu_ids))
+		conn.execute("""DELETE FROM ls_unit_def WHERE id IN (SELECT rtu_id FROM temp.lsu_update)
+			AND id NOT IN (SELECT rtu_id FROM rout_unit_ele WHERE rtu_id IS NOT NULL)""")
+		conn.execute("""INSERT INTO ls_unit_def (id, name, area)
+			SELECT c.rtu_id, c.name, c.area FROM rout_unit_con c
+			WHERE c.rtu_id IN (SELECT rtu_id FROM temp.lsu_update) AND c.rtu_id IN (SELECT rtu_id FROM rout_unit_ele)
+			AND c.rtu_id NOT IN (SELECT id FROM ls_unit_def) ORDER BY c.id""")
+		conn.execute("DROP TABLE temp.lsu_update")
+
+	def match_hru_stations(self, hru_con_start):
+		"""Set the weather station of the hru_con rows after hru_con_start to the nearest one."""
+		if climate.Weather_sta_cli.select().count() < 1:
+			return
+
+		index = station_index('weather_sta_cli')
+		cursor = self.project_db.execute_sql("SELECT id, lat, lon FROM hru_con WHERE id > ? AND lat IS NOT NULL AND lon IS NOT NULL", (hru_con_start,))
+		values = [(id, index.nearest(lat, lon)) for id, lat, lon in cursor.fetchall()]
+		lib.bulk_update_column(self.project_db, 'hru_con', 'wst_id', values)
+
+	def rebuild_connections(self):
+		"""Replace the con_out rows created from gis_routing."""
+		connect.Rout_unit_con_out.delete().execute()
+		connect.Chandeg_con_out.delete().execute()
+		connect.Aquifer_con_out.delete().execute()
+		connect.Reservoir_con_out.delete().execute()
+		connect.Recall_con_out.delete().execute()
+		self.insert_connections()
+		lib.bulk_insert(self.project_db, connect.Recall_con_out, self.get_recall_con_outs())
+
+
 
 class ReimportGis(ExecutableApi):
-	def __init__(self, project_db, editor_version, project_name=None, datasets_db=None, constant_ps=True, is_lte=False):
+	def __init__(self, project_db, editor_version, project_name=None, datasets_db=None, constant_ps=True, is_lte=False, incremental=False,
+		compress_backup=False, keep_backups=None):
 		self.__abort = False
 
 		base_path = os.path.dirname(project_db)
-		rel_project_db = os.path.relpath(project_db, base_path)
 
 		if datasets_db is None:
 			conn = lib.open_db(project_db)
@@ -53,18 +267,19 @@ class ReimportGis(ExecutableApi):
 		# Backup original db before beginning
 		try:
 			self.emit_progress(2, 'Backing up project database...')
-			filename, file_extension = os.path.splitext(rel_project_db)
-			bak_filename = filename + '_bak_' + time.strftime('%Y%m%d-%H%M%S') + file_extension
-			bak_dir = os.path.join(base_path, 'DatabaseBackups')
-			if not os.path.exists(bak_dir):
-				os.makedirs(bak_dir)
-			backup_db_file = os.path.join(bak_dir, bak_filename)
-			copyfile(project_db, backup_db_file)
-		except IOError as err:
+			backup_db_file = snapshot.create_snapshot(project_db, '_bak', compress_backup, keep_backups,
+				lambda f: self.emit_progress(2, 'Backing up project database ({p}%)...'.format(p=round(f * 100))))
+		except (IOError, sqlite3.Error) as err:
 			sys.exit(err)
 
-		self.emit_progress(5, 'Updating project settings...')
 		config = Project_config.get() # Get again due to modification when updating
+		if incremental and config.is_lte == is_lte:
+			api = IncrementalGisImport(project_db, backup_db_file)
+			if api.reimport():
+				return
+
+		self.emit_progress(5, 'Updating project settings...')
+		config = Project_config.get()
 		config.imported_gis = False
 		config.is_lte = is_lte
 		config.save()
@@ -91,10 +306,15 @@ if __name__ == '__main__':
 	parser.add_argument("--datasets_db_file", type=str, help="full path of datasets SQLite database file", nargs="?")
 	parser.add_argument("--constant_ps", type=str, help="y/n constant point source values (default n)", nargs="?")
 	parser.add_argument("--is_lte", type=str, help="y/n use lte version of SWAT+ (default n)", nargs="?")
+	parser.add_argument("--incremental", type=str, help="y/n only re-import what changed in the GIS tables since the last import (default n)", nargs="?")
+	parser.add_argument("--compress_backup", type=str, help="y/n gzip the backup of the project database (default n)", nargs="?")
+	parser.add_argument("--keep_backups", type=int, help="number of re-import backups of the project database to keep in DatabaseBackups (default all); backups taken before editor upgrades are never deleted", nargs="?")
 
 	args = parser.parse_args()
 
 	constant_ps = True if args.constant_ps == "y" else False
 	is_lte = True if args.is_lte == "y" else False
+	incremental = True if args.incremental == "y" else False
+	compress_backup = True if args.compress_backup == "y" else False
 
-	api = ReimportGis(args.project_db_file, args.editor_version, args.project_name, args.datasets_db_file, constant_ps, is_lte)
+	api = ReimportGis(args.project_db_file, args.editor_version, args.project_name, args.datasets_db_file, constant_ps, is_lte, incremental, compress_backup, args.keep_backups)
@@ -10,15 +10,23 @@ from database.project.simulation import Time_sim
 import sys
 import argparse
 import os, os.path
+import subprocess
+import time
 from datetime import datetime
 
 
+def remove_database_files(db_file):
+	for file in [db_file, db_file + '-wal', db_file + '-shm']:
+		if os.path.exists(file):
+			os.remove(file)
+
+
 class RunAll(ExecutableApi):
 	def __init__(self, project_db, editor_version, swat_exe, 
 		weather_dir, weather_save_dir='', weather_import_format='plus',
 		wgn_import_method='database', wgn_db='C:/SWAT/SWATPlus/Databases/swatplus_wgn.sqlite', wgn_table='wgn_cfsr_world', wgn_csv_sta_file=None, wgn_csv_mon_file=None,
 		year_start=None, day_start=None, year_end=None, day_end=None,
-		input_files_dir=None, swat_version=None):
+		input_files_dir=None, swat_version=None, live_output_import=False):
 		# Setup project databases and import GIS data
 		SetupProject(project_db, editor_version, project_db.replace('.sqlite', '.json', 1))
 
@@ -56,21 +64,46 @@ class RunAll(ExecutableApi):
 		write_api = WriteFiles(project_db, swat_version)
 		write_api.write()
 
-		# Run the model
-		cwd = os.getcwd()
-		os.chdir(input_files_path)
-		run_result = os.system(swat_exe)
-		print(run_result)
+		output_db_file = os.path.join(input_files_path, '../', 'Results', 'swatplus_output.sqlite')
 
-		# Import output files to db if successful run
-		if run_result == 0:
-			os.chdir(cwd)
-			output_db_file = os.path.join(input_files_path, '../', 'Results', 'swatplus_output.sqlite')
+		# Run the model
+		if live_output_import:
+			# Import output files while the model writes them
 			if not os.path.exists(os.path.join(input_files_path, '../', 'Results')):
 				os.makedirs(os.path.join(input_files_path, '../', 'Results'))
-			output_api = ReadOutput(input_files_path, output_db_file, swat_version, editor_version, project_db.replace('.sqlite', '.json', 1))
-			output_api.read()
+			# Import into a separate database so a failed run does not replace the results of the last good run
+			live_db_file = output_db_file.replace('.sqlite', '.live.sqlite')
+			remove_database_files(live_db_file)
+			run_start = time.time()
+			swat_proc = subprocess.Popen(swat_exe, cwd=input_files_path, shell=True)
+			run_result = None
+			try:
+				output_api = ReadOutput(input_files_path, live_db_file, swat_version, editor_version, project_db.replace('.sqlite', '.json', 1))
+				output_api.read_live(lambda: swat_proc.poll() is None, since=run_start)
+				run_result = swat_proc.wait()
+				print(run_result)
+			finally:
+				if run_result == 0:
+					remove_database_files(output_db_file)
+					os.replace(live_db_file, output_db_file)
+				else:
+					output_api = None
+					remove_database_files(live_db_file)
+		else:
+			cwd = os.getcwd()
+			os.chdir(input_files_path)
+			run_result = os.system(swat_exe)
+			print(run_result)
 
+			# Import output files to db if successful run
+			if run_result == 0:
+				os.chdir(cwd)
+				if not os.path.exists(os.path.join(input_files_path, '../', 'Results')):
+					os.makedirs(os.path.join(input_files_path, '../', 'Results'))
+				output_api = ReadOutput(input_files_path, output_db_file, swat_version, editor_version, project_db.replace('.sqlite', '.json', 1))
+				output_api.read()
+
+		if run_result == 0:
 			m = Project_config.get()
 			m.swat_last_run = datetime.now()
 			m.output_last_imported = datetime.now()
@@ -96,10 +129,11 @@ if __name__ == '__main__':
 	parser.add_argument("--day_end", type=str, help="ending day of simulation (omit to use weather files dates)", nargs="?")
 	parser.add_argument("--input_files_dir", type=str, help="full path of where to write input files, defaults to Scenarios/Default/TxtInOut", nargs="?")
 	parser.add_argument("--swat_version", type=str, help="SWAT+ revision number", nargs="?")
+	parser.add_argument("--live_output_import", type=str, help="y/n import output files while the model runs (default n)", nargs="?")
 
 	args = parser.parse_args()
 	api = RunAll(args.project_db_file, args.editor_version, args.swat_exe_file,
 		args.weather_dir, args.weather_save_dir, args.weather_import_format,
 		args.wgn_import_method, args.wgn_db, args.wgn_table, args.wgn_csv_sta_file, args.wgn_csv_mon_file,
 		args.year_start, args.day_start, args.year_end, args.day_end,
-		args.input_files_dir, args.swat_version)
+		args.input_files_dir, args.swat_version, args.live_output_import == "y")
@@ -1,6 +1,6 @@
 from helpers.executable_api import ExecutableApi, Unbuffered
 from helpers import utils
-from database import lib
+from database import lib, snapshot
 from database.project import base as project_base
 from database.project.config import Project_config
 from database.project.setup import SetupProjectDatabase
@@ -17,7 +17,7 @@ import argparse
 import os, os.path
 import json
 from shutil import copyfile
-import time
+import sqlite3
 from playhouse.migrate import *
 
 OVERWRITE_PLANTS = False
@@ -133,14 +133,9 @@ class SetupProject(ExecutableApi):
 			do_gis = True
 			try:
 				self.emit_progress(2, 'Backing up GIS database...')
-				filename, file_extension = os.path.splitext(rel_project_db)
-				bak_filename = filename + '_bak_' + time.strftime('%Y%m%d-%H%M%S') + file_extension
-				bak_dir = os.path.join(base_path, 'DatabaseBackups')
-				if not os.path.exists(bak_dir):
-					os.makedirs(bak_dir)
-				backup_db_file = os.path.join(bak_dir, bak_filename)
-				copyfile(project_db, backup_db_file)
-			except IOError as err:
+				backup_db_file = snapshot.create_snapshot(project_db, '_bak',
+					progress=lambda f: self.emit_progress(2, 'Backing up GIS database ({p}%)...'.format(p=round(f * 100))))
+			except (IOError, sqlite3.Error) as err:
 				sys.exit(err)
 
 		try:
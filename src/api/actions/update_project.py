@@ -1,6 +1,6 @@
 from helpers.executable_api import ExecutableApi, Unbuffered
 from helpers import utils
-from database import lib
+from database import lib, snapshot
 from database.project import base, init, dr, channel, reservoir, simulation, hru, lum, exco, connect, routing_unit, recall, change, soils, aquifer, hru_parm_db, decision_table, ops, basin, water_rights, salts, climate, gwflow
 from database.project.config import Project_config, File_cio, File_cio_classification
 from database.project.setup import SetupProjectDatabase
@@ -16,8 +16,7 @@ from .reimport_gis import ReimportGis
 import sys
 import argparse
 import os, os.path
-from shutil import copyfile
-import time
+import sqlite3
 from peewee import *
 from playhouse.migrate import *
 import datetime
@@ -60,7 +59,6 @@ class UpdateProject(ExecutableApi):
 			sys.exit("Could not retrieve project configuration data.")
 
 		base_path = os.path.dirname(project_db)
-		rel_project_db = os.path.relpath(project_db, base_path)
 
 		if datasets_db is None:
 			datasets_db = utils.full_path(project_db, m.reference_db)
@@ -86,14 +84,9 @@ class UpdateProject(ExecutableApi):
 			# Backup original db before beginning
 			try:
 				self.emit_progress(2, 'Backing up project database...')
-				filename, file_extension = os.path.splitext(rel_project_db)
-				bak_filename = filename + '_v' + m.editor_version.replace('.', '_') + '_' + time.strftime('%Y%m%d-%H%M%S') + file_extension
-				bak_dir = os.path.join(base_path, 'DatabaseBackups')
-				if not os.path.exists(bak_dir):
-					os.makedirs(bak_dir)
-				backup_db_file = os.path.join(bak_dir, bak_filename)
-				copyfile(project_db, os.path.join(bak_dir, bak_filename))
-			except IOError as err:
+				backup_db_file = snapshot.create_snapshot(project_db, '_v' + m.editor_version.replace('.', '_'),
+					progress=lambda f: self.emit_progress(2, 'Backing up project database ({p}%)...'.format(p=round(f * 100))))
+			except (IOError, sqlite3.Error) as err:
 				sys.exit(err)
 
 			# Apply all upgrades in chain
@@ -0,0 +1,519 @@
+"""
+Binary cache of SWAT+ weather station files, so statistics and validation don't re-parse the text files.
+Each station file is parsed once into <project folder>/weather_cache/<filename>.bin holding a header, monthly
+aggregates (count, missing, sum, min, max per variable) and the daily dates (day ordinals) and values as packed
+little-endian arrays. An entry is rebuilt when the modified time or size of its source file changes.
+Statistics only read the header and monthly aggregates; load_values reads the daily arrays, e.g. for numpy.frombuffer.
+"""
+from helpers.executable_api import ExecutableApi, Unbuffered
+from database.project.setup import SetupProjectDatabase
+from database.project.config import Project_config
+from database.project.climate import Weather_file, Weather_wgn_cli_mon
+from helpers import utils
+
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import argparse
+import calendar
+import datetime
+import operator
+import os, os.path
+import shutil
+import struct
+import sys
+
+CACHE_DIR = "weather_cache"
+CACHE_EXT = ".bin"
+CACHE_MAGIC = b"SWWC"
+CACHE_VERSION = 1
+# magic, version, n_cols, source mtime_ns, source size, tstep, n_days, first day, last day, n_months, n_gaps, monotonic, lat, lon, elev
+HEADER = struct.Struct("<4sHHqqiiiiiiiddd")
+
+MISSING_VALUE = -99.0
+
+VARIABLE_NAMES = {
+	"tmp": ["tmp_max", "tmp_min"]
+}
+# Variables whose monthly totals are meaningful, e.g. to compare with pcp_ave of a weather generator
+TOTAL_VARIABLES = ["pcp", "pet"]
+# Weather generator monthly fields matched to the cached variable and statistic they describe
+WGN_FIELDS = {
+	"pcp": [("pcp_ave", "pcp", "monthly_total_mean")],
+	"tmp": [("tmp_max_ave", "tmp_max", "monthly_mean"), ("tmp_min_ave", "tmp_min", "monthly_mean")],
+	"slr": [("slr_ave", "slr", "monthly_mean")],
+	"wnd": [("wnd_ave", "wnd", "monthly_mean")]
+}
+
+
+def project_weather_cache(project_db_file):
+	"""Return the WeatherCache of a project, for its configured weather data directory. The project database must be initialized."""
+	config = Project_config.get()
+	weather_dir = utils.full_path(project_db_file, config.weather_data_dir)
+	if weather_dir is None:
+		raise ValueError("The project does not have a weather data directory.")
+	return WeatherCache(weather_dir, os.path.join(os.path.dirname(project_db_file), CACHE_DIR))
+
+
+def variable_names(filename, n_cols):
+	ext = os.path.splitext(filename)[1][1:].lower()
+	names = VARIABLE_NAMES.get(ext, [ext])
+	if len(names) != n_cols:
+		names = ["{}{}".format(ext, i + 1) for i in range(n_cols)]
+	return names
+
+
+def pack_array(values):
+	if sys.byteorder != "little":
+		values = array(values.typecode, values)
+		values.byteswap()
+	return values.tobytes()
+
+
+def unpack_array(typecode, data):
+	values = array(typecode)
+	values.frombytes(data)
+	if sys.byteorder != "little":
+		values.byteswap()
+	return values
+
+
+def station_tstep(file_path):
+	"""Return the time step on line 3 of a weather station file, 0 for daily files, or None if it can't be read."""
+	try:
+		with open(file_path, "r") as f:
+			f.readline()
+			f.readline()
+			return int(f.readline().split()[1])
+	except (OSError, ValueError, IndexError):
+		return None
+
+
+def sub_daily_message(filename):
+	return "Sub-daily weather file {file} is not cached; statistics and checks only cover daily files.".format(file=filename)
+
+
+def parse_station_file(file_path):
+	"""
+	Parse a daily SWAT+ weather station file into its header values, the day ordinal of each record and one array of values per variable.
+	Records are kept in file order, so out of order and duplicate days can still be detected.
+	"""
+	with open(file_path, "r") as f:
+		f.readline()
+		f.readline()
+		station_info = f.readline().split()
+		data = f.read()
+
+	if len(station_info) < 5:
+		raise ValueError("Invalid value at line 3 of {file}. Expecting nbyr, tstep, lat, long, elev values separated by a space.".format(file=file_path))
+	tstep = int(station_info[1])
+	if tstep != 0:
+		raise ValueError("Sub-daily weather file {file} is not supported.".format(file=file_path))
+
+	tokens = data.split()
+	n_cols = 0
+	if len(tokens) > 0:
+		first_line = data.lstrip("\r\n").split("\n", 1)[0]
+		n_cols = len(first_line.split()) - 2
+		if n_cols < 1:
+			raise ValueError("Invalid value at line 4 of {file}. Expecting year, julian day, and weather value separated by a space.".format(file=file_path))
+
+	stride = n_cols + 2
+	if len(tokens) % stride != 0:
+		raise ValueError("Inconsistent number of values per line in {file}. Expecting year, julian day and {n} value(s) on each line.".format(file=file_path, n=n_cols))
+
+	years = tokens[0::stride]
+	year_start = {year: datetime.date(int(year), 1, 1).toordinal() - 1 for year in set(years)}
+	try:
+		ordinals = array("i", map(operator.add, map(year_start.__getitem__, years), map(int, tokens[1::stride])))
+		columns = [array("d", map(float, tokens[c + 2::stride])) for c in range(n_cols)]
+	except ValueError as e:
+		raise ValueError("Invalid number in {file}: {error}".format(file=file_path, error=e))
+
+	return {
+		"tstep": tstep,
+		"lat": float(station_info[2]),
+		"lon": float(station_info[3]),
+		"elev": float(station_info[4]),
+		"ordinals": ordinals,
+		"columns": columns
+	}
+
+
+def day_steps(ordinals):
+	"""Return the number of days between consecutive records."""
+	return array("i", map(operator.sub, ordinals[1:], ordinals))
+
+
+def month_key(ordinal):
+	d = datetime.date.fromordinal(ordinal)
+	return d.year * 12 + d.month - 1
+
+
+def month_slices(ordinals):
+	"""Yield the month key and start, end positions of each month of increasing day ordinals."""
+	if len(ordinals) < 1:
+		return
+
+	first = datetime.date.fromordinal(ordinals[0])
+	last_key = month_key(ordinals[-1])
+	key = first.year * 12 + first.month - 1
+	start = 0
+	while key <= last_key:
+		next_key = key + 1
+		end = bisect_left(ordinals, datetime.date(next_key // 12, next_key % 12 + 1, 1).toordinal(), start)
+		if end > start:
+			yield key, start, end
+		start = end
+		key = next_key
+
+
+@lru_cache(maxsize=None)
+def days_in_month(key):
+	return calendar.monthrange(key // 12, key % 12 + 1)[1]
+
+
+def aggregate(values):
+	"""Return count, missing, sum, min and max of values, leaving out missing values (-99)."""
+	missing = values.count(MISSING_VALUE)
+	if missing == 0:
+		return len(values), 0, sum(values), min(values), max(values)
+	if missing == len(values):
+		return 0, missing, 0.0, 0.0, 0.0
+	valid = [v for v in values if v != MISSING_VALUE]
+	return len(valid), missing, sum(valid), min(valid), max(valid)
+
+
+def monthly_aggregates(ordinals, columns, monotonic):
+	"""
+	Return the month keys (year * 12 + month - 1) present in the data and, per variable, arrays of the count, missing count,
+	sum, min and max of each month. Increasing dates are aggregated over array slices; other files record by record.
+	"""
+	if monotonic:
+		groups = list(month_slices(ordinals))
+		keys = array("i", [key for key, start, end in groups])
+		results = [[aggregate(col[start:end]) for key, start, end in groups] for col in columns]
+	else:
+		positions = {}
+		for i, ordinal in enumerate(ordinals):
+			positions.setdefault(month_key(ordinal), []).append(i)
+		keys = array("i", sorted(positions.keys()))
+		results = [[aggregate(array("d", [col[i] for i in positions[key]])) for key in keys] for col in columns]
+
+	aggregates = []
+	for col_results in results:
+		counts, missing, sums, mins, maxs = zip(*col_results) if len(col_results) > 0 else ([], [], [], [], [])
+		aggregates.append((array("i", counts), array("i", missing), array("d", sums), array("d", mins), array("d", maxs)))
+	return keys, aggregates
+
+
+def find_gaps(ordinals, steps):
+	"""Return the first and last day ordinal of each run of days missing between increasing day ordinals, as a flat array."""
+	gaps = array("i")
+	if steps.count(1) == len(steps):
+		return gaps
+
+	for i, step in enumerate(steps):
+		if step > 1:
+			gaps.append(ordinals[i] + 1)
+			gaps.append(ordinals[i + 1] - 1)
+	return gaps
+
+
+def build_cache_file(source_path, cache_path):
+	"""Parse a station file and write its cache entry; returns an error message or None. Module level so it can run in a process pool."""
+	try:
+		stat = os.stat(source_path)
+		station = parse_station_file(source_path)
+		ordinals = station["ordinals"]
+		columns = station["columns"]
+		steps = day_steps(ordinals)
+		monotonic = len(steps) < 1 or min(steps) > 0
+		keys, aggregates = monthly_aggregates(ordinals, columns, monotonic)
+		gaps = find_gaps(ordinals, steps) if monotonic else array("i")
+
+		tmp_path = cache_path + ".tmp"
+		with open(tmp_path, "wb") as f:
+			f.write(HEADER.pack(CACHE_MAGIC, CACHE_VERSION, len(columns), stat.st_mtime_ns, stat.st_size, station["tstep"],
+				len(ordinals), min(ordinals) if len(ordinals) > 0 else 0, max(ordinals) if len(ordinals) > 0 else 0, len(keys), len(gaps) // 2, 1 if monotonic else 0, station["lat"], station["lon"], station["elev"]))
+			f.write(pack_array(keys))
+			for agg in aggregates:
+				for values in agg:
+					f.write(pack_array(values))
+			f.write(pack_array(gaps))
+			f.write(pack_array(ordinals))
+			for col in columns:
+				f.write(pack_array(col))
+		os.replace(tmp_path, cache_path)
+		return None
+	except (OSError, ValueError) as e:
+		return str(e)
+
+
+def read_cache_file(cache_path, source_stat=None, values=False):
+	"""
+	Read a cache entry, or return None if it is missing, from another cache version or older than source_stat.
+	Daily ordinals and values are only read with values=True.
+	"""
+	try:
+		f = open(cache_path, "rb")
+	except OSError:
+		return None
+
+	with f:
+		header = f.read(HEADER.size)
+		if len(header) < HEADER.size:
+			return None
+		magic, version, n_cols, mtime_ns, size, tstep, n_days, start, end, n_months, n_gaps, monotonic, lat, lon, elev = HEADER.unpack(header)
+		if magic != CACHE_MAGIC or version != CACHE_VERSION:
+			return None
+		if source_stat is not None and (source_stat.st_mtime_ns != mtime_ns or source_stat.st_size != size):
+			return None
+
+		entry = {
+			"n_days": n_days, "start": start if n_days > 0 else None, "end": end if n_days > 0 else None, "monotonic": monotonic == 1, "lat": lat, "lon": lon, "elev": elev,
+			"months": unpack_array("i", f.read(4 * n_months)),
+			"aggregates": []
+		}
+		for c in range(n_cols):
+			entry["aggregates"].append((
+				unpack_array("i", f.read(4 * n_months)), unpack_array("i", f.read(4 * n_months)),
+				unpack_array("d", f.read(8 * n_months)), unpack_array("d", f.read(8 * n_months)), unpack_array("d", f.read(8 * n_months))))
+		entry["gaps"] = unpack_array("i", f.read(8 * n_gaps))
+
+		if values:
+			entry["ordinals"] = unpack_array("i", f.read(4 * n_days))
+			entry["columns"] = [unpack_array("d", f.read(8 * n_days)) for c in range(n_cols)]
+		return entry
+
+
+def station_statistics(filename, entry, max_gaps=20):
+	"""Summarize a cache entry: period of record, missing days and values, and overall and monthly means per variable."""
+	start, end = entry["start"], entry["end"]
+	names = variable_names(filename, len(entry["aggregates"]))
+	stats = {
+		"filename": filename,
+		"lat": entry["lat"],
+		"lon": entry["lon"],
+		"elev": entry["elev"],
+		"start_date": None if start is None else datetime.date.fromordinal(start).isoformat(),
+		"end_date": None if end is None else datetime.date.fromordinal(end).isoformat(),
+		"days": entry["n_days"],
+		"expected_days": 0 if start is None else end - start + 1,
+		"in_order": entry["monotonic"],
+		"gap_count": len(entry["gaps"]) // 2,
+		"gaps": [[datetime.date.fromordinal(entry["gaps"][i]).isoformat(), datetime.date.fromordinal(entry["gaps"][i + 1]).isoformat()] for i in range(0, min(len(entry["gaps"]), max_gaps * 2), 2)],
+		"missing_values": 0,
+		"variables": []
+	}
+	stats["missing_days"] = max(0, stats["expected_days"] - stats["days"]) if entry["monotonic"] else None
+
+	months = [key % 12 for key in entry["months"]]
+	month_days = [days_in_month(key) for key in entry["months"]]
+	for name, (counts, missing, sums, mins, maxs) in zip(names, entry["aggregates"]):
+		stats["missing_values"] += sum(missing)
+		month_count = [0] * 12
+		month_sum = [0.0] * 12
+		month_totals = [[] for m in range(12)]
+		for m, days, count, total in zip(months, month_days, counts, sums):
+			if count > 0:
+				month_count[m] += count
+				month_sum[m] += total
+				# Only complete months count towards monthly totals
+				if count == days:
+					month_totals[m].append(total)
+
+		valid = [i for i, count in enumerate(counts) if count > 0]
+		count = sum(counts)
+		variable = {
+			"name": name,
+			"count": count,
+			"missing": sum(missing),
+			"mean": sum(sums) / count if count > 0 else None,
+			"min": min(mins[i] for i in valid) if len(valid) > 0 else None,
+			"max": max(maxs[i] for i in valid) if len(valid) > 0 else None,
+			"monthly_mean": [month_sum[m] / month_count[m] if month_count[m] > 0 else None for m in range(12)]
+		}
+		if name in TOTAL_VARIABLES:
+			variable["monthly_total_mean"] = [sum(t) / len(t) if len(t) > 0 else None for t in month_totals]
+		stats["variables"].append(variable)
+
+	return stats
+
+
+def compare_wgn(stats, wgn_months):
+	"""Compare the monthly statistics of a station file with the monthly values of a weather generator (Weather_wgn_cli_mon rows)."""
+	ext = os.path.splitext(stats["filename"])[1][1:].lower()
+	variables = {v["name"]: v for v in stats["variables"]}
+	comparison = []
+	for wgn_field, name, stat in WGN_FIELDS.get(ext, []):
+		if name not in variables:
+			continue
+		observed = variables[name][stat]
+		for mon in wgn_months:
+			obs = observed[mon.month - 1] if 1 <= mon.month <= 12 else None
+			wgn = getattr(mon, wgn_field)
+			comparison.append({
+				"variable": name,
+				"wgn_field": wgn_field,
+				"month": mon.month,
+				"observed": obs,
+				"wgn": wgn,
+				"difference": None if obs is None or wgn is None else obs - wgn
+			})
+	return comparison
+
+
+class WeatherCache(ExecutableApi):
+	def __init__(self, weather_dir, cache_dir, workers=1):
+		self.weather_dir = weather_dir
+		self.cache_dir = cache_dir
+		self.workers = workers
+
+	def source_path(self, filename):
+		return os.path.join(self.weather_dir, filename)
+
+	def cache_path(self, filename):
+		return os.path.join(self.cache_dir, filename + CACHE_EXT)
+
+	def check(self, filenames):
+		"""
+		Return the current cache entries of filenames, the files whose entry is missing or out of date, a dict of filename to error message,
+		and a dict of filename to message for sub-daily files, which SWAT+ accepts but the cache does not hold.
+		"""
+		entries = {}
+		stale = []
+		errors = {}
+		skipped = {}
+		for filename in filenames:
+			try:
+				source_stat = os.stat(self.source_path(filename))
+			except OSError:
+				errors[filename] = "Weather file {file} does not exist.".format(file=self.source_path(filename))
+				continue
+			entry = read_cache_file(self.cache_path(filename), source_stat)
+			if entry is not None:
+				entries[filename] = entry
+			elif station_tstep(self.source_path(filename)) not in (0, None):
+				skipped[filename] = sub_daily_message(filename)
+			else:
+				stale.append(filename)
+		return entries, stale, errors, skipped
+
+	def build(self, filenames, start_prog=0, total_prog=100):
+		"""Parse filenames into cache entries, in a process pool with more than one worker. Returns a dict of filename to error message."""
+		if len(filenames) < 1:
+			return {}
+		if not os.path.exists(self.cache_dir):
+			os.makedirs(self.cache_dir)
+
+		self.emit_progress(start_prog, "Caching {n} weather files...".format(n=len(filenames)))
+		source_paths = [self.source_path(filename) for filename in filenames]
+		cache_paths = [self.cache_path(filename) for filename in filenames]
+		if self.workers > 1:
+			with ProcessPoolExecutor(max_workers=self.workers) as executor:
+				results = executor.map(build_cache_file, source_paths, cache_paths, chunksize=max(1, min(64, len(filenames) // (self.workers * 4))))
+				return self.collect(filenames, results, start_prog, total_prog)
+		else:
+			results = map(build_cache_file, source_paths, cache_paths)
+			return self.collect(filenames, results, start_prog, total_prog)
+
+	def collect(self, filenames, results, start_prog, total_prog):
+		errors = {}
+		batch_size = max(1, len(filenames) // 20)
+		for i, (filename, error) in enumerate(zip(filenames, results)):
+			if error is not None:
+				errors[filename] = error
+			if (i + 1) % batch_size == 0:
+				self.emit_progress(round(start_prog + (i + 1) * total_prog / len(filenames)), "Caching weather files {i}/{n}...".format(i=i + 1, n=len(filenames)))
+		return errors
+
+	def update(self, filenames, start_prog=0, total_prog=100):
+		"""Build the cache entries of filenames that are missing or out of date. Returns a dict of filename to error or skipped message."""
+		entries, stale, errors, skipped = self.check(filenames)
+		errors.update(skipped)
+		errors.update(self.build(stale, start_prog, total_prog))
+		return errors
+
+	def statistics(self, filenames, build=True):
+		"""
+		Return the statistics of each file, a dict of filename to error message for files that could not be read,
+		the files left out because their cache entry is missing or out of date (with build, those entries are built first)
+		and a dict of filename to message for sub-daily files left out.
+		"""
+		entries, stale, errors, skipped = self.check(filenames)
+		not_cached = []
+		if build:
+			errors.update(self.build(stale))
+		else:
+			not_cached = stale
+		stats = []
+		for filename in filenames:
+			if filename in errors or filename in not_cached or filename in skipped:
+				continue
+			entry = entries.get(filename, None)
+			if entry is None:
+				entry = read_cache_file(self.cache_path(filename))
+			if entry is None:
+				errors[filename] = "Could not read the cache of weather file {file}.".format(file=filename)
+			else:
+				stats.append(station_statistics(filename, entry))
+		return stats, errors, not_cached, skipped
+
+	def load_values(self, filename):
+		"""Return the day ordinals and the arrays of values of each variable of a file, updating its cache entry first."""
+		errors = self.update([filename])
+		if filename in errors:
+			raise ValueError(errors[filename])
+		entry = read_cache_file(self.cache_path(filename), values=True)
+		return entry["ordinals"], dict(zip(variable_names(filename, len(entry["columns"])), entry["columns"]))
+
+	def clear(self):
+		if os.path.exists(self.cache_dir):
+			shutil.rmtree(self.cache_dir)
+
+
+def station_files(station):
+	"""Return the weather file names assigned to a Weather_sta_cli row."""
+	return [f for f in [station.pcp, station.tmp, station.slr, station.hmd, station.wnd, station.pet] if f is not None and f != "" and f != "sim"]
+
+
+def station_weather_statistics(project_db_file, station):
+	"""Return the statistics of the files of a weather station, compared with its weather generator, any errors and the sub-daily files left out."""
+	cache = project_weather_cache(project_db_file)
+	stats, errors, not_cached, skipped = cache.statistics(station_files(station))
+	if station.wgn_id is not None:
+		wgn_months = list(Weather_wgn_cli_mon.select().where(Weather_wgn_cli_mon.weather_wgn_cli_id == station.wgn_id).order_by(Weather_wgn_cli_mon.month))
+		for s in stats:
+			s["wgn_comparison"] = compare_wgn(s, wgn_months)
+	return stats, errors, skipped
+
+
+def cache_project_weather(project_db_file, workers=None, clear=False):
+	"""Parse the weather files of a project into the cache, or refresh the entries of files that changed."""
+	SetupProjectDatabase.init(project_db_file)
+	try:
+		cache = project_weather_cache(project_db_file)
+	except (Project_config.DoesNotExist, ValueError) as e:
+		sys.exit(str(e))
+
+	cache.workers = workers if workers is not None else (os.cpu_count() or 1)
+	if clear:
+		cache.clear()
+	filenames = [row.filename for row in Weather_file.select(Weather_file.filename)]
+	errors = cache.update(filenames)
+	for filename, error in errors.items():
+		print(error)
+	cache.emit_progress(100, "Cached {n} weather files.".format(n=len(filenames) - len(errors)))
+
+
+if __name__ == '__main__':
+	sys.stdout = Unbuffered(sys.stdout)
+	parser = argparse.ArgumentParser(description="Cache the project weather files for statistics and validation.")
+	parser.add_argument("--project_db_file", type=str, help="full path of project SQLite database file", nargs="?")
+	parser.add_argument("--workers", type=int, help="number of processes parsing weather files (default CPU count)", nargs="?")
+	parser.add_argument("--clear", type=str, help="y/n clear the cache first", nargs="?")
+	args = parser.parse_args()
+
+	cache_project_weather(args.project_db_file, args.workers, args.clear == "y")
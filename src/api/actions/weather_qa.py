@@ -0,0 +1,255 @@
+from helpers.executable_api import ExecutableApi, Unbuffered
+from database.project import base as project_base
+from database.project.setup import SetupProjectDatabase
+from database.project.config import Project_config
+from database.project.climate import Weather_file, Weather_sta_cli, Weather_qa
+from database import lib as db_lib
+from .weather_cache import project_weather_cache, read_cache_file, build_cache_file, station_tstep, sub_daily_message, day_steps, find_gaps, variable_names, MISSING_VALUE
+
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import datetime
+import operator
+import os, os.path
+import sys
+
+# Physically possible daily values of each variable; values outside are reported as errors
+VALUE_LIMITS = {
+	"pcp": (0, 1900),
+	"tmp_max": (-90, 60),
+	"tmp_min": (-90, 60),
+	"slr": (0, 50),
+	"hmd": (0, 1),
+	"wnd": (0, 100),
+	"pet": (0, 30)
+}
+
+ERROR = "error"
+WARNING = "warning"
+INFO = "info"
+
+
+def finding(name, wtype, check, severity, count, message, start=None, end=None):
+	return {
+		"name": name,
+		"type": wtype,
+		"check": check,
+		"severity": severity,
+		"count": count,
+		"start_date": None if start is None else datetime.date.fromordinal(start),
+		"end_date": None if end is None else datetime.date.fromordinal(end),
+		"message": message
+	}
+
+
+def date_text(ordinal):
+	return datetime.date.fromordinal(ordinal).isoformat()
+
+
+def first_duplicate(ordinals):
+	seen = set()
+	for ordinal in ordinals:
+		if ordinal in seen:
+			return ordinal
+		seen.add(ordinal)
+	return None
+
+
+def check_gaps(filename, wtype, gaps):
+	"""Report the days missing between the first and last day of a file, from the flat array of gap start and end days."""
+	if len(gaps) < 1:
+		return []
+
+	missing_days = sum(gaps[i + 1] - gaps[i] + 1 for i in range(0, len(gaps), 2))
+	return [finding(filename, wtype, "gaps", WARNING, missing_days,
+		"{n} day(s) missing in {g} gap(s), first from {start} to {end}.".format(n=missing_days, g=len(gaps) // 2, start=date_text(gaps[0]), end=date_text(gaps[1])), gaps[0], gaps[-1])]
+
+
+def check_dates(filename, wtype, ordinals):
+	"""Report out of order dates, duplicate days and gaps in the day ordinals of a file that is not in increasing order."""
+	findings = []
+	steps = day_steps(ordinals)
+	backwards = [i for i, step in enumerate(steps) if step < 0]
+	if len(backwards) > 0:
+		first = backwards[0]
+		findings.append(finding(filename, wtype, "out_of_order", ERROR, len(backwards),
+			"{n} record(s) go back in time, first after {date}.".format(n=len(backwards), date=date_text(ordinals[first])), ordinals[first + 1], ordinals[first]))
+
+	days = array("i", sorted(set(ordinals)))
+	duplicates = len(ordinals) - len(days)
+	if duplicates > 0:
+		first = first_duplicate(ordinals)
+		findings.append(finding(filename, wtype, "duplicate_days", ERROR, duplicates,
+			"{n} duplicate day(s), first on {date}.".format(n=duplicates, date=date_text(first)), first, first))
+
+	return findings + check_gaps(filename, wtype, find_gaps(days, day_steps(days)))
+
+
+def needs_values(names, entry):
+	"""Return whether the monthly aggregates of a cache entry leave something to check in the daily values."""
+	if not entry["monotonic"] or (len(names) == 2 and names[0] == "tmp_max"):
+		return True
+
+	for name, (counts, missing, sums, mins, maxs) in zip(names, entry["aggregates"]):
+		if sum(missing) > 0:
+			return True
+		limits = VALUE_LIMITS.get(name, None)
+		valid = [i for i, count in enumerate(counts) if count > 0]
+		if limits is not None and len(valid) > 0 and (min(mins[i] for i in valid) < limits[0] or max(maxs[i] for i in valid) > limits[1]):
+			return True
+	return False
+
+
+def check_values(filename, wtype, ordinals, columns):
+	"""Report missing values (-99) and physically impossible values of each variable in a file."""
+	findings = []
+	names = variable_names(filename, len(columns))
+	for name, values in zip(names, columns):
+		missing = values.count(MISSING_VALUE)
+		if missing > 0:
+			is_missing = bytes(map(MISSING_VALUE.__eq__, values))
+			longest = max(len(run) for run in is_missing.split(b"\x00"))
+			first = is_missing.index(b"\x01")
+			last = is_missing.rindex(b"\x01")
+			findings.append(finding(filename, wtype, "missing_values", WARNING, missing,
+				"{n} missing {var} value(s) (-99), longest run {longest} day(s) from {date}.".format(n=missing, var=name, longest=longest, date=date_text(ordinals[first])), ordinals[first], ordinals[last]))
+
+		limits = VALUE_LIMITS.get(name, None)
+		if limits is None or missing == len(values):
+			continue
+
+		valid = list(filter(MISSING_VALUE.__ne__, values)) if missing > 0 else values
+		if min(valid) < limits[0] or max(valid) > limits[1]:
+			outside = [i for i, v in enumerate(values) if v != MISSING_VALUE and (v < limits[0] or v > limits[1])]
+			findings.append(finding(filename, wtype, "out_of_range", ERROR, len(outside),
+				"{n} {var} value(s) outside {low} to {high}, first {value} on {date}.".format(n=len(outside), var=name, low=limits[0], high=limits[1], value=values[outside[0]], date=date_text(ordinals[outside[0]])), ordinals[outside[0]], ordinals[outside[-1]]))
+
+	if len(columns) == 2 and names[0] == "tmp_max":
+		tmp_max, tmp_min = columns
+		if any(map(operator.lt, tmp_max, tmp_min)):
+			below = [i for i, (mx, mn) in enumerate(zip(tmp_max, tmp_min)) if mx < mn and mx != MISSING_VALUE and mn != MISSING_VALUE]
+			if len(below) > 0:
+				findings.append(finding(filename, wtype, "tmp_max_below_min", ERROR, len(below),
+					"{n} day(s) with maximum temperature below minimum, first on {date}.".format(n=len(below), date=date_text(ordinals[below[0]])), ordinals[below[0]], ordinals[below[-1]]))
+	return findings
+
+
+def qa_weather_file(source_path, cache_path, filename, wtype):
+	"""
+	Check one weather file, reading it from the weather cache (built first if missing or out of date).
+	Daily values are only read when the cached monthly aggregates and gaps leave something to check.
+	Returns the findings and the first and last day of the file, or None if it could not be read. Module level so it can run in a process pool.
+	"""
+	try:
+		source_stat = os.stat(source_path)
+	except OSError:
+		return [finding(filename, wtype, "missing_file", ERROR, 1, "Weather file {file} does not exist.".format(file=source_path))], None
+
+	entry = read_cache_file(cache_path, source_stat)
+	if entry is None:
+		if station_tstep(source_path) not in (0, None):
+			return [finding(filename, wtype, "sub_daily", INFO, 1, sub_daily_message(filename))], None
+		error = build_cache_file(source_path, cache_path)
+		if error is not None:
+			return [finding(filename, wtype, "read_error", ERROR, 1, error)], None
+		entry = read_cache_file(cache_path)
+
+	if entry["n_days"] < 1:
+		return [finding(filename, wtype, "no_data", ERROR, 1, "Weather file {file} has no records.".format(file=filename))], None
+
+	findings = check_gaps(filename, wtype, entry["gaps"]) if entry["monotonic"] else []
+	if needs_values(variable_names(filename, len(entry["aggregates"])), entry):
+		entry = read_cache_file(cache_path, values=True)
+		if not entry["monotonic"]:
+			findings += check_dates(filename, wtype, entry["ordinals"])
+		findings += check_values(filename, wtype, entry["ordinals"], entry["columns"])
+	return findings, (entry["start"], entry["end"])
+
+
+def check_station_periods(station, periods):
+	"""Report a station whose weather files do not cover the same period of record."""
+	files = [(wtype, filename) for wtype, filename in [("pcp", station.pcp), ("tmp", station.tmp), ("slr", station.slr), ("hmd", station.hmd), ("wnd", station.wnd), ("pet", station.pet)] if filename in periods]
+	if len(set(periods[filename] for wtype, filename in files)) < 2:
+		return None
+
+	start = max(periods[filename][0] for wtype, filename in files)
+	end = min(periods[filename][1] for wtype, filename in files)
+	message = "Weather files cover different periods: {files}.".format(files=", ".join("{t} {start} to {end}".format(t=wtype, start=date_text(periods[filename][0]), end=date_text(periods[filename][1])) for wtype, filename in files))
+	if start > end:
+		return finding(station.name, None, "period_mismatch", ERROR, len(files), message + " They have no days in common.")
+	return finding(station.name, None, "period_mismatch", WARNING, len(files), message, start, end)
+
+
+class WeatherQa(ExecutableApi):
+	"""
+	Check every weather file of the project for gaps, duplicate and out of order days, missing and physically impossible values,
+	and every station for files covering different periods. Findings replace the contents of the weather_qa table.
+	Files are read through the weather cache, so a repeated pass only parses files that changed.
+	"""
+	def __init__(self, project_db_file, workers=None):
+		SetupProjectDatabase.init(project_db_file)
+		self.project_db_file = project_db_file
+		self.workers = workers if workers is not None else (os.cpu_count() or 1)
+		project_base.db.create_tables([Weather_qa], safe=True)
+
+	def run(self):
+		try:
+			cache = project_weather_cache(self.project_db_file)
+		except Project_config.DoesNotExist:
+			sys.exit('Could not retrieve project configuration from database')
+		except ValueError as e:
+			sys.exit(str(e))
+
+		if not os.path.exists(cache.cache_dir):
+			os.makedirs(cache.cache_dir)
+
+		files = [(row.filename, row.type) for row in Weather_file.select(Weather_file.filename, Weather_file.type).distinct()]
+		args = [(cache.source_path(filename), cache.cache_path(filename), filename, wtype) for filename, wtype in files]
+		self.emit_progress(0, "Checking {n} weather files...".format(n=len(files)))
+
+		findings = []
+		periods = {}
+		batch_size = max(1, len(files) // 50)
+		if self.workers > 1 and len(files) > 1:
+			with ProcessPoolExecutor(max_workers=self.workers) as executor:
+				results = executor.map(qa_weather_file, *zip(*args), chunksize=max(1, min(32, len(files) // (self.workers * 4))))
+				self.collect(files, results, findings, periods, batch_size)
+		else:
+			results = (qa_weather_file(*a) for a in args)
+			self.collect(files, results, findings, periods, batch_size)
+
+		self.emit_progress(90, "Checking weather station periods of record...")
+		for station in Weather_sta_cli.select():
+			station_finding = check_station_periods(station, periods)
+			if station_finding is not None:
+				findings.append(station_finding)
+
+		self.emit_progress(95, "Saving {n} weather QA findings...".format(n=len(findings)))
+		with project_base.db.atomic():
+			Weather_qa.delete().execute()
+			db_lib.bulk_insert(project_base.db, Weather_qa, findings)
+
+		errors = sum(1 for f in findings if f["severity"] == ERROR)
+		warnings = sum(1 for f in findings if f["severity"] == WARNING)
+		self.emit_progress(100, "Weather QA complete: {e} error(s), {w} warning(s).".format(e=errors, w=warnings))
+		return findings
+
+	def collect(self, files, results, findings, periods, batch_size):
+		for i, ((filename, wtype), (file_findings, period)) in enumerate(zip(files, results)):
+			findings.extend(file_findings)
+			if period is not None:
+				periods[filename] = period
+			if (i + 1) % batch_size == 0:
+				self.emit_progress(round((i + 1) * 90 / len(files)), "Checking weather files {i}/{n}...".format(i=i + 1, n=len(files)))
+
+
+if __name__ == '__main__':
+	sys.stdout = Unbuffered(sys.stdout)
+	parser = argparse.ArgumentParser(description="Check the project weather files and save the findings to the weather_qa table.")
+	parser.add_argument("--project_db_file", type=str, help="full path of project SQLite database file", nargs="?")
+	parser.add_argument("--workers", type=int, help="number of processes checking weather files (default CPU count)", nargs="?")
+	args = parser.parse_args()
+
+	api = WeatherQa(args.project_db_file, args.workers)
+	api.run()
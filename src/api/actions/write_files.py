@@ -9,6 +9,7 @@ from database.project.salts import Salt_module
 
 from fileio import connect, exco, dr, recall, climate, channel, aquifer, hydrology, reservoir, hru, lum, soils, init, routing_unit, regions, salts, simulation, hru_parm_db, config, ops, structural, decision_table, basin, change, water_rights, gwflow
 from helpers import utils
+from .netcdf_extract import project_netcdf_file
 
 import sys
 import argparse
@@ -220,8 +221,11 @@ class WriteFiles(ExecutableApi):
 		try:
 			if os.path.isfile(self.__netcdf_data_file):
 				dest_file = os.path.join(self.__dir, os.path.basename(self.__netcdf_data_file))
+				self.emit_progress(prog, "Extracting NetCDF data near the project from {}...".format(os.path.basename(self.__netcdf_data_file)))
+				trimmed_file = project_netcdf_file(self.project_db_file, self.__netcdf_data_file)
+
 				self.emit_progress(prog, "Copying NetCDF data file {}...".format(os.path.basename(self.__netcdf_data_file)))
-				copyfile(self.__netcdf_data_file, dest_file)
+				copyfile(trimmed_file if trimmed_file is not None else self.__netcdf_data_file, dest_file)
 			else:
 				print("NetCDF data file not found: {}".format(self.__netcdf_data_file))
 		except IOError as err:
@@ -293,6 +297,10 @@ class WriteFiles(ExecutableApi):
 			climate.Atmo_cli(os.path.join(self.__dir, atmo_cli_file), self.__version, self.__swat_version).write()
 
 	def write_connect(self, start_prog, allocated_prog):
+		cycles = connect.routing_cycles()
+		if len(cycles) > 0:
+			self.emit_progress(start_prog, "Check connections - routing cycles found ({n}): {cycles}".format(n=len(cycles), cycles="; ".join(", ".join(c) for c in cycles)), stats={"routing_cycles": cycles})
+
 		num_files = 13
 		files = self.get_file_names("connect", num_files)
 
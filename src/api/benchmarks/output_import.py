@@ -0,0 +1,186 @@
+"""
+Output import throughput benchmark.
+Generates a synthetic SWAT+ output folder (see synthetic_output.py), then times ReadOutput on it end to end for each
+requested worker count, and file by file with read_file. Each case runs in its own process so peak RSS is per case.
+Results (rows/s, MB/s, peak RSS, per file timings) are written as JSON; pass an earlier results file as --baseline
+to print the speed change per case.
+
+Usage, from src/api:
+	python -m benchmarks.output_import --data_dir /tmp/swat_bench --hrus 1000 --years 5 --workers 1,4 --results bench.json
+"""
+from actions.read_output import ReadOutput
+from benchmarks import synthetic_output
+
+import argparse
+import json
+import multiprocessing
+import os, os.path
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+
+def peak_rss_mb():
+	"""Return the peak resident memory in MB of this process and of its finished child processes, or None where unavailable (Windows)."""
+	try:
+		import resource
+	except ImportError:
+		return None, None
+
+	scale = 1024 * 1024 if sys.platform == 'darwin' else 1024  # ru_maxrss is bytes on macOS, KB elsewhere
+	own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+	children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+	return round(own, 1), round(children, 1)
+
+
+def throughput(rows, size, seconds):
+	return {
+		'seconds': round(seconds, 3),
+		'rows_per_s': round(rows / seconds) if seconds > 0 else None,
+		'mb_per_s': round(size / 1024 / 1024 / seconds, 2) if seconds > 0 else None
+	}
+
+
+def run_case(case, data_dir, db_file, dataset, result_queue):
+	"""Run one benchmark case in a child process and put its result on the queue."""
+	# ReadOutput reports progress on stdout, keep it out of the benchmark report
+	sys.stdout = open(os.devnull, 'w')
+	try:
+		files = {}
+		start = time.perf_counter()
+		api = ReadOutput(data_dir, db_file, 'benchmark', 'benchmark', 'benchmark', workers=case['workers'], build_indexes=case['build_indexes'], rollups=case['rollups'], storage=case['storage'])
+		if case['per_file']:
+			api.set_safety_level('fastest')
+			api.setup_meta_tables()
+			for file in api.get_output_files():
+				file_start = time.perf_counter()
+				warnings = api.read_file(file)
+				info = dataset['files'].get(file, {'bytes': 0})
+				files[file] = {'rows': api.file_row_counts.get(file, 0), 'bytes': info['bytes'], 'warnings': warnings}
+				files[file].update(throughput(files[file]['rows'], info['bytes'], time.perf_counter() - file_start))
+			api.conn.commit()
+			api.conn.close()
+		else:
+			api.read()
+		elapsed = time.perf_counter() - start
+
+		result = {'case': case, 'rows': dataset['rows'], 'bytes': dataset['bytes']}
+		result.update(throughput(dataset['rows'], dataset['bytes'], elapsed))
+		result['peak_rss_mb'], result['peak_worker_rss_mb'] = peak_rss_mb()
+		result['db_mb'] = round(os.path.getsize(db_file) / 1024 / 1024, 2)
+		if files:
+			result['files'] = files
+		result_queue.put(result)
+	except Exception as e:
+		result_queue.put({'case': case, 'error': str(e)})
+
+
+def run_benchmark(data_dir, db_file, dataset, cases):
+	ctx = multiprocessing.get_context()
+	results = []
+	for case in cases:
+		result_queue = ctx.Queue()
+		proc = ctx.Process(target=run_case, args=(case, data_dir, db_file, dataset, result_queue))
+		proc.start()
+		result = result_queue.get()
+		proc.join()
+		results.append(result)
+		print_result(result)
+	return results
+
+
+def case_name(case):
+	name = 'per file' if case['per_file'] else 'end to end, {} worker{}'.format(case['workers'], '' if case['workers'] == 1 else 's')
+	if case['storage'] != 'rows':
+		name += ', {} storage'.format(case['storage'])
+	if case['rollups']:
+		name += ', rollups'
+	return name
+
+
+def print_result(result):
+	if 'error' in result:
+		print('{}: error {}'.format(case_name(result['case']), result['error']))
+		return
+
+	print('{}: {:.2f} s, {:,} rows/s, {} MB/s, peak RSS {} MB, database {} MB'.format(case_name(result['case']), result['seconds'], result['rows_per_s'], result['mb_per_s'], result['peak_rss_mb'], result['db_mb']))
+	for file, stats in sorted(result.get('files', {}).items(), key=lambda item: -item[1]['seconds']):
+		print('\t{:<32} {:>10,} rows {:>8.3f} s {:>12,} rows/s {:>8} MB/s'.format(file, stats['rows'], stats['seconds'], stats['rows_per_s'] or 0, stats['mb_per_s']))
+
+
+def compare(results, baseline_file):
+	"""Print the speed of each case relative to the same case in an earlier results file."""
+	with open(baseline_file, 'r') as f:
+		baseline = json.load(f)
+
+	if baseline.get('dataset', {}).get('settings', None) != results['dataset']['settings']:
+		print('Warning: baseline was run on a different dataset, comparing rows/s only.')
+
+	previous = {case_name(r['case']): r for r in baseline.get('results', []) if 'error' not in r}
+	for result in results['results']:
+		name = case_name(result['case'])
+		if 'error' in result or name not in previous:
+			continue
+		ratio = result['rows_per_s'] / previous[name]['rows_per_s']
+		print('{}: {:,} rows/s vs {:,} baseline ({:+.1f}%)'.format(name, result['rows_per_s'], previous[name]['rows_per_s'], (ratio - 1) * 100))
+
+
+def git_commit():
+	try:
+		return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL).decode().strip()
+	except Exception:
+		return None
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description="Benchmark the SWAT+ output import on synthetic output files")
+	parser.add_argument("--data_dir", type=str, help="folder for the synthetic output files, reused when the dataset settings match")
+	parser.add_argument("--db_file", type=str, help="output SQLite database to write (default benchmark_output.sqlite in data_dir)", nargs="?")
+	synthetic_output.add_dataset_arguments(parser)
+	parser.add_argument("--workers", type=str, help="comma-separated worker counts to run end to end (default 1)", nargs="?", default="1")
+	parser.add_argument("--storage", type=str, help="output table storage: rows (default) or compact", nargs="?", default="rows")
+	parser.add_argument("--rollups", type=str, help="y/n write rollup tables of daily files (default n)", nargs="?")
+	parser.add_argument("--build_indexes", type=str, help="y/n build indexes after the import (default y)", nargs="?")
+	parser.add_argument("--per_file", type=str, help="y/n also time each file with read_file (default y)", nargs="?")
+	parser.add_argument("--results", type=str, help="JSON file to write results to (default benchmark_results.json in data_dir)", nargs="?")
+	parser.add_argument("--baseline", type=str, help="earlier results JSON file to compare against", nargs="?")
+	args = parser.parse_args()
+
+	if args.data_dir is None:
+		sys.exit('Provide --data_dir')
+
+	print('Generating synthetic output...')
+	dataset = synthetic_output.generate(args.data_dir, **synthetic_output.dataset_arguments(args))
+	print('{} files, {:,} rows, {:.1f} MB'.format(len(dataset['files']), dataset['rows'], dataset['bytes'] / 1024 / 1024))
+
+	db_file = args.db_file if args.db_file is not None else os.path.join(args.data_dir, 'benchmark_output.sqlite')
+	base_case = {'workers': 1, 'storage': args.storage, 'rollups': args.rollups == 'y', 'build_indexes': args.build_indexes != 'n', 'per_file': False}
+	cases = []
+	for workers in args.workers.split(','):
+		case = dict(base_case)
+		case['workers'] = int(workers)
+		cases.append(case)
+	if args.per_file != 'n':
+		case = dict(base_case)
+		case['per_file'] = True
+		cases.append(case)
+
+	results = {
+		'time': datetime.now().isoformat(timespec='seconds'),
+		'commit': git_commit(),
+		'python': platform.python_version(),
+		'platform': platform.platform(),
+		'cpu_count': os.cpu_count(),
+		'dataset': {'settings': dataset['settings'], 'files': len(dataset['files']), 'rows': dataset['rows'], 'bytes': dataset['bytes']},
+		'results': run_benchmark(args.data_dir, db_file, dataset, cases)
+	}
+
+	results_file = args.results if args.results is not None else os.path.join(args.data_dir, 'benchmark_results.json')
+	with open(results_file, 'w') as f:
+		json.dump(results, f, indent=2)
+	print('Results written to {}'.format(results_file))
+
+	if args.baseline is not None:
+		compare(results, args.baseline)
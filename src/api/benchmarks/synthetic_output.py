@@ -0,0 +1,184 @@
+"""
+Generate synthetic SWAT+ output (files_out.out and the CSV files it lists) for benchmarking the output import.
+Columns come from the output models registered in database/output/schema.py and files follow the heading, units
+and start line layout of database/output/data.py, so the import treats them like real model output.
+
+Usage, from src/api:
+	python -m benchmarks.synthetic_output --out_dir /tmp/swat_bench --hrus 1000 --channels 100 --years 5
+"""
+from database.output import data, schema
+
+import argparse
+import calendar
+import json
+import os, os.path
+import random
+import sys
+
+default_families = ['hru_wb', 'hru_nb', 'hru_ls', 'hru_pw', 'lsunit_wb', 'channel_sd', 'aquifer', 'reservoir', 'basin_wb']
+default_timesteps = ['day', 'mon', 'yr', 'aa']
+
+key_columns = ['jday', 'mon', 'day', 'yr', 'unit', 'gis_id', 'name']
+dataset_file = 'benchmark_dataset.json'
+
+
+def object_kind(family):
+	for prefix in ['basin', 'region', 'hru', 'lsunit', 'ru', 'channel', 'aquifer', 'reservoir', 'wetland', 'recall']:
+		if family.startswith(prefix):
+			return prefix
+	return 'channel'
+
+
+def object_counts(hrus, channels, reservoirs):
+	return {
+		'basin': 1,
+		'region': 1,
+		'hru': hrus,
+		'lsunit': max(1, hrus // 10),
+		'ru': max(1, hrus // 10),
+		'channel': channels,
+		'aquifer': channels,
+		'reservoir': reservoirs,
+		'wetland': reservoirs,
+		'recall': max(1, channels // 10)
+	}
+
+
+def family_columns(family, timestep):
+	"""Return the value columns and types of an output table, in model order after the date and object columns."""
+	table_schema = schema.table_schemas.get('{}_{}'.format(family, timestep), schema.table_schemas.get(family, None))
+	if table_schema is None:
+		raise ValueError('Unknown output table family {}'.format(family))
+	return [(col, col_type) for col, col_type in table_schema.items() if col not in key_columns]
+
+
+def time_steps(timestep, years):
+	"""Yield the jday, mon, day, yr of each print step of a time series over the given years."""
+	if timestep == 'aa':
+		yield 366 if calendar.isleap(years[-1]) else 365, 12, 31, years[-1]
+		return
+
+	for yr in years:
+		jday = 0
+		for mon in range(1, 13):
+			days = calendar.monthrange(yr, mon)[1]
+			if timestep == 'day':
+				for day in range(1, days + 1):
+					yield jday + day, mon, day, yr
+			elif timestep == 'mon':
+				yield jday + days, mon, days, yr
+			jday += days
+		if timestep == 'yr':
+			yield jday, 12, 31, yr
+
+
+def write_output_file(file_path, family, timestep, objects, years, rng, value_pool):
+	"""Write one output CSV and return its number of data rows."""
+	columns = family_columns(family, timestep)
+	desc_key = family
+	start_line = data.special_start_lines.get(desc_key, data.default_start_line)
+	read_units = desc_key not in data.ignore_units
+	kind = object_kind(family)
+
+	names = ['{}{:04d}'.format(kind, i) for i in range(1, objects + 1)]
+	row_count = 0
+	with open(file_path, 'w', newline='') as f:
+		header_lines = [' SWAT+ synthetic output for benchmarking: {}_{}\n'.format(family, timestep)]
+		header_lines.append(','.join(key_columns + [col for col, col_type in columns]) + '\n')
+		if read_units:
+			header_lines.append(','.join([''] * len(key_columns) + ['mm' if col_type == 'REAL' else '' for col, col_type in columns]) + '\n')
+		while len(header_lines) < start_line - 1:
+			header_lines.insert(1, '\n')
+		f.writelines(header_lines)
+
+		value_count = len(columns)
+		for jday, mon, day, yr in time_steps(timestep, years):
+			prefix = '{},{},{},{},'.format(jday, mon, day, yr)
+			lines = []
+			for i in range(objects):
+				lines.append('{}{},{},{},{}\n'.format(prefix, i + 1, i + 1, names[i], ','.join(rng.choices(value_pool, k=value_count))))
+			f.writelines(lines)
+			row_count += objects
+	return row_count
+
+
+def generate(out_dir, hrus=100, channels=10, reservoirs=2, years=2, start_year=2000, families=None, timesteps=None, seed=1):
+	"""
+	Write a synthetic output folder and a benchmark_dataset.json describing it (settings, rows and bytes per file).
+	An existing folder generated with the same settings is reused.
+	"""
+	families = default_families if families is None else families
+	timesteps = default_timesteps if timesteps is None else timesteps
+	settings = {
+		'hrus': hrus, 'channels': channels, 'reservoirs': reservoirs, 'years': years, 'start_year': start_year,
+		'families': families, 'timesteps': timesteps, 'seed': seed
+	}
+
+	dataset_path = os.path.join(out_dir, dataset_file)
+	if os.path.exists(dataset_path):
+		with open(dataset_path, 'r') as f:
+			dataset = json.load(f)
+		if dataset.get('settings', None) == settings and all(os.path.exists(os.path.join(out_dir, file)) for file in dataset['files']):
+			return dataset
+
+	if not os.path.exists(out_dir):
+		os.makedirs(out_dir)
+
+	rng = random.Random(seed)
+	value_pool = ['{:.3f}'.format(rng.expovariate(0.1)) for i in range(4096)] + ['0.000'] * 1024
+	counts = object_counts(hrus, channels, reservoirs)
+	year_list = list(range(start_year, start_year + years))
+
+	files = {}
+	for family in families:
+		for timestep in timesteps:
+			file = '{}_{}.csv'.format(family, timestep)
+			file_path = os.path.join(out_dir, file)
+			rows = write_output_file(file_path, family, timestep, counts[object_kind(family)], year_list, rng, value_pool)
+			files[file] = {'rows': rows, 'bytes': os.path.getsize(file_path)}
+
+	with open(os.path.join(out_dir, 'files_out.out'), 'w') as f:
+		f.write('files_out.out: synthetic SWAT+ output files\n')
+		for file in files:
+			f.write('  {:<12}{}\n'.format(object_kind(file).upper(), file))
+
+	dataset = {
+		'settings': settings,
+		'files': files,
+		'rows': sum(v['rows'] for v in files.values()),
+		'bytes': sum(v['bytes'] for v in files.values())
+	}
+	with open(dataset_path, 'w') as f:
+		json.dump(dataset, f, indent=2)
+	return dataset
+
+
+def add_dataset_arguments(parser):
+	parser.add_argument("--hrus", type=int, help="number of HRUs (default 100)", nargs="?", default=100)
+	parser.add_argument("--channels", type=int, help="number of channels and aquifers (default 10)", nargs="?", default=10)
+	parser.add_argument("--reservoirs", type=int, help="number of reservoirs (default 2)", nargs="?", default=2)
+	parser.add_argument("--years", type=int, help="number of simulated years (default 2)", nargs="?", default=2)
+	parser.add_argument("--families", type=str, help="comma-separated output table families, e.g. hru_wb,channel_sd", nargs="?")
+	parser.add_argument("--timesteps", type=str, help="comma-separated print steps: day,mon,yr,aa (default all)", nargs="?")
+	parser.add_argument("--seed", type=int, help="random seed for values (default 1)", nargs="?", default=1)
+
+
+def dataset_arguments(args):
+	return {
+		'hrus': args.hrus, 'channels': args.channels, 'reservoirs': args.reservoirs, 'years': args.years, 'seed': args.seed,
+		'families': [item.strip() for item in args.families.split(',')] if args.families else None,
+		'timesteps': [item.strip() for item in args.timesteps.split(',')] if args.timesteps else None
+	}
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description="Generate synthetic SWAT+ output files for benchmarking the output import")
+	parser.add_argument("--out_dir", type=str, help="folder to write files_out.out and the output CSV files")
+	add_dataset_arguments(parser)
+	args = parser.parse_args()
+
+	if args.out_dir is None:
+		sys.exit('Provide --out_dir')
+
+	dataset = generate(args.out_dir, **dataset_arguments(args))
+	print('Wrote {} files, {} rows, {:.1f} MB to {}'.format(len(dataset['files']), dataset['rows'], dataset['bytes'] / 1024 / 1024, args.out_dir))
@@ -488,3 +488,31 @@ category_descriptions = {
 		'temp': 'temperature'
 	}
 }
+
+# Indexes built after the output import, by time series. An index is only created when the table has all of its columns.
+index_columns = {
+	'day': [['gis_id', 'yr', 'mon', 'day'], ['unit', 'yr', 'mon', 'day']],
+	'mon': [['gis_id', 'yr', 'mon'], ['unit', 'yr', 'mon']],
+	'yr': [['gis_id', 'yr'], ['unit', 'yr']],
+	'aa': [['gis_id'], ['unit']]
+}
+
+special_index_columns = {
+	'mgt_out': [['hru', 'year', 'mon', 'day']],
+	'crop_yld': [['gis_id', 'yr'], ['unit', 'yr']],
+	'soil_nutcarb_out': [['hru', 'year', 'day']]
+}
+
+# Rolling daily output up to months and years sums flux columns. State and rate columns are averaged instead,
+# identified by their units or, where the units don't tell (e.g. soil water or storage in mm), by column name.
+rollup_key_columns = ['unit', 'gis_id', 'name']
+
+rollup_mean_units = ['m^3/s', 'm3/s', 'm/s', 'degc', 'deg_c', 'c', '%', 'frac', 'ratio', 'mg/l', 'ppm', 'm', 'ha', 'mj/m^2', 'mj/m2', 'w/m^2', 'days']
+
+rollup_mean_columns = [
+	'cn', 'sw_init', 'sw_final', 'sw_ave', 'sw_300', 'sno_init', 'sno_final', 'snopack', 'wet_stor',
+	'lai', 'bioms', 'residue', 'sol_tmp', 'strsw', 'strsa', 'strstmp', 'strsn', 'strsp', 'strss', 'nplt', 'percn', 'pplnt',
+	'tmx', 'tmn', 'tmpav', 'solarad', 'wndspd', 'rhum', 'lai_max', 'bm_max', 'dep_wt', 'stor', 'depth', 'width', 'slope'
+]
+
+rollup_mean_suffixes = ['_stor', '_st', '_conc']
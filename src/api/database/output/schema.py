@@ -0,0 +1,58 @@
+"""
+Registry of the known SWAT+ output table layouts, built from the peewee models in this package.
+Used by the output import to type columns without inferring them from the data.
+"""
+from peewee import *
+from . import base, aquifer, channel, hyd, losses, misc, nutbal, plantwx, reservoir, waterbal, pest, data
+
+model_modules = [aquifer, channel, hyd, losses, misc, nutbal, plantwx, reservoir, waterbal, pest]
+
+field_sql_types = {
+	IntegerField: 'INTEGER',
+	BigIntegerField: 'INTEGER',
+	BooleanField: 'INTEGER',
+	DoubleField: 'REAL',
+	FloatField: 'REAL',
+	DecimalField: 'REAL',
+	CharField: 'TEXT',
+	TextField: 'TEXT'
+}
+
+
+def field_sql_type(field):
+	for field_class in type(field).__mro__:
+		sql_type = field_sql_types.get(field_class, None)
+		if sql_type is not None:
+			return sql_type
+	return None
+
+
+def build_registry():
+	registry = {}
+	for module in model_modules:
+		for obj in vars(module).values():
+			if isinstance(obj, type) and issubclass(obj, base.BaseModel) and obj.__module__ == module.__name__:
+				registry[obj._meta.table_name] = {name: field_sql_type(field) for name, field in obj._meta.fields.items() if name != 'id'}
+	return registry
+
+
+table_schemas = build_registry()
+
+
+def table_family(table_name):
+	"""Return the table name without its time series suffix, e.g. hru_wb_day -> hru_wb, matching the keys in data.py."""
+	for key in data.time_series_labels:
+		if table_name.endswith('_{}'.format(key)):
+			return table_name[:-len(key) - 1]
+	return table_name
+
+
+def get_column_types(table_name, column_headers):
+	"""
+	Return the SQL type of each column for a known output table, or None if the table is not in the registry.
+	Columns the model does not know about (e.g. added in newer SWAT+ versions) are returned as None so the caller can infer them.
+	"""
+	schema = table_schemas.get(table_name, table_schemas.get(table_family(table_name), None))
+	if schema is None:
+		return None
+	return [schema.get(col, None) for col in column_headers]
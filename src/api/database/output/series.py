@@ -0,0 +1,122 @@
+"""
+Reader for output tables imported with compact storage (ReadOutput storage='compact').
+Each <table>_series row holds one chunk, up to a year, of one variable for one object as zlib compressed little-endian
+float64 values, starting at start_idx of the table's dates in series_calendar. Objects are numbered in <table>_series_obj
+and variables in series_variable, so chunks are keyed on (obj_id, var_id, start_idx).
+"""
+from array import array
+from itertools import chain
+import sys
+import zlib
+
+COMPRESS_LEVEL = 1
+
+
+def unpack_values(blob):
+	values = array('d')
+	values.frombytes(zlib.decompress(blob))
+	if sys.byteorder != 'little':
+		values.byteswap()
+	return values
+
+
+def pack_values(values):
+	if sys.byteorder != 'little':
+		values = array('d', values)
+		values.byteswap()
+	return zlib.compress(values.tobytes(), COMPRESS_LEVEL)
+
+
+def get_calendar(db_conn, table_name):
+	"""Return the (yr, mon, day, jday) of each position in the series of a table."""
+	cursor = db_conn.execute('SELECT yr, mon, day, jday FROM series_calendar WHERE table_name = ? ORDER BY idx', (table_name,))
+	return [tuple(row) for row in cursor.fetchall()]
+
+
+def get_variables(db_conn, table_name):
+	"""Return the variables of a table, in the column order of the output file."""
+	cursor = db_conn.execute('SELECT variable FROM series_variable WHERE table_name = ? ORDER BY var_id', (table_name,))
+	return [row[0] for row in cursor.fetchall()]
+
+
+def get_objects(db_conn, table_name):
+	"""Return the object key columns of a table and a dict of obj_id to their values."""
+	cursor = db_conn.execute('SELECT * FROM {}_series_obj'.format(table_name))
+	key_columns = [d[0] for d in cursor.description][1:]
+	return key_columns, {row[0]: list(row[1:]) for row in cursor.fetchall()}
+
+
+def read_series(db_conn, table_name, variable, gis_id=None, unit=None, name=None):
+	"""
+	Return the start position in the table calendar and the values of one variable for one object, identified by gis_id, unit or name.
+	Values are an array of doubles, missing values are NaN; use numpy.frombuffer on it for a NumPy array without copying.
+	"""
+	if gis_id is not None:
+		where, param = 'gis_id = ?', gis_id
+	elif unit is not None:
+		where, param = 'unit = ?', unit
+	elif name is not None:
+		where, param = 'name = ?', name
+	else:
+		raise ValueError('Provide a gis_id, unit or name to read a series.')
+
+	cursor = db_conn.execute("""
+		SELECT start_idx, vals FROM {t}_series
+		WHERE obj_id = (SELECT obj_id FROM {t}_series_obj WHERE {w} LIMIT 1)
+		AND var_id = (SELECT var_id FROM series_variable WHERE table_name = ? AND variable = ?)
+		ORDER BY start_idx""".format(t=table_name, w=where), (param, table_name, variable))
+	rows = cursor.fetchall()
+	if len(rows) < 1:
+		return None, array('d')
+
+	start = rows[0][0]
+	values = array('d')
+	for start_idx, vals in rows:
+		gap = start_idx - (start + len(values))
+		if gap > 0:
+			values.extend([float('nan')] * gap)
+		values.extend(unpack_values(vals))
+	return start, values
+
+
+def read_rows(db_conn, table_name, batch_size=100000):
+	"""
+	Expand a compact series table back into the rows of the original output table.
+	Returns the (column, type) pairs, time columns then the object key columns then one REAL column per variable,
+	and a generator of row batches. Chunks are read in the order they were written, where the variables of a chunk
+	follow each other, so only one chunk is held in memory. NaN values are returned as None.
+	"""
+	cursor = db_conn.execute('PRAGMA table_info({}_series_obj)'.format(table_name))
+	key_columns = [(row[1], row[2]) for row in cursor.fetchall() if row[1] != 'obj_id']
+	variables = get_variables(db_conn, table_name)
+	columns = [('jday', 'INTEGER'), ('mon', 'INTEGER'), ('day', 'INTEGER'), ('yr', 'INTEGER')] + key_columns + [(v, 'REAL') for v in variables]
+	return columns, _row_batches(db_conn, table_name, get_calendar(db_conn, table_name), get_objects(db_conn, table_name)[1], len(variables), batch_size)
+
+
+def _row_batches(db_conn, table_name, calendar, objects, variable_count, batch_size):
+	cursor = db_conn.execute('SELECT obj_id, var_id, start_idx, n, vals FROM {}_series ORDER BY rowid'.format(table_name))
+	batch = []
+	chunk_id = None
+	chunk_n = 0
+	chunk_values = None
+	for row in chain(cursor, [None]):
+		row_chunk_id = None if row is None else (row[0], row[2])
+		if row_chunk_id != chunk_id and chunk_id is not None:
+			key_values = objects[chunk_id[0]]
+			start_idx = chunk_id[1]
+			for i in range(chunk_n):
+				yr, mon, day, jday = calendar[start_idx + i]
+				batch.append([jday, mon, day, yr] + key_values + [None if v is None or v[i] != v[i] else v[i] for v in chunk_values])
+			if len(batch) >= batch_size:
+				yield batch
+				batch = []
+		if row is None:
+			break
+		if row_chunk_id != chunk_id:
+			chunk_id = row_chunk_id
+			chunk_n = row[3]
+			chunk_values = [None] * variable_count
+		chunk_values[row[1] - 1] = unpack_values(row[4])
+
+	if len(batch) > 0:
+		yield batch
@@ -67,6 +67,18 @@ class Weather_file(BaseModel):
 	lon = DoubleField()
 
 
+class Weather_qa(BaseModel):
+	"""Findings of the last weather data QA pass (actions/weather_qa.py): a weather file, or a station for checks across its files."""
+	name = CharField()
+	type = CharField(null=True)
+	check = CharField()
+	severity = CharField()
+	count = IntegerField()
+	start_date = DateField(null=True)
+	end_date = DateField(null=True)
+	message = TextField()
+
+
 class Wind_dir_cli(BaseModel):
 	name = CharField(unique=True)
 	cnt = IntegerField()
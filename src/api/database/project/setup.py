@@ -2,11 +2,11 @@ from peewee import *
 from . import base, config, simulation, climate, link, channel, reservoir, dr, exco, recall, hydrology, routing_unit, aquifer, \
 	basin, hru_parm_db, structural, ops, decision_table, init, lum, soils, \
 	change, regions, hru, connect, gis, water_rights, salts
-from database import lib
+from database import lib, snapshot
 from database.datasets import base as datasets_base, definitions as dataset_defs, decision_table as dataset_dts
 import os, os.path
-from shutil import copyfile, copy
-import time
+import sqlite3
+import sys
 
 class SetupProjectDatabase():
 	@staticmethod
@@ -28,16 +28,21 @@ class SetupProjectDatabase():
 
 	@staticmethod
 	def rollback(project_db:str, rollback_db:str):
-		base_path = os.path.dirname(project_db)
-		rel_project_db = os.path.relpath(project_db, base_path)
-		filename, file_extension = os.path.splitext(rel_project_db)
-		err_filename = filename + '_error_' + time.strftime('%Y%m%d-%H%M%S') + file_extension
-		err_dir = os.path.join(base_path, 'DatabaseErrors')
-		if not os.path.exists(err_dir):
-			os.makedirs(err_dir)
-		
-		copyfile(project_db, os.path.join(err_dir, err_filename))
-		copy(rollback_db, project_db)
+		"""
+		Keep a snapshot of the failed project database in DatabaseErrors, then restore it from the rollback_db snapshot.
+		Problems are written to stderr, as stdout carries the caller's JSON progress messages.
+		"""
+		try:
+			base.db.close()
+		except (OperationalError, InterfaceError) as err:
+			print('Could not close the project database before rolling back: {}'.format(err), file=sys.stderr)
+
+		try:
+			snapshot.create_snapshot(project_db, '_error', dir_name=snapshot.ERROR_DIR)
+		except (sqlite3.Error, OSError) as err:
+			print('Could not save a copy of the failed project database: {}'.format(err), file=sys.stderr)
+
+		snapshot.restore_snapshot(rollback_db, project_db)
 		SetupProjectDatabase.init(project_db)
 
 	@staticmethod
@@ -49,7 +54,7 @@ class SetupProjectDatabase():
 		base.db.create_tables([config.Project_config, config.File_cio_classification, config.File_cio])
 		base.db.create_tables([basin.Codes_bsn, basin.Parameters_bsn, basin.Carbon_bsn, basin.Carbon_lyr_bsn])
 		base.db.create_tables([simulation.Time_sim, simulation.Print_prt, simulation.Print_prt_aa_int, simulation.Print_prt_object, simulation.Object_prt, simulation.Object_cnt, simulation.Constituents_cs])
-		base.db.create_tables([climate.Weather_wgn_cli, climate.Weather_wgn_cli_mon, climate.Weather_sta_cli, climate.Weather_sta_cli_scale, climate.Weather_file, climate.Wind_dir_cli, climate.Atmo_cli, climate.Atmo_cli_sta, climate.Atmo_cli_sta_value])
+		base.db.create_tables([climate.Weather_wgn_cli, climate.Weather_wgn_cli_mon, climate.Weather_sta_cli, climate.Weather_sta_cli_scale, climate.Weather_file, climate.Weather_qa, climate.Wind_dir_cli, climate.Atmo_cli, climate.Atmo_cli_sta, climate.Atmo_cli_sta_value])
 		base.db.create_tables([link.Chan_aqu_lin, link.Chan_aqu_lin_ob, link.Chan_surf_lin, link.Chan_surf_lin_ob])
 		base.db.create_tables([channel.Initial_cha, channel.Hydrology_cha, channel.Sediment_cha, channel.Nutrients_cha, channel.Channel_cha, channel.Hyd_sed_lte_cha, channel.Channel_lte_cha])
 		base.db.create_tables([reservoir.Initial_res, reservoir.Hydrology_res, reservoir.Sediment_res, reservoir.Nutrients_res, reservoir.Weir_res, reservoir.Reservoir_res, reservoir.Hydrology_wet, reservoir.Wetland_wet])
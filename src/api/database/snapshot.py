@@ -0,0 +1,133 @@
+"""
+Snapshots of SQLite databases through the online backup API (sqlite3.Connection.backup), which copies a consistent
+state page by page even while other connections have the database open, unlike a copy of the file.
+Snapshots are kept in a folder next to the database (DatabaseBackups by default), optionally gzip compressed,
+and, when asked, pruned to the most recent ones of the same kind. Restoring goes through the backup API too, so the live file
+is replaced in a single transaction rather than overwritten.
+"""
+import gzip
+import os, os.path
+import re
+import shutil
+import sqlite3
+import time
+
+BACKUP_DIR = 'DatabaseBackups'
+ERROR_DIR = 'DatabaseErrors'
+PAGES_PER_STEP = 16384
+COMPRESS_LEVEL = 1
+GZ_EXT = '.gz'
+
+
+def snapshot_file(db_file, suffix, compress=False, dir_name=BACKUP_DIR):
+	"""Return the path of a new snapshot of db_file: <folder of db_file>/<dir_name>/<name><suffix>_<timestamp><ext>[.gz]."""
+	filename, file_extension = os.path.splitext(os.path.basename(db_file))
+	snap_filename = filename + suffix + '_' + time.strftime('%Y%m%d-%H%M%S') + file_extension
+	if compress:
+		snap_filename += GZ_EXT
+	return os.path.join(os.path.dirname(os.path.abspath(db_file)), dir_name, snap_filename)
+
+
+def backup_db(src_file, dest_file, progress=None, pages=PAGES_PER_STEP):
+	"""
+	Copy src_file to dest_file with the online backup API, pages at a time, calling progress(fraction) after each step.
+	An existing dest_file is overwritten in one transaction.
+	"""
+	def on_step(status, remaining, total):
+		if progress is not None and total > 0:
+			progress((total - remaining) / total)
+
+	src = sqlite3.connect(src_file)
+	try:
+		dest = sqlite3.connect(dest_file)
+		try:
+			src.backup(dest, pages=pages, progress=on_step)
+		finally:
+			dest.close()
+	finally:
+		src.close()
+
+
+def compress_file(src_file, dest_file):
+	with open(src_file, 'rb') as src, gzip.open(dest_file, 'wb', compresslevel=COMPRESS_LEVEL) as dest:
+		shutil.copyfileobj(src, dest, 1024 * 1024)
+
+
+def decompress_file(src_file, dest_file):
+	with gzip.open(src_file, 'rb') as src, open(dest_file, 'wb') as dest:
+		shutil.copyfileobj(src, dest, 1024 * 1024)
+
+
+def create_snapshot(db_file, suffix='_bak', compress=False, keep=None, progress=None, dir_name=BACKUP_DIR):
+	"""
+	Snapshot db_file into dir_name and return the snapshot's path. The snapshot is written to a temporary file and
+	renamed when complete, so an interrupted snapshot never looks like a good one.
+	With keep, only the keep most recent snapshots of db_file with the same suffix are kept afterwards,
+	so for example _bak snapshots never prune the _v<version> ones taken before an upgrade.
+	"""
+	dest_file = snapshot_file(db_file, suffix, compress, dir_name)
+	dest_dir = os.path.dirname(dest_file)
+	if not os.path.exists(dest_dir):
+		os.makedirs(dest_dir)
+
+	temp_file = dest_file + '.tmp'
+	if os.path.exists(temp_file):
+		os.remove(temp_file)
+
+	if compress:
+		db_temp_file = temp_file + '.sqlite'
+		try:
+			backup_db(db_file, db_temp_file, progress)
+			compress_file(db_temp_file, temp_file)
+		finally:
+			if os.path.exists(db_temp_file):
+				os.remove(db_temp_file)
+	else:
+		backup_db(db_file, temp_file, progress)
+
+	os.replace(temp_file, dest_file)
+	prune_snapshots(db_file, suffix, keep, dir_name)
+	return dest_file
+
+
+def restore_snapshot(snapshot, db_file, progress=None):
+	"""
+	Replace the contents of db_file with snapshot (compressed or not). Connections to db_file in this process must be closed first;
+	if the restore is interrupted db_file keeps its previous contents.
+	"""
+	if not snapshot.endswith(GZ_EXT):
+		backup_db(snapshot, db_file, progress)
+		return
+
+	temp_file = db_file + '.restore.tmp'
+	try:
+		decompress_file(snapshot, temp_file)
+		backup_db(temp_file, db_file, progress)
+	finally:
+		if os.path.exists(temp_file):
+			os.remove(temp_file)
+
+
+def list_snapshots(db_file, suffix=None, dir_name=BACKUP_DIR):
+	"""Return the snapshots of db_file in dir_name, only those taken with suffix if given, most recent first."""
+	snap_dir = os.path.join(os.path.dirname(os.path.abspath(db_file)), dir_name)
+	if not os.path.isdir(snap_dir):
+		return []
+
+	filename, file_extension = os.path.splitext(os.path.basename(db_file))
+	# <name>_bak_<timestamp>, <name>_v1_2_3_<timestamp>, <name>_error_<timestamp>, not snapshots of another <name>_xyz database
+	kinds = r'_(bak|error|v[\d_]+)' if suffix is None else re.escape(suffix)
+	pattern = re.compile(r'^{name}{kinds}_\d{{8}}-\d{{6}}{ext}({gz})?$'.format(name=re.escape(filename), kinds=kinds, ext=re.escape(file_extension), gz=re.escape(GZ_EXT)))
+	files = [os.path.join(snap_dir, f) for f in os.listdir(snap_dir) if pattern.match(f)]
+	return sorted(files, key=os.path.getmtime, reverse=True)
+
+
+def prune_snapshots(db_file, suffix, keep, dir_name=BACKUP_DIR):
+	"""Delete all but the keep most recent snapshots of db_file taken with suffix in dir_name (none if keep is None or 0). Returns the deleted files."""
+	if keep is None or keep < 1:
+		return []
+
+	deleted = list_snapshots(db_file, suffix, dir_name)[keep:]
+	for f in deleted:
+		os.remove(f)
+	return deleted
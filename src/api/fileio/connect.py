@@ -1,10 +1,43 @@
 from helpers import utils, table_mapper
+from helpers.routing_graph import RoutingGraph
 import database.project.connect as db
 
 from database.project import hru, routing_unit, exco, reservoir, aquifer, channel, recall, dr, basin
 from .base import BaseFileModel
 
 
+# con_out table of each connect file object type, for the routing graph of the connections being written
+CON_OUT_TABLES = [
+	("hru", db.Hru_con_out, db.Hru_con_out.hru_con),
+	("hlt", db.Hru_lte_con_out, db.Hru_lte_con_out.hru_lte_con),
+	("ru", db.Rout_unit_con_out, db.Rout_unit_con_out.rtu_con),
+	("aqu", db.Aquifer_con_out, db.Aquifer_con_out.aquifer_con),
+	("cha", db.Channel_con_out, db.Channel_con_out.channel_con),
+	("res", db.Reservoir_con_out, db.Reservoir_con_out.reservoir_con),
+	("rec", db.Recall_con_out, db.Recall_con_out.recall_con),
+	("exc", db.Exco_con_out, db.Exco_con_out.exco_con),
+	("dr", db.Delratio_con_out, db.Delratio_con_out.delratio_con),
+	("out", db.Outlet_con_out, db.Outlet_con_out.outlet_con),
+	("sdc", db.Chandeg_con_out, db.Chandeg_con_out.chandeg_con)
+]
+
+# Object types routing surface flow; aquifers are left out as their discharge back to channels is a normal cycle
+SURFACE_OBJ_TYPS = ["hru", "hlt", "ru", "cha", "res", "rec", "exc", "dr", "out", "sdc"]
+
+
+def routing_cycles():
+	"""Return the cycles in the surface routing of the connect tables, upstream to downstream, each a list of "obj_typ name" strings."""
+	graph = RoutingGraph.load_connections(CON_OUT_TABLES)
+	cycles = []
+	for component in graph.cycles(SURFACE_OBJ_TYPS):
+		names = []
+		for obj_typ, id in component:
+			con = table_mapper.obj_typs[obj_typ].get_or_none(id=id)
+			names.append("{} {}".format(obj_typ, id if con is None else con.name))
+		cycles.append(names)
+	return cycles
+
+
 def write_header(file, elem_name, has_con_out):
 	file.write(utils.int_pad("id"))
 	file.write(utils.string_pad("name", direction="left"))
@@ -15,5 +15,8 @@ class Unbuffered(object):
 
 
 class ExecutableApi:
-	def emit_progress(self, percent, message):
-		print(json.dumps({'percent': percent, 'message': message}))
+	def emit_progress(self, percent, message, stats=None):
+		progress = {'percent': percent, 'message': message}
+		if stats is not None:
+			progress['stats'] = stats
+		print(json.dumps(progress))
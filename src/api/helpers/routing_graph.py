@@ -0,0 +1,157 @@
+class RouteCat:
+	LSU = "LSU"
+	PT = "PT"
+	CH = "CH"
+	WTR = "WTR"
+	SUB = "SUB"
+	HRU = "HRU"
+	OUTLET = "X"
+	RES = "RES"
+	PND = "PND"
+	AQU = "AQU"
+	DAQ = "DAQ"
+	WaterTypes = [WTR, RES, PND]
+	SurfaceTypes = [LSU, PT, CH, WTR, SUB, HRU, RES, PND]
+
+
+# Positions in a gis_routing row
+SOURCE_ID, SOURCE_CAT, HYD_TYP, SINK_ID, SINK_CAT, PERCENT = range(6)
+
+
+class RoutingGraph:
+	"""
+	gis_routing loaded once into memory. Objects are (category, gis id) pairs.
+	Point sources (PT) only pass flow on, so chains of points are resolved to the row leaving the last point,
+	memoized per point and with loops reported instead of followed forever.
+	Cycles are normal where aquifers discharge back into the channels recharging them, so objects are ordered
+	as strongly connected components and cycles are left to the caller to report, e.g. over SurfaceTypes only.
+	"""
+	def __init__(self, rows):
+		self.rows = [tuple(row) for row in rows]
+		self.point_outflows = {}
+		self.point_inflows = {}
+		self.resolved_points = {}
+		for row in self.rows:
+			# As with dictionaries built from a query, the last row wins when a point has several
+			if row[SOURCE_CAT] == RouteCat.PT:
+				self.point_outflows[row[SOURCE_ID]] = row
+			if row[SINK_CAT] == RouteCat.PT:
+				self.point_inflows.setdefault(row[SOURCE_CAT], {})[row[SINK_ID]] = row
+
+	@classmethod
+	def load(cls, db):
+		return cls(db.execute_sql("SELECT sourceid, sourcecat, hyd_typ, sinkid, sinkcat, percent FROM gis_routing").fetchall())
+
+	@classmethod
+	def load_connections(cls, con_out_tables):
+		"""
+		Load the graph from the con_out tables written to the connect files, where objects are (obj_typ, con id) pairs.
+		con_out_tables is a list of (obj_typ, con_out model, field of its con) of each connect file.
+		"""
+		rows = []
+		for obj_typ, table, con_field in con_out_tables:
+			for con_id, hyd_typ, obj_id, out_typ, frac in table.select(con_field, table.hyd_typ, table.obj_id, table.obj_typ, table.frac).tuples():
+				rows.append((con_id, obj_typ, hyd_typ, obj_id, out_typ, frac * 100))
+		return cls(rows)
+
+	def topological_order(self, cats=None):
+		"""
+		Return the strongly connected components of the objects of cats (default all), upstream to downstream.
+		Each component is a sorted list of objects; one with more than one object, or an object flowing into itself, is a cycle.
+		Rows with no flow or to the outlet are not edges. Uses Tarjan's algorithm without recursion, so long rivers do not hit the recursion limit.
+		"""
+		edges = {}
+		for row in self.rows:
+			if row[PERCENT] <= 0 or row[SINK_CAT] == RouteCat.OUTLET:
+				continue
+			if cats is not None and (row[SOURCE_CAT] not in cats or row[SINK_CAT] not in cats):
+				continue
+			edges.setdefault((row[SOURCE_CAT], row[SOURCE_ID]), set()).add((row[SINK_CAT], row[SINK_ID]))
+			edges.setdefault((row[SINK_CAT], row[SINK_ID]), set())
+		edges = {obj: sorted(sinks) for obj, sinks in edges.items()}
+
+		index = {}
+		low = {}
+		stack = []
+		on_stack = set()
+		components = []
+		for root in sorted(edges):
+			if root in index:
+				continue
+			work = [(root, 0)]
+			while work:
+				obj, i = work.pop()
+				if i == 0:
+					index[obj] = low[obj] = len(index)
+					stack.append(obj)
+					on_stack.add(obj)
+				sinks = edges[obj]
+				while i < len(sinks):
+					sink = sinks[i]
+					i += 1
+					if sink not in index:
+						work.append((obj, i))
+						work.append((sink, 0))
+						break
+					if sink in on_stack:
+						low[obj] = min(low[obj], index[sink])
+				else:
+					if low[obj] == index[obj]:
+						component = []
+						while True:
+							member = stack.pop()
+							on_stack.discard(member)
+							component.append(member)
+							if member == obj:
+								break
+						components.append(sorted(component))
+					if work:
+						parent = work[-1][0]
+						low[parent] = min(low[parent], low[obj])
+
+		# Tarjan's algorithm finds downstream components first
+		components.reverse()
+		return components
+
+	def cycles(self, cats=None):
+		"""Return the components of topological_order that are cycles."""
+		self_loops = set((row[SOURCE_CAT], row[SOURCE_ID]) for row in self.rows if row[PERCENT] > 0 and (row[SOURCE_CAT], row[SOURCE_ID]) == (row[SINK_CAT], row[SINK_ID]))
+		return [component for component in self.topological_order(cats) if len(component) > 1 or component[0] in self_loops]
+
+	def outflows(self, sourcecats):
+		"""Return the rows leaving objects of sourcecats with a positive percent and not to the outlet, in source id order."""
+		return sorted((row for row in self.rows if row[SOURCE_CAT] in sourcecats and row[PERCENT] > 0 and row[SINK_CAT] != RouteCat.OUTLET), key=lambda row: row[SOURCE_ID])
+
+	def point_inflow(self, pt_id, sourcecats):
+		"""Return the row flowing into point pt_id from the first of sourcecats that has one, or None."""
+		for cat in sourcecats:
+			row = self.point_inflows.get(cat, {}).get(pt_id, None)
+			if row is not None:
+				return row
+		return None
+
+	def resolve_point(self, pt_id):
+		"""Return the row leaving the chain of points starting at pt_id towards an object other than a point, or None if the chain ends."""
+		path = []
+		current = pt_id
+		while current not in self.resolved_points:
+			if current in path:
+				raise ValueError('Check gis_routing - loop detected through point source/sink id {}'.format(current))
+			path.append(current)
+
+			row = self.point_outflows.get(current, None)
+			if row is None or row[SINK_CAT] != RouteCat.PT:
+				self.resolved_points[current] = row
+				break
+			current = row[SINK_ID]
+
+		result = self.resolved_points[current]
+		for pt in path:
+			self.resolved_points[pt] = result
+		return result
+
+	def resolve(self, row):
+		"""Return row itself, or the row leaving the chain of points it flows into."""
+		if row[SINK_CAT] == RouteCat.PT:
+			return self.resolve_point(row[SINK_ID])
+		return row
@@ -0,0 +1,91 @@
+import math
+
+
+class NearestIndex:
+	"""
+	Nearest-neighbour lookup over lat/lon points, bucketed in a uniform grid of degree cells.
+	Distance is dlat^2 + (dlon * cos(lat))^2 with cos taken at the query latitude, as in closest_lat_lon.
+	A query searches rings of cells around its own cell and stops once no unvisited cell can hold a closer point.
+	Ties go to the point added first.
+	"""
+	def __init__(self, points, points_per_cell=4):
+		self.points = [(float(lat), float(lon), value) for lat, lon, value in points if lat is not None and lon is not None]
+		self.cells = {}
+		if len(self.points) < 1:
+			return
+
+		lats = [p[0] for p in self.points]
+		lons = [p[1] for p in self.points]
+		self.min_lat, self.max_lat = min(lats), max(lats)
+		self.min_lon, self.max_lon = min(lons), max(lons)
+
+		# Size cells so each holds a few points on average
+		area = max(self.max_lat - self.min_lat, 1e-6) * max(self.max_lon - self.min_lon, 1e-6)
+		self.cell_size = max(math.sqrt(area * points_per_cell / len(self.points)), 1e-6)
+
+		for idx, (lat, lon, value) in enumerate(self.points):
+			self.cells.setdefault(self.cell_of(lat, lon), []).append(idx)
+
+		self.max_i = self.cell_of(self.max_lat, self.max_lon)[0]
+		self.max_j = self.cell_of(self.max_lat, self.max_lon)[1]
+
+	def __len__(self):
+		return len(self.points)
+
+	def cell_of(self, lat, lon):
+		return math.floor((lat - self.min_lat) / self.cell_size), math.floor((lon - self.min_lon) / self.cell_size)
+
+	def nearest(self, lat, lon):
+		"""Return the value of the point closest to lat, lon, or None if the index is empty or the coordinates are missing."""
+		if len(self.points) < 1 or lat is None or lon is None:
+			return None
+
+		lat = float(lat)
+		lon = float(lon)
+		fudge = math.pow(math.cos(math.radians(lat)), 2)
+		ci, cj = self.cell_of(lat, lon)
+
+		# Skip rings that fall entirely outside the grid, e.g. for a query far from every point
+		ring = max(0, -ci, ci - self.max_i, -cj, cj - self.max_j)
+		max_ring = max(abs(ci), abs(ci - self.max_i), abs(cj), abs(cj - self.max_j))
+
+		best_idx = None
+		best_dist = None
+		while ring <= max_ring:
+			for i, j in ring_cells(ci, cj, ring, self.max_i, self.max_j):
+				for idx in self.cells.get((i, j), ()):
+					p_lat, p_lon, value = self.points[idx]
+					dist = (lat - p_lat) * (lat - p_lat) + (lon - p_lon) * (lon - p_lon) * fudge
+					if best_dist is None or dist < best_dist or (dist == best_dist and idx < best_idx):
+						best_idx = idx
+						best_dist = dist
+
+			# Points outside the searched rings are at least ring * cell_size degrees away on one axis
+			if best_dist is not None:
+				bound = ring * self.cell_size
+				if best_dist < bound * bound * fudge:
+					break
+			ring += 1
+
+		return self.points[best_idx][2]
+
+
+def ring_cells(ci, cj, ring, max_i, max_j):
+	"""Yield the cells at Chebyshev distance ring from cell (ci, cj) that lie within the grid (0..max_i, 0..max_j)."""
+	if ring == 0:
+		yield ci, cj
+		return
+
+	j_start = max(cj - ring, 0)
+	j_end = min(cj + ring, max_j)
+	for i in (ci - ring, ci + ring):
+		if 0 <= i <= max_i:
+			for j in range(j_start, j_end + 1):
+				yield i, j
+
+	i_start = max(ci - ring + 1, 0)
+	i_end = min(ci + ring - 1, max_i)
+	for j in (cj - ring, cj + ring):
+		if 0 <= j <= max_j:
+			for i in range(i_start, i_end + 1):
+				yield i, j
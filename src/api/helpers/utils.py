@@ -200,3 +200,30 @@ def add_months(sourcedate, months):
 def split_multiple_delimiters(s, delimiters = [',', ' ', '\t','\n']):
 	values = re.split('|'.join(map(re.escape, delimiters)), s)
 	return list(filter(None, values))
+
+
+def process_running(pid):
+	"""Check whether a process is still running, without signalling it."""
+	if sys.platform == 'win32':
+		import ctypes
+		PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+		STILL_ACTIVE = 259
+		kernel32 = ctypes.windll.kernel32
+		handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+		if not handle:
+			return False
+		exit_code = ctypes.c_ulong()
+		try:
+			if not kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code)):
+				return False
+			return exit_code.value == STILL_ACTIVE
+		finally:
+			kernel32.CloseHandle(handle)
+
+	try:
+		os.kill(pid, 0)
+	except ProcessLookupError:
+		return False
+	except PermissionError:
+		return True
+	return True
@@ -7,10 +7,11 @@ from peewee import *
 from .defaults import DefaultRestMethods, RestHelpers
 from database.project import base as project_base
 from database.project.config import Project_config
-from database.project.climate import Weather_sta_cli, Weather_file, Weather_wgn_cli, Weather_wgn_cli_mon, Atmo_cli, Atmo_cli_sta, Atmo_cli_sta_value
+from database.project.climate import Weather_sta_cli, Weather_file, Weather_qa, Weather_wgn_cli, Weather_wgn_cli_mon, Atmo_cli, Atmo_cli_sta, Atmo_cli_sta_value
 from database.project.simulation import Time_sim
 from database import lib as db_lib
 from helpers import utils
+from actions import weather_cache
 import sqlite3
 
 bp = Blueprint('climate', __name__, url_prefix='/climate')
@@ -179,6 +180,85 @@ def files(type, partial_name):
 	rh.close()
 	return [v.filename for v in m]
 
+# Weather file statistics, read from the binary weather cache
+
+@bp.route('/files/stats', methods=['GET'])
+def filesStats():
+	project_db = request.headers.get(rh.PROJECT_DB)
+	has_db,error = rh.init(project_db)
+	if not has_db: abort(400, error)
+
+	try:
+		m = Weather_file.select(Weather_file.filename)
+		if request.args.get('type') is not None:
+			m = m.where(Weather_file.type == request.args.get('type'))
+		filenames = [v.filename for v in m]
+
+		# Building the cache of a whole project can take minutes, too long for a request; the weather_cache action builds it in a process pool
+		cache = weather_cache.project_weather_cache(project_db)
+		stats, errors, not_cached, skipped = cache.statistics(filenames, build=False)
+		rh.close()
+		return {
+			'stats': stats,
+			'errors': [{'filename': k, 'error': v} for k, v in errors.items()],
+			'skipped': [{'filename': k, 'message': v} for k, v in skipped.items()],
+			'not_cached': not_cached,
+			'message': None if len(not_cached) < 1 else '{n} weather files are not cached yet. Run the weather_cache action to include them.'.format(n=len(not_cached))
+		}
+	except ValueError as ex:
+		rh.close()
+		abort(400, str(ex))
+
+@bp.route('/stations/<int:id>/stats', methods=['GET'])
+def stationsStats(id):
+	project_db = request.headers.get(rh.PROJECT_DB)
+	has_db,error = rh.init(project_db)
+	if not has_db: abort(400, error)
+
+	try:
+		m = Weather_sta_cli.get(Weather_sta_cli.id == id)
+		stats, errors, skipped = weather_cache.station_weather_statistics(project_db, m)
+		rh.close()
+		return {
+			'stats': stats,
+			'errors': [{'filename': k, 'error': v} for k, v in errors.items()],
+			'skipped': [{'filename': k, 'message': v} for k, v in skipped.items()]
+		}
+	except Weather_sta_cli.DoesNotExist:
+		rh.close()
+		abort(404, 'Weather station {id} does not exist'.format(id=id))
+	except ValueError as ex:
+		rh.close()
+		abort(400, str(ex))
+
+@bp.route('/files/cache', methods=['DELETE'])
+def filesCache():
+	project_db = request.headers.get(rh.PROJECT_DB)
+	has_db,error = rh.init(project_db)
+	if not has_db: abort(400, error)
+
+	try:
+		weather_cache.project_weather_cache(project_db).clear()
+		rh.close()
+		return '', 200
+	except ValueError as ex:
+		rh.close()
+		abort(400, str(ex))
+
+# Weather_qa
+
+@bp.route('/qa', methods=['GET'])
+def weatherQa():
+	project_db = request.headers.get(rh.PROJECT_DB)
+	has_db,error = rh.init(project_db)
+	if not has_db: abort(400, error)
+	project_base.db.create_tables([Weather_qa], safe=True)
+	rh.close()
+
+	table = Weather_qa
+	filter_cols = [table.name, table.type, table.check, table.severity, table.message]
+	return DefaultRestMethods.get_paged_list(table, filter_cols)
+
 # Weather_wgn_cli
 
 @bp.route('/wgn', methods=['GET', 'POST', 'DELETE'])
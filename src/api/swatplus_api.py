@@ -1,8 +1,13 @@
 from helpers.executable_api import Unbuffered
+from helpers import utils
 from actions.setup_project import SetupProject
 from actions.import_gis import GisImport
 from actions.import_weather import WeatherImport, Swat2012WeatherImport, WgnImport, AtmoImport, NetCDFWeatherImport
 from actions.read_output import ReadOutput
+from actions.export_output import ExportOutput
+from actions.weather_qa import WeatherQa
+from actions.weather_cache import cache_project_weather
+from actions.netcdf_extract import NetCDFExtract
 from actions.write_files import WriteFiles
 from actions.create_databases import CreateDatasetsDb, CreateOutputDb, CreateProjectDb
 from actions.import_export_data import ImportExportData
@@ -17,11 +22,14 @@ from database import soils
 
 import sys
 import argparse
+import json
+import multiprocessing
 
 if __name__ == '__main__':
+	multiprocessing.freeze_support()
 	sys.stdout = Unbuffered(sys.stdout)
 	parser = argparse.ArgumentParser(description="SWAT+ Editor API")
-	parser.add_argument("action", type=str, help="name of the API action: setup_project, import_gis, import_weather, read_output, write_files, import_csv, export_csv, update_project, reimport_gis, run")
+	parser.add_argument("action", type=str, help="name of the API action: setup_project, import_gis, import_weather, weather_qa, weather_cache, extract_netcdf, read_output, export_output, write_files, import_csv, export_csv, update_project, reimport_gis, run")
 
 	parser.add_argument("--project_db_file", type=str, help="full path of project SQLite database file", nargs="?")
 	parser.add_argument("--delete_existing", type=str, help="y/n delete existing data first", nargs="?")
@@ -34,7 +42,7 @@ if __name__ == '__main__':
 	parser.add_argument("--file1", type=str, help="full path of file", nargs="?")
 	parser.add_argument("--file2", type=str, help="full path of file", nargs="?")
 	parser.add_argument("--nc_stations_list", type=str, help="full path of CSV file with NetCDF station coordinates and variable availability", nargs="?")
-	parser.add_argument("--nc_file", type=str, help="full path of NetCDF data file (.nc4) to copy to TxtInOut", nargs="?")
+	parser.add_argument("--nc_file", type=str, help="full path of NetCDF data file (.nc4) to trim and copy to TxtInOut", nargs="?")
 	parser.add_argument("--delete_existing_stations", type=str, help="y/n delete existing stations first", nargs="?")
 
 	# read output
@@ -42,6 +50,21 @@ if __name__ == '__main__':
 	parser.add_argument("--output_db_file", type=str, help="full path of output SQLite database file", nargs="?")
 	parser.add_argument("--skip_files", type=str, help="comma-separated list of output files to skip", nargs="?")
 	parser.add_argument("--only_read_swatcheck", type=str, help="y/n only read files required by SWAT+ Check", nargs="?")
+	parser.add_argument("--incremental", type=str, help="y/n only import output files that changed since the last import, or only re-import GIS changes (default n)", nargs="?")
+	parser.add_argument("--build_indexes", type=str, help="y/n index object and time columns of imported output tables (default y)", nargs="?")
+	parser.add_argument("--object_filters", type=str, help="JSON object of tables (or table families like channel_sd) to a gis_id, unit or name column and the values to import, e.g. {\"channel_sd\": {\"gis_id\": [1, 5]}}", nargs="?")
+	parser.add_argument("--filter_year_start", type=int, help="first year of output rows to import", nargs="?")
+	parser.add_argument("--filter_year_end", type=int, help="last year of output rows to import", nargs="?")
+	parser.add_argument("--rollups", type=str, help="y/n write monthly and yearly rollup tables of daily output files (default n)", nargs="?")
+	parser.add_argument("--storage", type=str, help="output table storage: rows (default) or compact to store daily and monthly values as packed series", nargs="?", default="rows")
+	parser.add_argument("--workers", type=int, help="number of worker processes: output files parsed in parallel for read_output (default 1), weather files checked for weather_qa or parsed for weather_cache (default CPU count)", nargs="?")
+	parser.add_argument("--live_pid", type=int, help="process id of a running SWAT+ model; import its output while it runs and finish when it exits", nargs="?")
+
+	# export output
+	parser.add_argument("--export_format", type=str, help="columnar export format: parquet (default) or feather", nargs="?", default="parquet")
+	parser.add_argument("--export_dir", type=str, help="full path of directory to write columnar files, defaults to a folder next to the output database", nargs="?")
+	parser.add_argument("--export_tables", type=str, help="comma-separated list of output tables to export (default all)", nargs="?")
+	parser.add_argument("--from_csv", type=str, help="y/n export straight from the output CSV files instead of the output database (default n)", nargs="?")
 
 	# create databases
 	parser.add_argument("--db_type", type=str, help="which database: datasets, output, project", nargs="?")
@@ -66,6 +89,8 @@ if __name__ == '__main__':
 	parser.add_argument("--update_project_values", type=str, help="y/n update project values (default n)", nargs="?")
 	parser.add_argument("--reimport_gis", type=str, help="y/n re-import GIS data (default n)", nargs="?")
 	parser.add_argument("--copy_datasets_db", type=str, help="y/n copy datasets sqlite to project folder (default n)", nargs="?")
+	parser.add_argument("--compress_backup", type=str, help="y/n gzip the backup of the project database made before re-importing GIS (default n)", nargs="?")
+	parser.add_argument("--keep_backups", type=int, help="reimport_gis: number of re-import backups of the project database to keep in DatabaseBackups (default all); backups taken before editor upgrades are never deleted", nargs="?")
 
 	# run from command line
 	parser.add_argument("--swat_exe_file", type=str, help="full path of the SWAT+ executable file", nargs="?")
@@ -105,7 +130,9 @@ if __name__ == '__main__':
 		api = UpdateDatasets(args.editor_version, None, args.project_db_file)
 		api = UpdateProject(args.project_db_file, args.editor_version, args.datasets_db_file, update_project_values, reimport_gis)
 	elif args.action == "reimport_gis":
-		api = ReimportGis(args.project_db_file, args.editor_version, args.project_name, args.datasets_db_file, constant_ps, is_lte)
+		incremental = True if args.incremental == "y" else False
+		compress_backup = True if args.compress_backup == "y" else False
+		api = ReimportGis(args.project_db_file, args.editor_version, args.project_name, args.datasets_db_file, constant_ps, is_lte, incremental, compress_backup, args.keep_backups)
 	elif args.action == "import_gis":
 		api = GisImport(args.project_db_file, del_ex)
 		api.insert_default()
@@ -131,11 +158,32 @@ if __name__ == '__main__':
 		elif args.import_type == "atmo":
 			api = AtmoImport(args.project_db_file, del_ex, args.import_method, args.file1, args.file2)
 			api.import_data()
+	elif args.action == "weather_qa":
+		api = WeatherQa(args.project_db_file, args.workers)
+		api.run()
+	elif args.action == "weather_cache":
+		cache_project_weather(args.project_db_file, args.workers, del_ex)
+	elif args.action == "extract_netcdf":
+		api = NetCDFExtract(args.project_db_file, args.nc_file)
+		api.run()
 	elif args.action == "read_output":
 		skip_files = [item.strip() for item in args.skip_files.split(',')] if args.skip_files else []
 		only_read_swatcheck = True if args.only_read_swatcheck == "y" else False
-		api = ReadOutput(args.output_files_dir, args.output_db_file, args.swat_version, args.editor_version, args.project_name, skip_files=skip_files, only_read_swatcheck=only_read_swatcheck)
-		api.read()
+		incremental = True if args.incremental == "y" else False
+		build_indexes = False if args.build_indexes == "n" else True
+		rollups = True if args.rollups == "y" else False
+		object_filters = json.loads(args.object_filters) if args.object_filters else None
+		api = ReadOutput(args.output_files_dir, args.output_db_file, args.swat_version, args.editor_version, args.project_name, skip_files=skip_files, only_read_swatcheck=only_read_swatcheck, workers=args.workers if args.workers is not None else 1, incremental=incremental, build_indexes=build_indexes,
+			object_filters=object_filters, year_start=args.filter_year_start, year_end=args.filter_year_end, rollups=rollups, storage=args.storage)
+		if args.live_pid is not None:
+			api.read_live(lambda: utils.process_running(args.live_pid))
+		else:
+			api.read()
+	elif args.action == "export_output":
+		export_tables = [item.strip() for item in args.export_tables.split(',')] if args.export_tables else None
+		from_csv = True if args.from_csv == "y" else False
+		api = ExportOutput(args.output_db_file, args.export_dir, args.export_format, export_tables, from_csv, args.output_files_dir)
+		api.export()
 	elif args.action == "get_swatplus_check_legacy":
 		api = GetSwatplusCheck(args.project_db_file, args.output_db_file)
 		print(api.get())